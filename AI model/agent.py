@@ -4,21 +4,47 @@ Combines generative and search-based approaches for molecule discovery.
 """
 
 # Standard library imports
+import asyncio
+import contextvars
+import copy
+import functools
+import hashlib
+import inspect
+import json
 import os
 import re
 import random
 import operator
-from typing import TypedDict, Any, List, Dict, Optional
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from typing import TypedDict, Annotated, Any, Callable, List, Dict, Optional, Tuple
 
 # Third-party imports
+import httpx
+import numpy as np
 import torch
 import joblib
-from transformers import T5Tokenizer, T5ForConditionalGeneration, AutoTokenizer, AutoModel
+from transformers import T5Tokenizer, T5ForConditionalGeneration, AutoTokenizer, AutoModel, LogitsProcessorList
 from qdrant_client import QdrantClient
 from langgraph.graph import StateGraph, START, END
 from langchain_openai import ChatOpenAI
 from huggingface_hub import hf_hub_download
 
+# Local imports
+from cache import LRUCache, TieredCache
+from candidates import CandidateTable, SOURCE_SEARCHED, STATUS_PASSED
+from metrics import Registry
+from profiling import ProfileSession, record_scope, thread_scope
+from sampling import row_seeds, sampling_processors
+from inference import apply_regressor_backend, apply_seq2seq_backend, backend_info, check_backend
+from scheduler import MicroBatcher
+from search import LocalIndex, QdrantBackend
+from smiles_grammar import grammar_processor
+from validation import atom_limit, start_pool, stop_pool, validate_candidates
+
 try:
     from rdkit import Chem
 except ImportError:
@@ -47,14 +73,136 @@ QDRANT_URL = os.getenv("QDRANT_URL", "QdrantURLHere")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", """QdrantAPIKeyHere""")
 QDRANT_COLLECTION = "qm9_embeddings"
 
+# Vector search backend: "qdrant" (remote collection) or "local" (in-process
+# index over the shards in LOCAL_INDEX_DIR)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "qdrant")
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "5"))
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "qm9_index")
+LOCAL_INDEX_METRIC = os.getenv("LOCAL_INDEX_METRIC", "cosine")
+LOCAL_INDEX_ANN = os.getenv("LOCAL_INDEX_ANN", "")  # "" = exact, "hnsw" = approximate
+
 # LLM configuration - Use environment variables for security
 LLM_MODEL = os.getenv("LLM_MODEL", "x-ai/grok-4.1-fast")
 LLM_API_KEY = os.getenv("OPENROUTER_API_KEY", "OpenRouterAPIKeyHere")
 LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # Seconds per LLM call
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))  # Pooled HTTP connections
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # Outstanding async LLM calls
+LLM_ASYNC = os.getenv("LLM_ASYNC", "1") == "1"  # Serve /generate through the async LLM path
 
 # Property names for QM9 dataset
 PROPERTY_NAMES = ['mu', 'alpha', 'gap', 'Cv', 'num_atoms']
 
+# Constraint evaluation: "numeric" compares predictions to the constraints
+# directly; "llm" asks the LLM judge (one network round-trip per iteration)
+EVALUATION_MODE = os.getenv("EVALUATION_MODE", "numeric")
+# Allowed absolute deviation from each target; max_atoms is an upper bound
+CONSTRAINT_TOLERANCES = {"mu": 0.5, "alpha": 5.0, "gap": 0.05, "Cv": 3.0}
+CONSTRAINT_TOLERANCES.update(json.loads(os.getenv("CONSTRAINT_TOLERANCES", "{}")))
+# Candidates that must pass before the optimize loop stops
+MIN_PASSING_CANDIDATES = 3
+
+# Ranking: candidates ordered by weighted distance to the constraints, with
+# each property measured in units of its tolerance (num_atoms in atoms)
+RANK_TOP_K = 3
+RANK_WEIGHTS = {"mu": 1.0, "alpha": 1.0, "gap": 1.0, "Cv": 1.0, "num_atoms": 1.0}
+
+# ChemBERTa inference settings
+CHEMBERTA_MAX_LENGTH = 128
+PREDICT_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_SIZE", "32"))
+
+# Cross-request micro-batching for ChemBERTa and T5 encoder calls
+INFERENCE_BATCHING = os.getenv("INFERENCE_BATCHING", "1") == "1"
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "64"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+
+# Property prediction cache keyed by canonical SMILES (size 0 disables memory tier)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_DB = os.getenv("PREDICTION_CACHE_DB", "")  # SQLite path, empty = memory only
+
+# Constraint-embedding cache for encode_step, keyed by the normalized caption
+# (the encoder still sees the index-compatible caption). EMBEDDING_CACHE_PRECISION
+# rounds constraint values in the key to that many decimals so near-identical
+# queries share an entry (empty = exact)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "512"))
+EMBEDDING_CACHE_PRECISION = os.getenv("EMBEDDING_CACHE_PRECISION", "")
+
+# Full pipeline result cache in front of run_pipeline, keyed by the
+# canonical constraints, iterations and request options. Entries expire
+# after PIPELINE_CACHE_TTL seconds (0 = never); size 0 disables the cache.
+# PIPELINE_CACHE_PRECISION rounds constraint values to that many decimals
+# before the run, so near-identical queries share a result (empty = exact)
+PIPELINE_CACHE_SIZE = int(os.getenv("PIPELINE_CACHE_SIZE", "256"))
+PIPELINE_CACHE_TTL = float(os.getenv("PIPELINE_CACHE_TTL", "3600"))
+PIPELINE_CACHE_DB = os.getenv("PIPELINE_CACHE_DB", "")  # SQLite path, empty = memory only
+PIPELINE_CACHE_PRECISION = os.getenv("PIPELINE_CACHE_PRECISION", "")
+
+# Seeded sampling: with PIPELINE_SEED set, MolT5 sampling is reseeded per
+# request from this value so a fresh run reproduces the cached one (empty = unseeded)
+PIPELINE_SEED = os.getenv("PIPELINE_SEED", "")
+
+# Per-node instrumentation: wall time, candidate counts, model and LLM time,
+# token usage and cache hits, exported at /metrics and summarized in results
+PIPELINE_METRICS = os.getenv("PIPELINE_METRICS", "1") == "1"
+
+# On-demand profiling: with PROFILING_ENABLED=1 a request can ask for a
+# cProfile + PyTorch profiler run; artifacts go to PROFILE_DIR/<id>/ and only
+# the newest PROFILE_KEEP profiles are kept
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+
+# Model loading: components load lazily on first use; MODEL_WARMUP=1 lets
+# the web app load and warm everything in a background thread at startup
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Generation: "fixed" samples GENERATION_BATCH_SIZE sequences once; "adaptive"
+# keeps sampling batches until GENERATION_TARGET_VALID RDKit-valid unique
+# molecules exist, GENERATION_MAX_SAMPLES sequences were drawn or
+# GENERATION_DEADLINE_MS elapsed (0 = no deadline)
+GENERATION_MODE = os.getenv("GENERATION_MODE", "fixed")
+GENERATION_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", "5"))
+GENERATION_TARGET_VALID = int(os.getenv("GENERATION_TARGET_VALID", "5"))
+GENERATION_MAX_SAMPLES = int(os.getenv("GENERATION_MAX_SAMPLES", "40"))
+GENERATION_DEADLINE_MS = float(os.getenv("GENERATION_DEADLINE_MS", "5000"))
+
+# Grammar-constrained decoding: mask tokens that would make the SMILES
+# unparseable; GENERATION_GRAMMAR_MAX_ATOMS also caps heavy atoms at the
+# request's max_atoms
+GENERATION_GRAMMAR = os.getenv("GENERATION_GRAMMAR", "0") == "1"
+GENERATION_GRAMMAR_MAX_ATOMS = os.getenv("GENERATION_GRAMMAR_MAX_ATOMS", "1") == "1"
+
+# Cross-request batching of MolT5 sampling: concurrent calls are padded
+# into one generate call of up to GENERATION_MAX_BATCH_CAPTIONS captions.
+# Every sequence samples from its own generator, so seeded calls batch too
+GENERATION_BATCHING = os.getenv("GENERATION_BATCHING", "1") == "1"
+GENERATION_MAX_BATCH_CAPTIONS = int(os.getenv("GENERATION_MAX_BATCH_CAPTIONS", "8"))
+
+# Batch discovery: run_pipeline_batch and /generate/batch move all constraint
+# sets through each model stage together, with up to BATCH_MAX_CONCURRENCY
+# vector searches and LLM calls in flight; BATCH_MAX_SIZE caps constraint
+# sets per request
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+
+# Validation: candidates are canonicalized and deduplicated on canonical
+# SMILES or InChIKey; molecules with more heavy atoms than max_atoms are
+# dropped before prediction. Sets of VALIDATION_POOL_THRESHOLD or more
+# candidates are validated in a process pool
+VALIDATION_DEDUPE = os.getenv("VALIDATION_DEDUPE", "canonical")
+VALIDATION_ENFORCE_MAX_ATOMS = os.getenv("VALIDATION_ENFORCE_MAX_ATOMS", "1") == "1"
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "0"))  # 0 = number of CPUs
+VALIDATION_POOL_THRESHOLD = int(os.getenv("VALIDATION_POOL_THRESHOLD", "256"))
+
+# Inference backend per model: "torch" (fp32 eager), "int8" (dynamic
+# quantization of Linear layers) or "onnx" (ONNX Runtime). CPU only for
+# int8/onnx; exported ONNX files are kept in ONNX_CACHE_DIR
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+CHEMBERTA_BACKEND = os.getenv("CHEMBERTA_BACKEND", INFERENCE_BACKEND)
+T5_BACKEND = os.getenv("T5_BACKEND", INFERENCE_BACKEND)
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "onnx_cache")
+ONNX_NUM_THREADS = int(os.getenv("ONNX_NUM_THREADS", "0"))  # 0 = ONNX Runtime default
+
 
 # ============================
 # MODEL INITIALIZATION
@@ -65,6 +213,18 @@ device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 print(f"Using device: {device}")
 
 
+def _resolve_backend(backend):
+    backend = check_backend(backend)
+    if backend != "torch" and device.type != "cpu":
+        print(f"Inference backend {backend!r} is CPU only, using 'torch' on {device}")
+        return "torch"
+    return backend
+
+
+CHEMBERTA_BACKEND = _resolve_backend(CHEMBERTA_BACKEND)
+T5_BACKEND = _resolve_backend(T5_BACKEND)
+
+
 class ChemBERTaMulti(torch.nn.Module):
     """ChemBERTa model for multi-property prediction."""
     
@@ -83,19 +243,29 @@ class ChemBERTaMulti(torch.nn.Module):
         return self.head(pooled)
 
 
-def load_models():
-    """Load all required models and return them as a dictionary."""
-    print("Loading models from Hugging Face Hub...")
-    
-    # Load T5 model and tokenizer from Hub (auto-downloads and caches)
-    print(f"Loading T5 from: {MODEL_T5_PATH}")
-    tokenizer_t5 = T5Tokenizer.from_pretrained(MODEL_T5_PATH)
+def _load_tokenizer_t5():
+    # Load T5 tokenizer from Hub (auto-downloads and caches)
+    print(f"Loading T5 tokenizer from: {MODEL_T5_PATH}")
+    return T5Tokenizer.from_pretrained(MODEL_T5_PATH)
+
+
+def _load_model_t5():
+    print(f"Loading T5 from: {MODEL_T5_PATH} (backend: {T5_BACKEND})")
+    if T5_BACKEND == "onnx":
+        # Exported straight from the checkpoint; no eager copy needed
+        return apply_seq2seq_backend(None, T5_BACKEND, MODEL_T5_PATH, ONNX_CACHE_DIR)
     model_t5 = T5ForConditionalGeneration.from_pretrained(MODEL_T5_PATH)
-    
-    # Load ChemBERTa tokenizer from Hub
+    model_t5.eval()
+    return apply_seq2seq_backend(model_t5, T5_BACKEND, MODEL_T5_PATH, ONNX_CACHE_DIR)
+
+
+def _load_tokenizer_chemberta():
     print(f"Loading ChemBERTa tokenizer from: {TOKENIZER_CHEMBERTA_PATH}")
-    tokenizer_chemberta = AutoTokenizer.from_pretrained(TOKENIZER_CHEMBERTA_PATH)
-    
+    return AutoTokenizer.from_pretrained(TOKENIZER_CHEMBERTA_PATH)
+
+
+def load_chemberta_fp32():
+    """Load the fp32 ChemBERTa regressor, regardless of CHEMBERTA_BACKEND."""
     # Download ChemBERTa model file from Hub
     print(f"Downloading ChemBERTa model from: {MODEL_CHEMBERTA_HUB}")
     model_path = hf_hub_download(
@@ -109,617 +279,1907 @@ def load_models():
     )
     model_chemberta.eval()
     model_chemberta.to(device)
-    
-    # Download and load scaler from Hub
+    return model_chemberta
+
+
+def _load_model_chemberta():
+    model_chemberta = load_chemberta_fp32()
+    if CHEMBERTA_BACKEND != "torch":
+        print(f"Applying ChemBERTa inference backend: {CHEMBERTA_BACKEND}")
+    return apply_regressor_backend(
+        model_chemberta,
+        CHEMBERTA_BACKEND,
+        name=f"chemberta_{MODEL_CHEMBERTA_HUB}",
+        cache_dir=ONNX_CACHE_DIR,
+        num_threads=ONNX_NUM_THREADS,
+    )
+
+
+def _load_scaler():
     print(f"Downloading scaler from: {MODEL_CHEMBERTA_HUB}")
     scaler_path = hf_hub_download(
         repo_id=MODEL_CHEMBERTA_HUB,
         filename=SCALER_FILE,
         cache_dir=None
     )
-    scaler = joblib.load(scaler_path)
-    
-    # Initialize Qdrant client
-    qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-    
-    # Initialize LLM
-    llm = ChatOpenAI(
+    return joblib.load(scaler_path)
+
+
+def _load_qdrant():
+    return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+
+
+def _load_search():
+    if SEARCH_BACKEND == "local":
+        print(f"Loading local vector index from: {LOCAL_INDEX_DIR}")
+        return LocalIndex(LOCAL_INDEX_DIR, metric=LOCAL_INDEX_METRIC, ann=LOCAL_INDEX_ANN)
+    if SEARCH_BACKEND == "qdrant":
+        return QdrantBackend(models.get('qdrant'), QDRANT_COLLECTION)
+    raise ValueError(f"Unknown SEARCH_BACKEND: {SEARCH_BACKEND}")
+
+
+def _load_llm():
+    # One pooled HTTP client per mode, shared by every request
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+    )
+    return ChatOpenAI(
         model=LLM_MODEL,
         api_key=LLM_API_KEY,
         base_url=LLM_BASE_URL,
+        timeout=LLM_TIMEOUT,
+        http_client=httpx.Client(limits=limits, timeout=LLM_TIMEOUT),
+        http_async_client=httpx.AsyncClient(limits=limits, timeout=LLM_TIMEOUT),
     )
+
+
+class ModelManager:
+    """
+    Lazily loads pipeline components and tracks their readiness.
     
-    print("Models loaded successfully!")
+    Each component is loaded on first access (``models.model_t5``) or by a
+    background warm-up thread, whichever comes first. Loading is guarded by
+    a per-component lock, so concurrent requests never load twice.
     
-    return {
-        'tokenizer_t5': tokenizer_t5,
-        'model_t5': model_t5,
-        'tokenizer_chemberta': tokenizer_chemberta,
-        'model_chemberta': model_chemberta,
-        'scaler': scaler,
-        'qdrant': qdrant,
-        'llm': llm
-    }
+    Args:
+        loaders: Component name -> zero-argument loader
+        required: Components the configured pipeline needs; readiness and
+                  load_all only consider these (default: all)
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]], required: Optional[List[str]] = None):
+        self._loaders = dict(loaders)
+        self._required = list(required) if required is not None else list(self._loaders)
+        self._components: Dict[str, Any] = {}
+        self._locks = {name: threading.Lock() for name in self._loaders}
+        self._status: Dict[str, Dict[str, Any]] = {
+            name: {"ready": False, "required": name in self._required, "load_seconds": None, "error": None}
+            for name in self._loaders
+        }
+        self._warmup = {"state": "not_started", "seconds": None, "error": None}
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Any:
+        """Return a component, loading it first if needed."""
+        component = self._components.get(name)
+        if component is not None:
+            return component
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model component: {name}")
+
+        with self._locks[name]:
+            component = self._components.get(name)
+            if component is None:
+                start = time.perf_counter()
+                try:
+                    component = self._loaders[name]()
+                except Exception as e:
+                    self._status[name]["error"] = str(e)
+                    raise
+                self._components[name] = component
+                self._status[name].update(
+                    ready=True, load_seconds=round(time.perf_counter() - start, 3), error=None
+                )
+                self._clear_failed_warmup()
+        return component
+
+    def set(self, name: str, component: Any):
+        """Replace a component, e.g. with a local stand-in."""
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model component: {name}")
+        self._components[name] = component
+        self._status[name].update(ready=True, load_seconds=0.0, error=None)
+        self._clear_failed_warmup()
+
+    def _clear_failed_warmup(self):
+        # A warm-up that failed while loading no longer matters once a later
+        # load has brought every required component up
+        if self._warmup["state"] == "failed" and self.loaded:
+            self._warmup["state"] = "recovered"
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def load_all(self) -> Dict[str, Any]:
+        """Load every required component and return them as a dictionary."""
+        return {name: self.get(name) for name in self._required}
+
+    def start_background(self, warmup: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """
+        Load the required components and run `warmup` in a daemon thread.
+        
+        Safe to call more than once: while a warm-up is running or after it
+        succeeded the existing thread is returned; after a failure a new
+        attempt is started.
+        """
+        if self._thread is not None and (self._thread.is_alive() or self._warmup["state"] != "failed"):
+            return self._thread
+
+        def _run():
+            self._warmup.update(state="running", error=None)
+            start = time.perf_counter()
+            try:
+                self.load_all()
+                if warmup is not None:
+                    warmup()
+                self._warmup["state"] = "done"
+            except Exception as e:
+                self._warmup.update(state="failed", error=str(e))
+                print(f"Model warm-up failed: {e}")
+            self._warmup["seconds"] = round(time.perf_counter() - start, 3)
+
+        self._thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    @property
+    def loaded(self) -> bool:
+        """True once every required component has been loaded."""
+        return all(self._status[name]["ready"] for name in self._required)
+
+    @property
+    def ready(self) -> bool:
+        """True once every required component is loaded and warm-up (if any) has not failed."""
+        return self.loaded and self._warmup["state"] in ("done", "not_started", "recovered")
+
+    def status(self) -> Dict[str, Any]:
+        """Return per-component readiness and load times."""
+        return {
+            "ready": self.ready,
+            "loaded": self.loaded,
+            "warmup": dict(self._warmup),
+            "components": {name: dict(status) for name, status in self._status.items()},
+        }
+
 
+# Components are created on first use rather than at import time; readiness
+# only waits for the ones this configuration uses (the local search backend
+# never talks to Qdrant)
+models = ModelManager({
+    'tokenizer_t5': _load_tokenizer_t5,
+    'model_t5': _load_model_t5,
+    'tokenizer_chemberta': _load_tokenizer_chemberta,
+    'model_chemberta': _load_model_chemberta,
+    'scaler': _load_scaler,
+    'qdrant': _load_qdrant,
+    'search': _load_search,
+    'llm': _load_llm,
+}, required=[
+    'tokenizer_t5', 'model_t5', 'tokenizer_chemberta', 'model_chemberta', 'scaler',
+    *(['qdrant'] if SEARCH_BACKEND != "local" else []), 'search', 'llm',
+])
+
+# Module attributes from before lazy loading, resolved on access
+_LEGACY_MODEL_NAMES = {
+    'tokenizer_t5': 'tokenizer_t5',
+    'model_t5': 'model_t5',
+    'loaded_tokenizer': 'tokenizer_chemberta',
+    'loaded_model': 'model_chemberta',
+    'label_scaler': 'scaler',
+    'qdrant_client': 'qdrant',
+    'llm': 'llm',
+}
+
+
+def __getattr__(name):
+    if name in _LEGACY_MODEL_NAMES:
+        return models.get(_LEGACY_MODEL_NAMES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Initialize models globally (will be used by functions)
-models = load_models()
-tokenizer_t5 = models['tokenizer_t5']
-model_t5 = models['model_t5']
-loaded_tokenizer = models['tokenizer_chemberta']
-loaded_model = models['model_chemberta']
-label_scaler = models['scaler']
-qdrant_client = models['qdrant']
-llm = models['llm']
+
+def load_models():
+    """Load all required models and return them as a dictionary."""
+    print("Loading models from Hugging Face Hub...")
+    loaded = models.load_all()
+    print("Models loaded successfully!")
+    return loaded
 
 
 # ============================
 # CORE FUNCTIONS
 # ============================
 
-def generate_embedding(sample):
+def generate_embedding_batch(texts):
     """
-    Generate embedding from text using T5 encoder.
+    Generate embeddings for several texts with one T5 encoder pass.
+    
+    Mean pooling uses the attention mask, so padded positions do not
+    contribute and each embedding matches the unbatched result.
     
     Args:
-        sample: Dict with 'input' key containing text
+        texts: List of input texts
         
     Returns:
-        numpy array of embedding
+        List of numpy arrays, one embedding per text
     """
-    inputs = tokenizer_t5(
-        sample['input'], 
+    texts = list(texts)
+    if not texts:
+        return []
+
+    inputs = models.tokenizer_t5(
+        texts, 
         return_tensors="pt", 
         padding=True, 
         truncation=True, 
         max_length=512
     )
 
-    with torch.no_grad():
-        encoder_outputs = model_t5.encoder(
+    with torch.inference_mode(), record_scope("t5_encoder"):
+        encoder_outputs = models.model_t5.encoder(
             input_ids=inputs['input_ids'],
             attention_mask=inputs['attention_mask']
         )
-        embedding = encoder_outputs.last_hidden_state.mean(dim=1).squeeze()
+        mask = inputs['attention_mask'].unsqueeze(-1).to(encoder_outputs.last_hidden_state.dtype)
+        summed = (encoder_outputs.last_hidden_state * mask).sum(dim=1)
+        embeddings = summed / mask.sum(dim=1).clamp(min=1)
 
-    return embedding.numpy()
+    return list(embeddings.float().cpu().numpy())
 
 
-def predict_properties(smiles):
+def generate_embedding(sample):
     """
-    Predict molecular properties from SMILES string.
+    Generate embedding from text using T5 encoder.
     
     Args:
-        smiles: SMILES string representation of molecule
+        sample: Dict with 'input' key containing text
         
     Returns:
-        Dict with predicted properties (mu, alpha, gap, Cv, num_atoms)
+        numpy array of embedding
+    """
+    return t5_encoder_batcher.run([sample['input']])[0]
+
+
+def predict_properties_batch(smiles_list, batch_size=PREDICT_BATCH_SIZE, model=None):
     """
-    encoded_input = loaded_tokenizer(
-        smiles,
-        padding='max_length',
+    Predict molecular properties for many SMILES strings at once.
+    
+    All SMILES are tokenized in a single call and padded to the longest
+    sequence instead of a fixed length. Forward passes run in chunks of
+    `batch_size`, each trimmed to its own longest sequence, and the label
+    scaler is applied once over the stacked outputs.
+    
+    Args:
+        smiles_list: List of SMILES strings
+        batch_size: Maximum number of molecules per forward pass
+        model: Regressor to use instead of the loaded one (e.g. fp32 reference)
+        
+    Returns:
+        List of dicts with predicted properties, in input order
+    """
+    smiles_list = list(smiles_list)
+    if not smiles_list:
+        return []
+    model = model if model is not None else models.model_chemberta
+
+    encoded_input = models.tokenizer_chemberta(
+        smiles_list,
+        padding='longest',
         truncation=True,
-        max_length=128,
+        max_length=CHEMBERTA_MAX_LENGTH,
         return_tensors="pt"
     )
 
-    input_ids = encoded_input['input_ids'].to(device)
-    attention_mask = encoded_input['attention_mask'].to(device)
-
-    with torch.no_grad():
-        predictions_scaled = loaded_model(input_ids, attention_mask).cpu().numpy()
-
-    predictions_original_scale = label_scaler.inverse_transform(predictions_scaled)
-    result = {
-        name: float(predictions_original_scale[0][i]) 
-        for i, name in enumerate(PROPERTY_NAMES)
-    }
-    return result
+    chunks = []
+    with torch.inference_mode():
+        for start in range(0, len(smiles_list), batch_size):
+            attention_mask = encoded_input['attention_mask'][start:start + batch_size]
+            length = int(attention_mask.sum(dim=1).max())
+            input_ids = encoded_input['input_ids'][start:start + batch_size, :length].to(device)
+            attention_mask = attention_mask[:, :length].to(device)
+            with record_scope("chemberta_forward"):
+                chunks.append(model(input_ids, attention_mask).float().cpu().numpy())
+
+    predictions_scaled = np.concatenate(chunks, axis=0)
+    predictions_original_scale = models.scaler.inverse_transform(predictions_scaled)
+    return [
+        {name: float(row[i]) for i, name in enumerate(PROPERTY_NAMES)}
+        for row in predictions_original_scale
+    ]
 
 
+def canonical_smiles(smiles):
+    """
+    Return the RDKit canonical form of a SMILES string.
+    
+    Falls back to the stripped input when RDKit is unavailable or the
+    SMILES cannot be parsed.
+    """
+    smiles = smiles.strip()
+    if Chem is None:
+        return smiles
+    try:
+        mol_obj = Chem.MolFromSmiles(smiles)
+    except Exception:
+        mol_obj = None
+    return Chem.MolToSmiles(mol_obj) if mol_obj is not None else smiles
 
-# ============================
-# STATE DEFINITION
-# ============================
 
-class ChemState(TypedDict, total=False):
-    """State for the molecule discovery pipeline."""
-    constraints: Dict[str, Any]  # e.g., {"mu": X, "alpha": Y, "gap": Z, "Cv": W, "max_atoms": N}
-    iteration: int
-    max_iterations: int
-    log: List[str]
-    prompt: str
-    candidates: List[Dict[str, Any]]
-    predictions: List[Dict[str, Any]]
-    cek_list: List[bool]
-    is_optimize: bool
-    llm_judge: List[str]
-    topk: List[Dict[str, Any]]
-    explanations: List[str]
-    embedding: List[Any]
-    search_results: List[Dict[str, Any]]
-    passed_constraints: bool
+def predict_properties_cached(smiles_list):
+    """
+    Predict properties, consulting the prediction cache before the model.
+    
+    Inputs are canonicalized, duplicates are predicted once, and only
+    cache misses are sent to ChemBERTa.
+    
+    Args:
+        smiles_list: List of SMILES strings
+        
+    Returns:
+        List of dicts with predicted properties, in input order
+    """
+    keys = [canonical_smiles(smiles) for smiles in smiles_list]
+    unique = list(dict.fromkeys(keys))
+    found = prediction_cache.get_many(unique)
+    misses = [key for key in unique if key not in found]
+    _record_cache_lookup(len(found), len(unique))
 
+    if misses:
+        start = time.perf_counter()
+        predictions = chemberta_batcher.run(misses)
+        _record_model_time("chemberta", time.perf_counter() - start)
+        fresh = dict(zip(misses, predictions))
+        prediction_cache.set_many(fresh)
+        found.update(fresh)
 
-# ============================
-# PIPELINE NODES - GENERATION
-# ============================
+    return [dict(found[key]) for key in keys]
 
 
-def generate_molecules(state: ChemState):
+def predict_properties(smiles):
     """
-    Generate molecule SMILES using MolT5 model.
+    Predict molecular properties from SMILES string.
     
     Args:
-        state: Current pipeline state
+        smiles: SMILES string representation of molecule
         
     Returns:
-        Updated state with generated candidates
+        Dict with predicted properties (mu, alpha, gap, Cv, num_atoms)
     """
-    constraints = state.get("constraints", {})
-    prompt_extra = state.get("prompt", "")
-    iteration = state.get("iteration", 0)
+    return predict_properties_cached([smiles])[0]
+
+
+def predict_properties_unique(smiles_list):
+    """
+    predict_properties_batch over the distinct SMILES only.
     
-    # Build caption from constraints
-    caption_parts = [f"{key}={item}" for key, item in constraints.items()]
-    caption = "properties: " + ", ".join(caption_parts)
-    if prompt_extra:
-        caption += " additional info: " + prompt_extra
+    Merged micro-batches from concurrent pipelines often share molecules,
+    so each one is predicted once and the result copied to every caller.
+    """
+    smiles_list = list(smiles_list)
+    unique = list(dict.fromkeys(smiles_list))
+    if len(unique) == len(smiles_list):
+        return predict_properties_batch(smiles_list)
+    found = dict(zip(unique, predict_properties_batch(unique)))
+    return [dict(found[smiles]) for smiles in smiles_list]
+
+
+# Shared schedulers: concurrent callers are merged into one forward pass
+chemberta_batcher = MicroBatcher(
+    predict_properties_unique,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    name="chemberta",
+    enabled=INFERENCE_BATCHING,
+)
+t5_encoder_batcher = MicroBatcher(
+    generate_embedding_batch,
+    max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    name="t5_encoder",
+    enabled=INFERENCE_BATCHING,
+)
+
+
+prediction_cache = TieredCache(
+    maxsize=PREDICTION_CACHE_SIZE,
+    path=PREDICTION_CACHE_DB or None,
+    table="predictions",
+    # Quantized outputs differ slightly from fp32, so backends never share entries
+    namespace=MODEL_CHEMBERTA_HUB if CHEMBERTA_BACKEND == "torch" else f"{MODEL_CHEMBERTA_HUB}:{CHEMBERTA_BACKEND}",
+    name="predictions",
+)
+
+
+def inference_stats():
+    """Return queue depth and batch-size stats for the inference schedulers."""
+    return {
+        "chemberta": chemberta_batcher.stats(),
+        "t5_encoder": t5_encoder_batcher.stats(),
+        "t5_generate": t5_generate_batcher.stats(),
+        **backend_info({"chemberta": CHEMBERTA_BACKEND, "t5": T5_BACKEND}),
+    }
 
-    try:
-        input_ids = tokenizer_t5(caption, return_tensors="pt").input_ids
-
-        with torch.no_grad():
-            outputs = model_t5.generate(
-                input_ids,
-                max_length=256,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.8,
-                num_return_sequences=5,
-            )
 
-        smiles_list = []
-        for out in outputs:
-            text = tokenizer_t5.decode(out, skip_special_tokens=True).strip()
-            splitted = [s.strip() for s in re.split(r'[\n;]+', text) if s.strip()]
-            smiles_list.extend(splitted)
+embedding_cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE, name="embeddings")
 
-        # Remove duplicates
-        smiles_list = list(set(smiles_list))
-        candidates = [{"smiles": s} for s in smiles_list]
 
-    except Exception as e:
-        candidates = []
-        return {
-            "candidates": candidates,
-            "log": [f"generate_molecules failed: {e}"]
-        }
+pipeline_cache = TieredCache(
+    maxsize=PIPELINE_CACHE_SIZE,
+    path=(PIPELINE_CACHE_DB or None) if PIPELINE_CACHE_SIZE > 0 else None,
+    table="pipeline_results",
+    # Results depend on both models and their backends
+    namespace=f"{MODEL_T5_HUB}:{T5_BACKEND}|{MODEL_CHEMBERTA_HUB}:{CHEMBERTA_BACKEND}",
+    name="pipeline",
+    ttl_seconds=PIPELINE_CACHE_TTL,
+)
+
 
+def cache_stats():
+    """Return hit/miss counters for the pipeline caches."""
     return {
-        "candidates": candidates,
-        "iteration": iteration + 1,
-        "log": [f"Generated {len(candidates)} candidate molecules"]
+        "pipeline": pipeline_cache.stats(),
+        "predictions": prediction_cache.stats(),
+        "embeddings": embedding_cache.stats(),
     }
 
 
-def filter_molecules(state: ChemState):
+# ============================
+# METRICS
+# ============================
+
+metrics_registry = Registry()
+
+NODE_SECONDS = metrics_registry.histogram(
+    "pipeline_node_seconds", "Wall time of each pipeline node", ["node"]
+)
+NODE_ERRORS = metrics_registry.counter(
+    "pipeline_node_errors_total", "Pipeline nodes that raised", ["node"]
+)
+NODE_CANDIDATES = metrics_registry.histogram(
+    "pipeline_node_candidates", "Candidates written by a node", ["node"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+MODEL_SECONDS = metrics_registry.histogram(
+    "pipeline_model_seconds", "Time spent in model inference, including micro-batch queueing", ["model"]
+)
+LLM_SECONDS = metrics_registry.histogram("pipeline_llm_seconds", "LLM call latency")
+LLM_CALLS = metrics_registry.counter("pipeline_llm_calls_total", "LLM calls")
+LLM_TOKENS = metrics_registry.counter("pipeline_llm_tokens_total", "LLM tokens used", ["kind"])
+PIPELINE_RUNS = metrics_registry.counter(
+    "pipeline_runs_total", "Pipeline runs by result-cache outcome", ["cache"]
+)
+
+
+def _cache_metric(field):
+    return lambda: {(name,): stats[field] for name, stats in cache_stats().items()}
+
+
+metrics_registry.gauge_callback(
+    "pipeline_cache_hits_total", "Cache hits", _cache_metric("hits"), ["cache"], kind="counter"
+)
+metrics_registry.gauge_callback(
+    "pipeline_cache_misses_total", "Cache misses", _cache_metric("misses"), ["cache"], kind="counter"
+)
+metrics_registry.gauge_callback(
+    "pipeline_cache_entries", "Entries held in memory", _cache_metric("size"), ["cache"]
+)
+
+
+def render_metrics() -> str:
+    """Return all pipeline metrics in the Prometheus text format."""
+    return metrics_registry.render()
+
+
+# Per-node counters of the node currently running in this context
+_node_stats: "contextvars.ContextVar[Optional[Dict[str, float]]]" = contextvars.ContextVar(
+    "node_stats", default=None
+)
+
+
+def _add_node_stat(key: str, value: float):
+    stats = _node_stats.get()
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + value
+
+
+def _record_model_time(model: str, seconds: float):
+    MODEL_SECONDS.labels(model=model).observe(seconds)
+    _add_node_stat("model_ms", seconds * 1000.0)
+
+
+def _record_cache_lookup(hits: int, lookups: int):
+    _add_node_stat("cache_hits", hits)
+    _add_node_stat("cache_lookups", lookups)
+
+
+def _token_usage(response) -> Tuple[int, int]:
+    """Return (input, output) tokens from a langchain message, or zeros."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return int(usage.get("prompt_tokens", 0) or 0), int(usage.get("completion_tokens", 0) or 0)
+
+
+def _record_llm_call(response, seconds: float):
+    input_tokens, output_tokens = _token_usage(response)
+    LLM_CALLS.inc()
+    LLM_SECONDS.observe(seconds)
+    LLM_TOKENS.labels(kind="input").inc(input_tokens)
+    LLM_TOKENS.labels(kind="output").inc(output_tokens)
+    _add_node_stat("llm_calls", 1)
+    _add_node_stat("llm_ms", seconds * 1000.0)
+    _add_node_stat("llm_input_tokens", input_tokens)
+    _add_node_stat("llm_output_tokens", output_tokens)
+
+
+def _node_record(name: str, update: Any, stats: Dict[str, float], seconds: float) -> Dict[str, Any]:
+    NODE_SECONDS.labels(node=name).observe(seconds)
+    record = {"node": name, "ms": round(seconds * 1000.0, 3)}
+    candidates = update.get("candidates") if isinstance(update, dict) else None
+    if isinstance(candidates, (list, CandidateTable)):
+        NODE_CANDIDATES.labels(node=name).observe(len(candidates))
+        record["candidates"] = len(candidates)
+    record.update({key: round(value, 3) for key, value in stats.items()})
+    return record
+
+
+def instrument_node(name: str, func: Callable) -> Callable:
     """
-    Filter molecules by chemical validity using RDKit.
+    Wrap a node function to record its metrics.
+    
+    The wrapper times the node, collects model time, LLM calls and tokens
+    and cache hits recorded while it runs, and appends one record to the
+    ``node_metrics`` state key. Sync nodes of a profiled request that run
+    on worker threads are also put under cProfile. Sync and async nodes
+    are both supported.
     
     Args:
-        state: Current pipeline state
+        name: Node name
+        func: Node function taking the state
         
     Returns:
-        Updated state with valid candidates only
+        Wrapped node function with the same signature
     """
-    candidates = state.get("candidates", [])
-    filtered: List[Dict[str, Any]] = []
-    
-    if Chem is None:
-        return {
-            "candidates": filtered,
-            "log": ["RDKit not available: skipping filter"]
-        }
-
-    for cand in candidates:
-        smiles = cand.get("smiles") if isinstance(cand, dict) else cand
-        if not smiles:
-            continue
+    def finish(update, stats, start):
+        record = _node_record(name, update, stats, time.perf_counter() - start)
+        if isinstance(update, dict):
+            update = {**update, "node_metrics": [record]}
+        return update
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapped(state):
+            stats: Dict[str, float] = {}
+            token = _node_stats.set(stats)
+            start = time.perf_counter()
+            try:
+                update = await func(state)
+            except Exception:
+                NODE_ERRORS.labels(node=name).inc()
+                raise
+            finally:
+                _node_stats.reset(token)
+            return finish(update, stats, start)
+        return async_wrapped
+
+    @functools.wraps(func)
+    def wrapped(state):
+        stats: Dict[str, float] = {}
+        token = _node_stats.set(stats)
+        start = time.perf_counter()
         try:
-            mol_obj = Chem.MolFromSmiles(smiles)
-            if mol_obj is not None:
-                filtered.append(dict(cand))
+            with thread_scope():
+                update = func(state)
         except Exception:
-            continue
+            NODE_ERRORS.labels(node=name).inc()
+            raise
+        finally:
+            _node_stats.reset(token)
+        return finish(update, stats, start)
+    return wrapped
 
-    return {
-        "candidates": filtered,
-        "log": [f"Filtered to {len(filtered)} valid molecules"]
-    }
 
+# Per-node fields added up by summarize_node_metrics
+NODE_METRIC_FIELDS = (
+    "ms", "model_ms", "llm_calls", "llm_ms", "llm_input_tokens", "llm_output_tokens",
+    "cache_hits", "cache_lookups",
+)
 
-def predict_step(state: ChemState):
+
+def summarize_node_metrics(records: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
-    Predict QM9 properties for each candidate molecule.
+    Aggregate per-node metric records into a per-request summary.
     
     Args:
-        state: Current pipeline state
+        records: ``node_metrics`` entries from the final state
         
     Returns:
-        Updated state with predictions
+        Dict with per-node totals (calls, time, last candidate count, ...)
+        and request totals. Branch nodes overlap in time, so node times do
+        not add up to the request's wall time.
     """
-    candidates = state.get("candidates", [])
-    predictions = []
-    
-    for cand in candidates:
-        smiles = cand.get("smiles")
-        try:
-            pred = predict_properties(smiles)
-        except Exception as e:
-            pred = {"error": str(e)}
-        predictions.append(pred)
-
-    return {
-        "predictions": predictions,
-        "log": [f"Predicted properties for {len(predictions)} molecules"]
-    }
+    nodes: Dict[str, Dict[str, Any]] = {}
+    totals = {field: 0.0 for field in NODE_METRIC_FIELDS if field != "ms"}
+    for record in records or []:
+        entry = nodes.setdefault(record["node"], {"calls": 0})
+        entry["calls"] += 1
+        for field in NODE_METRIC_FIELDS:
+            if field in record:
+                entry[field] = round(entry.get(field, 0) + record[field], 3)
+                if field in totals:
+                    totals[field] += record[field]
+        if "candidates" in record:
+            entry["candidates"] = record["candidates"]
+
+    totals = {key: round(value, 3) for key, value in totals.items()}
+    totals["cache_hit_rate"] = (
+        round(totals["cache_hits"] / totals["cache_lookups"], 3) if totals["cache_lookups"] else None
+    )
+    return {"nodes": nodes, "totals": totals}
 
 
-def evaluate_step(state: ChemState):
+def call_llm(prompt: str) -> str:
     """
-    Evaluate predictions against constraints using LLM.
+    Send a prompt to the LLM and return the response text.
     
     Args:
-        state: Current pipeline state
+        prompt: Prompt text
         
     Returns:
-        Updated state with evaluation results and optimization flag
+        Response content as a string
     """
-    predictions = state.get("predictions", [])
-    candidates = state.get("candidates", [])
-    constraints = state.get("constraints", {})
+    llm = models.llm
+    start = time.perf_counter()
+    response = llm.invoke(prompt) if hasattr(llm, "invoke") else llm.generate(prompt)
+    _record_llm_call(response, time.perf_counter() - start)
+    return getattr(response, "content", str(response))
 
-    cek_list: List[bool] = []
-    llm_judge: List[str] = []
 
-    if not candidates:
-        return {
-            "cek_list": cek_list,
-            "llm_judge": llm_judge,
-            "is_optimize": True,
-            "passed_constraints": False,
-            "log": ["No candidates to evaluate"]
-        }
+# asyncio primitives belong to one event loop, so keep a semaphore per loop
+_llm_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
 
-    # Build single prompt for all candidates
-    prompt = (
-        f"Evaluate the following molecules against QM9 constraints.\n"
-        f"Constraints: {constraints}\n\n"
-        "For each molecule below, answer with:\n"
-        "1. Whether it meets all constraints (Yes/No)\n"
-        "2. A one-sentence justification\n\n"
-        "Molecules:\n"
-    )
-    
-    for idx, cand in enumerate(candidates):
-        smiles = cand.get("smiles")
-        pred = predictions[idx] if idx < len(predictions) else {}
-        prompt += f"{idx+1}. SMILES: {smiles} | Predicted Properties: {pred}\n"
-    
-    prompt += "\nProvide your evaluation for each molecule in order (1, 2, 3, ...)."
-    
-    try:
-        response = llm.invoke(prompt) if hasattr(llm, "invoke") else llm.generate(prompt)
-        content = getattr(response, "content", str(response))
-        
-        # Split response by lines and parse each molecule's evaluation
-        lines = content.split('\n')
-        current_eval = ""
-        
-        for line in lines:
-            line_lower = line.lower()
-            # Check if this line contains evaluation for a molecule
-            if any(str(i) in line[:5] for i in range(1, len(candidates) + 1)):
-                if current_eval:
-                    # Process previous evaluation
-                    is_ok = any(token in current_eval.lower() for token in ["yes", "true", "meets", "satisfi", "suitable", "pass"])
-                    cek_list.append(bool(is_ok))
-                    llm_judge.append(current_eval[:400])
-                current_eval = line
-            else:
-                current_eval += " " + line
-        
-        # Process last evaluation
-        if current_eval:
-            is_ok = any(token in current_eval.lower() for token in ["yes", "true", "meets", "satisfi", "suitable", "pass"])
-            cek_list.append(bool(is_ok))
-            llm_judge.append(current_eval[:400])
-        
-        # Ensure we have evaluations for all candidates
-        while len(cek_list) < len(candidates):
-            cek_list.append(False)
-            llm_judge.append("No evaluation found")
-            
-    except Exception as e:
-        # Fallback: mark all as failed
-        for _ in candidates:
-            cek_list.append(False)
-            llm_judge.append(f"Evaluation error: {e}")
 
-    passed_constraints = sum(cek_list) >= 3
-    is_optimize = not passed_constraints
+def _llm_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
 
-    return {
-        "cek_list": cek_list,
-        "llm_judge": llm_judge,
-        "is_optimize": is_optimize,
-        "passed_constraints": passed_constraints,
-        "log": [f"Evaluation complete. Passed: {passed_constraints}, Optimize: {is_optimize}"]
-    }
 
-
-def optimize_step(state: ChemState):
+async def acall_llm(prompt: str, timeout: float = LLM_TIMEOUT) -> str:
     """
-    Generate improved prompt using LLM based on failed candidates.
+    Async version of call_llm.
+    
+    At most LLM_MAX_CONCURRENCY calls are outstanding at once; the rest wait
+    on a shared semaphore without holding a thread. Each call is cancelled
+    after `timeout` seconds.
     
     Args:
-        state: Current pipeline state
+        prompt: Prompt text
+        timeout: Per-call timeout in seconds
         
     Returns:
-        Updated state with new generation prompt
+        Response content as a string
     """
-    candidates = state.get("candidates", [])
-    predictions = state.get("predictions", [])
-    llm_judge = state.get("llm_judge", [])
-    cek_list = state.get("cek_list", [])
-    constraints = state.get("constraints", {})
-
-    prompt = (
-        "We want to generate new molecules that better satisfy the following QM9 constraints:\n"
-        f"Constraints: {constraints}\n\n"
-        f"Current candidates and status:\n"
-    )
+    llm = models.llm
+    async with _llm_semaphore():
+        if hasattr(llm, "ainvoke"):
+            start = time.perf_counter()
+            response = await asyncio.wait_for(llm.ainvoke(prompt), timeout=timeout)
+            _record_llm_call(response, time.perf_counter() - start)
+        else:
+            return await asyncio.wait_for(asyncio.to_thread(call_llm, prompt), timeout=timeout)
+    return getattr(response, "content", str(response))
+
+
+def warm_up_models():
+    """
+    Run one small forward pass through each model.
     
-    for idx, cand in enumerate(candidates):
-        smiles = cand.get("smiles")
-        pred = predictions[idx] if idx < len(predictions) else {}
-        status = "OK" if (cek_list[idx] if idx < len(cek_list) else False) else "FAIL"
-        judge = llm_judge[idx] if idx < len(llm_judge) else ""
-        prompt += f"- {smiles} | Status: {status} | Predicted: {pred} | Judge: {judge}\n"
+    Bypasses the schedulers and caches so warm-up inputs never show up in
+    their stats.
+    """
+    predict_properties_batch(["CCO"])
+    generate_embedding_batch(["properties: mu=2.5, alpha=70, gap=0.3, Cv=30, max_atoms=20"])
+    input_ids = models.tokenizer_t5("properties: mu=2.5", return_tensors="pt").input_ids
+    with torch.inference_mode():
+        models.model_t5.generate(input_ids, max_length=8)
 
-    prompt += (
-        "\nProvide:\n"
-        "1) A short explanation of why candidates failed (one sentence each if possible).\n"
-        "2) A concrete generation prompt for MolT5 that increases the chance of meeting "
-        "the constraints. Keep prompt concise and machine-friendly.\n"
-    )
 
-    try:
-        response = llm.invoke(prompt) if hasattr(llm, "invoke") else llm.generate(prompt)
-        content = getattr(response, "content", str(response))
-    except Exception as e:
-        content = f"LLM optimize_step failed: {e}"
+def start_model_warmup():
+    """Load all models and warm them up in a background thread."""
+    return models.start_background(warmup=warm_up_models)
+
+
+def start_validation_pool():
+    """Start the process pool for large candidate sets; call once at startup."""
+    workers = VALIDATION_WORKERS or os.cpu_count() or 1
+    if Chem is None or workers < 2:
+        return None
+    return start_pool(workers)
+
+
+def stop_validation_pool():
+    """Terminate the validation process pool, if it was started."""
+    stop_pool()
+
+
+def model_status():
+    """Return per-component readiness and load times."""
+    return models.status()
+
+
+
+# ============================
+# STATE DEFINITION
+# ============================
+
+class ChemState(TypedDict, total=False):
+    """State for the molecule discovery pipeline."""
+    constraints: Dict[str, Any]  # e.g., {"mu": X, "alpha": Y, "gap": Z, "Cv": W, "max_atoms": N}
+    iteration: int
+    max_iterations: int
+    log: Annotated[List[str], operator.add]  # Every node appends its own entries
+    prompt: str
+    candidates: CandidateTable  # Current iteration's new molecules, predictions and verdicts
+    pool: CandidateTable  # Every evaluated molecule so far, one row per canonical SMILES
+    is_optimize: bool
+    topk: CandidateTable  # Ranked molecules, then search hits and explanations
+    embedding: List[Any]
+    search_results: List[Dict[str, Any]]
+    passed_constraints: bool
+    top_k: int
+    rank_weights: Dict[str, float]
+    generation_stats: List[Dict[str, Any]]  # Per-round yield from adaptive generation
+    seed: Optional[int]  # Base seed for MolT5 sampling, None = unseeded
+    node_metrics: Annotated[List[Dict[str, Any]], operator.add]  # One record per node run
+
+
+class SearchBranchInput(TypedDict, total=False):
+    """Keys the encode/search branch reads from the parent state."""
+    constraints: Dict[str, Any]
+
+
+class SearchBranchOutput(TypedDict, total=False):
+    """Keys the encode/search branch writes back to the parent state."""
+    log: Annotated[List[str], operator.add]
+    embedding: List[Any]
+    search_results: List[Dict[str, Any]]
+    node_metrics: Annotated[List[Dict[str, Any]], operator.add]
+
+
+class GenerationBranchInput(TypedDict, total=False):
+    """Keys the generation loop reads from the parent state."""
+    constraints: Dict[str, Any]
+    iteration: int
+    max_iterations: int
+    prompt: str
+    top_k: int
+    rank_weights: Dict[str, float]
+    seed: Optional[int]
+
+
+class GenerationBranchOutput(TypedDict, total=False):
+    """Keys the generation loop writes back to the parent state."""
+    log: Annotated[List[str], operator.add]
+    iteration: int
+    prompt: str
+    candidates: CandidateTable
+    pool: CandidateTable
+    is_optimize: bool
+    topk: CandidateTable
+    passed_constraints: bool
+    generation_stats: List[Dict[str, Any]]
+    node_metrics: Annotated[List[Dict[str, Any]], operator.add]
+
 
+def make_initial_state(constraints: Dict[str, Any], max_iterations: int = 1,
+                       top_k: int = RANK_TOP_K,
+                       rank_weights: Optional[Dict[str, float]] = None,
+                       seed: Optional[int] = None) -> ChemState:
+    """
+    Build the initial pipeline state for a request.
+    
+    Args:
+        constraints: Dictionary of molecular property constraints
+        max_iterations: Maximum number of optimization iterations
+        top_k: Number of generated candidates kept by rank_step
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base seed for MolT5 sampling, None = unseeded
+        
+    Returns:
+        ChemState with every key initialized
+    """
     return {
-        "prompt": content,
-        "log": ["Generated optimization prompt for next iteration"]
+        "seed": seed,
+        "top_k": top_k,
+        "rank_weights": dict(rank_weights or RANK_WEIGHTS),
+        "constraints": constraints,
+        "max_iterations": max_iterations,
+        "iteration": 0,
+        "log": [],
+        "prompt": "",
+        "candidates": CandidateTable.empty(PROPERTY_NAMES),
+        "pool": CandidateTable.empty(PROPERTY_NAMES),
+        "is_optimize": False,
+        "topk": CandidateTable.empty(PROPERTY_NAMES),
+        "embedding": [],
+        "search_results": [],
+        "passed_constraints": False,
+        "node_metrics": [],
     }
 
 
-def rank_step(state: ChemState):
+def _candidate_table(state: ChemState, key: str = "candidates") -> CandidateTable:
+    """Return a state key as a CandidateTable, converting lists of candidate dicts."""
+    value = state.get(key)
+    if isinstance(value, CandidateTable):
+        return value
+    return CandidateTable.from_records(value or [], PROPERTY_NAMES)
+
+
+# ============================
+# PIPELINE NODES - GENERATION
+# ============================
+
+
+def _generation_caption(state: ChemState) -> str:
+    constraints = state.get("constraints", {})
+    prompt_extra = state.get("prompt", "")
+
+    caption = query_caption(constraints)
+    if prompt_extra:
+        caption += " additional info: " + prompt_extra
+    return caption
+
+
+def _grammar_max_atoms(state: ChemState) -> Optional[int]:
+    if not GENERATION_GRAMMAR_MAX_ATOMS:
+        return None
+    # Same cap the filter enforces
+    return atom_limit(state.get("constraints", {}).get("max_atoms"))
+
+
+def _sampling_seed(state: ChemState, round_index: int = 0) -> Optional[int]:
+    seed = state.get("seed")
+    if seed is None:
+        return None
+    # A distinct, reproducible stream per iteration and adaptive round
+    return (int(seed) * 1_000_003 + state.get("iteration", 0) * 1_009 + round_index) % 2**32
+
+
+def sample_smiles(caption: str, num_samples: int, grammar: bool = False,
+                  max_atoms: Optional[int] = None, seed: Optional[int] = None) -> List[str]:
     """
-    Rank candidates by evaluation score.
+    Sample SMILES strings from MolT5 for one caption.
+    
+    Concurrent callers are merged into one padded generate call. Each
+    sequence draws from its own generator, so a seeded call returns the
+    same molecules whoever it is batched with.
     
     Args:
-        state: Current pipeline state
+        caption: "properties: ..." caption
+        num_samples: Sequences to sample
+        grammar: Mask tokens that would make the SMILES unparseable
+        max_atoms: With grammar, also cap the heavy-atom count
+        seed: Seed for this call's sequences (None = fresh random seed)
         
     Returns:
-        Updated state with top-k ranked molecules
+        Decoded SMILES strings (may contain invalid or duplicate entries)
     """
-    candidates = state.get("candidates", [])
-    predictions = state.get("predictions", [])
-    cek_list = state.get("cek_list", [])
+    return _sample_many([(caption, num_samples, grammar, max_atoms, seed)])[0]
+
+
+def _sample_many(requests: List[Tuple[str, int, bool, Optional[int], Optional[int]]]) -> List[List[str]]:
+    """sample_smiles_batch through the shared scheduler, as one submission."""
+    start = time.perf_counter()
+    results = t5_generate_batcher.run(requests)
+    _record_model_time("t5_generate", time.perf_counter() - start)
+    return results
+
+
+def _generate_smiles(model, captions: List[str], num_samples: int, grammar: bool,
+                     max_atoms: Optional[int], seeds: List[Optional[int]]) -> List[List[str]]:
+    """Sample num_samples sequences per caption in one padded generate call."""
+    inputs = models.tokenizer_t5(captions, return_tensors="pt", padding=True)
+
+    # Sampling is greedy decoding over Gumbel-perturbed scores, with one
+    # generator per sequence instead of torch's process-wide RNG
+    logits_processor = LogitsProcessorList()
+    if grammar:
+        # Fresh processor per call; it tracks the prefixes of this batch
+        logits_processor.append(grammar_processor(models.tokenizer_t5, model.config, max_atoms=max_atoms))
+    logits_processor.extend(sampling_processors(
+        row_seeds(seeds, num_samples), temperature=0.8, top_k=50, top_p=0.95
+    ))
+
+    # Greedy generate has no num_return_sequences, so repeat each caption's
+    # row num_samples times; its sequences stay contiguous in the output
+    with torch.no_grad(), record_scope("t5_generate"):
+        outputs = model.generate(
+            input_ids=inputs.input_ids.repeat_interleave(num_samples, dim=0),
+            attention_mask=inputs.attention_mask.repeat_interleave(num_samples, dim=0),
+            max_length=256,
+            do_sample=False,
+            num_beams=1,
+            logits_processor=logits_processor,
+        )
 
-    scored: List[Dict[str, Any]] = []
-    for i, cand in enumerate(candidates):
-        score = 1 if (cek_list[i] if i < len(cek_list) else False) else 0
-        pred = predictions[i] if i < len(predictions) else {}
-        scored.append({"candidate": cand, "score": score, "pred": pred})
+    texts = models.tokenizer_t5.batch_decode(outputs, skip_special_tokens=True)
+    results = []
+    for i in range(len(captions)):
+        smiles_list = []
+        for text in texts[i * num_samples:(i + 1) * num_samples]:
+            smiles_list.extend(s.strip() for s in re.split(r'[\n;]+', text.strip()) if s.strip())
+        results.append(smiles_list)
+    return results
 
-    # Sort by score descending
-    scored_sorted = sorted(scored, key=lambda x: x["score"], reverse=True)
-    topk = [item["candidate"] for item in scored_sorted[:3]]
 
-    return {
-        "topk": topk,
-        "log": [f"Ranked top {len(topk)} molecules"]
-    }
+def sample_smiles_batch(requests: List[Tuple[str, int, bool, Optional[int], Optional[int]]]) -> List[List[str]]:
+    """
+    Sample SMILES for several captions with as few generate calls as possible.
+    
+    Requests that share num_samples and grammar settings are padded into
+    one generate call of up to GENERATION_MAX_BATCH_CAPTIONS captions.
+    Which calls a request lands in does not change its samples.
+    
+    Args:
+        requests: (caption, num_samples, grammar, max_atoms, seed) tuples
+        
+    Returns:
+        Decoded SMILES strings for each request, in input order
+    """
+    model = models.model_t5
+    groups: Dict[Tuple[int, bool, Optional[int]], List[int]] = {}
+    for i, (_, num_samples, grammar, max_atoms, _) in enumerate(requests):
+        groups.setdefault((num_samples, grammar, max_atoms if grammar else None), []).append(i)
+
+    results: List[List[str]] = [[] for _ in requests]
+    chunk = max(1, GENERATION_MAX_BATCH_CAPTIONS)
+    for (num_samples, grammar, max_atoms), indices in groups.items():
+        for start in range(0, len(indices), chunk):
+            part = indices[start:start + chunk]
+            sampled = _generate_smiles(
+                model, [requests[i][0] for i in part], num_samples, grammar, max_atoms,
+                [requests[i][4] for i in part],
+            )
+            for i, smiles_list in zip(part, sampled):
+                results[i] = smiles_list
+    return results
 
 
-# ============================
-# PIPELINE NODES - SEARCH
-# ============================
+t5_generate_batcher = MicroBatcher(
+    sample_smiles_batch,
+    max_batch_size=GENERATION_MAX_BATCH_CAPTIONS,
+    max_wait_ms=INFERENCE_MAX_WAIT_MS,
+    name="t5_generate",
+    enabled=GENERATION_BATCHING,
+)
 
 
-def encode_step(state: ChemState):
+def _sampling_request(state: ChemState, num_samples: int, round_index: int = 0):
+    """The (caption, num_samples, grammar, max_atoms, seed) request for one sampling call."""
+    return (
+        _generation_caption(state), num_samples, GENERATION_GRAMMAR,
+        _grammar_max_atoms(state), _sampling_seed(state, round_index),
+    )
+
+
+def _generated(state: ChemState, smiles_list: Optional[List[str]] = None,
+               error: Optional[Exception] = None):
+    """State update for one fixed-mode generation round."""
+    # Failed rounds still count, so the optimize loop always terminates
+    iteration = state.get("iteration", 0)
+    if error is not None:
+        return {
+            "candidates": CandidateTable.empty(PROPERTY_NAMES),
+            "iteration": iteration + 1,
+            "log": [f"generate_molecules failed: {error}"]
+        }
+
+    # Remove duplicates, keeping sample order so seeded runs repeat exactly
+    candidates = CandidateTable.from_smiles(
+        list(dict.fromkeys(smiles_list)), PROPERTY_NAMES, iteration=iteration + 1
+    )
+    return {
+        "candidates": candidates,
+        "iteration": iteration + 1,
+        "log": [f"Generated {len(candidates)} candidate molecules"]
+    }
+
+
+def generate_molecules(state: ChemState):
     """
-    Encode constraints to embedding vector.
+    Generate molecule SMILES using MolT5 model.
     
     Args:
         state: Current pipeline state
         
     Returns:
-        Updated state with embedding
+        Updated state with generated candidates
     """
-    constraints = state.get("constraints", {})
-    caption_parts = [f"{k}={v}" for k, v in constraints.items()]
-    caption = "properties: " + ", ".join(caption_parts)
-
+    caption, num_samples, grammar, max_atoms, seed = _sampling_request(state, GENERATION_BATCH_SIZE)
     try:
-        emb = generate_embedding({'input': caption})
-        embedding = emb if isinstance(emb, (list, tuple)) else getattr(emb, "tolist", lambda: emb)()
+        smiles_list = sample_smiles(caption, num_samples, grammar=grammar, max_atoms=max_atoms, seed=seed)
     except Exception as e:
-        embedding = []
+        return _generated(state, error=e)
+    return _generated(state, smiles_list)
+
+
+class _AdaptiveSampling:
+    """
+    Round-by-round bookkeeping of adaptive generation for one state.
+    
+    adaptive_generate_molecules drives one of these with sample_smiles;
+    the batch path drives one per constraint set and samples the rounds
+    of all of them in shared generate calls.
+    """
+
+    def __init__(self, state: ChemState):
+        self.state = state
+        self.start = time.perf_counter()
+        self.deadline = self.start + GENERATION_DEADLINE_MS / 1000.0 if GENERATION_DEADLINE_MS > 0 else None
+        self.seen = set(_candidate_table(state, "pool").smiles)
+        self.unique: Dict[str, None] = {}
+        self.rounds: List[Dict[str, Any]] = []
+        self.sampled = 0
+        self.error: Optional[Exception] = None
+
+    def next_request(self):
+        """The next round's sampling request, or None once sampling is over."""
+        if self.error is not None:
+            return None
+        if len(self.unique) >= GENERATION_TARGET_VALID or self.sampled >= GENERATION_MAX_SAMPLES:
+            return None
+        if self.deadline is not None and self.rounds and time.perf_counter() >= self.deadline:
+            return None
+        batch = min(GENERATION_BATCH_SIZE, GENERATION_MAX_SAMPLES - self.sampled)
+        return _sampling_request(self.state, batch, len(self.rounds))
+
+    def fail(self, error: Exception):
+        """Stop sampling; rounds already drawn are kept."""
+        self.error = error
+
+    def add_round(self, num_samples: int, smiles_list: List[str]):
+        """Count a round's valid and new unique molecules."""
+        self.sampled += num_samples
+
+        valid = 0
+        new_unique = 0
+        for smiles in smiles_list:
+            if Chem is None:
+                key = smiles
+            else:
+                mol_obj = Chem.MolFromSmiles(smiles)
+                if mol_obj is None:
+                    continue
+                key = Chem.MolToSmiles(mol_obj)
+            valid += 1
+            if key not in self.unique and key not in self.seen:
+                self.unique[key] = None
+                new_unique += 1
+
+        self.rounds.append({
+            "round": len(self.rounds) + 1,
+            "sequences": num_samples,
+            "decoded": len(smiles_list),
+            "valid": valid,
+            "new_unique": new_unique,
+            "validity": round(valid / len(smiles_list), 3) if smiles_list else 0.0,
+            "uniqueness": round(new_unique / valid, 3) if valid else 0.0,
+            "total_unique": len(self.unique),
+            "elapsed_ms": round((time.perf_counter() - self.start) * 1000.0, 1),
+        })
+
+    def update(self):
+        """State update with the canonical candidates and per-round yield stats."""
+        if self.error is not None and not self.rounds:
+            return _generated(self.state, error=self.error)
+
+        if self.error is not None:
+            stop = f"sampling failed: {self.error}"
+        elif len(self.unique) >= GENERATION_TARGET_VALID:
+            stop = "target reached"
+        elif self.sampled >= GENERATION_MAX_SAMPLES:
+            stop = "sample budget exhausted"
+        else:
+            # Sampling only ends early on an error or an expired deadline
+            stop = "deadline reached"
+
+        log = [
+            f"Round {r['round']}: {r['valid']}/{r['decoded']} valid, {r['new_unique']} new unique "
+            f"({r['total_unique']} total)"
+            for r in self.rounds
+        ]
+        if self.error is not None:
+            log.append(f"Round {len(self.rounds) + 1}: generate_molecules failed: {self.error}")
+        log.append(f"Generated {len(self.unique)} valid unique molecules from {self.sampled} samples ({stop})")
+
+        iteration = self.state.get("iteration", 0)
         return {
-            "embedding": embedding,
-            "log": [f"encode_step failed: {e}"]
+            "candidates": CandidateTable.from_smiles(list(self.unique), PROPERTY_NAMES, iteration=iteration + 1),
+            "iteration": iteration + 1,
+            "generation_stats": self.rounds,
+            "log": log
         }
 
-    return {
-        "embedding": embedding,
-        "log": [f"Encoded constraints to embedding (dim={len(embedding)})"]
-    }
+
+def adaptive_generate_molecules(state: ChemState):
+    """
+    Sample MolT5 in rounds until enough valid, unique molecules exist.
+    
+    Each round draws GENERATION_BATCH_SIZE sequences and keeps those RDKit
+    parses, deduplicated on canonical SMILES; molecules already in the
+    pool from earlier iterations do not count. Sampling stops at
+    GENERATION_TARGET_VALID new unique molecules, GENERATION_MAX_SAMPLES
+    drawn sequences or GENERATION_DEADLINE_MS, whichever comes first.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with canonical candidates and per-round yield stats
+    """
+    sampling = _AdaptiveSampling(state)
+    while True:
+        request = sampling.next_request()
+        if request is None:
+            break
+        caption, num_samples, grammar, max_atoms, seed = request
+        try:
+            smiles_list = sample_smiles(caption, num_samples, grammar=grammar, max_atoms=max_atoms, seed=seed)
+        except Exception as e:
+            sampling.fail(e)
+        else:
+            sampling.add_round(num_samples, smiles_list)
+    return sampling.update()
 
 
-def search_step(state: ChemState):
+def filter_molecules(state: ChemState):
     """
-    Search similar molecules in vector database.
+    Validate, canonicalize and pre-filter molecules using RDKit.
+    
+    Invalid SMILES are dropped, survivors are rewritten to canonical SMILES
+    and deduplicated (VALIDATION_DEDUPE), and molecules with more heavy
+    atoms than the max_atoms constraint never reach the predictor.
+    Molecules already in the pool were scored in an earlier iteration and
+    are dropped too, so only new ones are predicted and evaluated.
     
     Args:
         state: Current pipeline state
         
     Returns:
-        Updated state with search results
+        Updated state with valid, unique, new candidates and their descriptors
     """
-    embedding = state.get("embedding", [])
+    candidates = _candidate_table(state)
+    filtered = CandidateTable.empty(PROPERTY_NAMES)
     
-    if not embedding:
+    if Chem is None:
         return {
-            "search_results": [], 
-            "log": ["No embedding available, skipping search"]
+            "candidates": filtered,
+            "log": ["RDKit not available: skipping filter"]
         }
 
+    max_atoms = None
+    if VALIDATION_ENFORCE_MAX_ATOMS:
+        max_atoms = atom_limit(state.get("constraints", {}).get("max_atoms"))
+
     try:
-        resp = qdrant_client.query_points(
-            collection_name=QDRANT_COLLECTION,
-            query=embedding,
-            limit=5
+        kept, counts = validate_candidates(
+            candidates.smiles.tolist(),
+            dedupe=VALIDATION_DEDUPE,
+            max_atoms=max_atoms,
+            workers=VALIDATION_WORKERS,
+            pool_threshold=VALIDATION_POOL_THRESHOLD,
         )
-        search_results = getattr(resp, "points", resp)
-        
-        # Normalize results to list of dicts
-        normalized = []
-        for item in search_results:
-            if isinstance(item, dict):
-                normalized.append(item)
-            else:
-                payload = getattr(item, "payload", None) or {}
-                normalized.append(payload)
-                
+        filtered = CandidateTable.from_records(kept, PROPERTY_NAMES, iteration=state.get("iteration", 0))
+        scored = filtered.contains(_candidate_table(state, "pool").smiles)
+        filtered = filtered.take(~scored)
     except Exception as e:
-        normalized = []
         return {
-            "search_results": normalized,
-            "log": [f"search_step failed: {e}"]
+            "candidates": filtered,
+            "log": [f"filter_molecules failed: {e}"]
         }
 
     return {
-        "search_results": normalized,
-        "log": [f"Found {len(normalized)} similar molecules from database"]
+        "candidates": filtered,
+        "log": [
+            f"Filtered to {len(filtered)} valid molecules "
+            f"({counts['invalid']} invalid, {counts['duplicate']} duplicates, "
+            f"{counts['over_max_atoms']} over max_atoms, {int(scored.sum())} already scored)"
+        ]
     }
 
 
-def combine_results(state: ChemState):
+def predict_step(state: ChemState):
     """
-    Combine generative and search results.
+    Predict QM9 properties for each candidate molecule.
     
     Args:
         state: Current pipeline state
         
     Returns:
-        Updated state with combined top-k results
+        Updated state with the candidates' property matrix filled in
     """
-    topk = state.get("topk", []) or []
-    predictions = state.get("predictions", []) or []
-    search_results = state.get("search_results", []) or []
+    return _predicted(_candidate_table(state), predict_properties_cached)
 
-    # Parse search results and add to candidates
-    for search_item in search_results:
-        text = search_item.get("property", "")
-        text = text.replace("properties:", "").strip()
 
-        # Parse properties
-        result = {}
-        for prop_pair in text.split(","):
-            if "=" not in prop_pair:
-                continue
-            key, value = prop_pair.split("=", 1)
-            key = key.strip()
-            value = value.strip()
-            
+def _predictable(smiles_list) -> List[int]:
+    return [i for i, smiles in enumerate(smiles_list) if isinstance(smiles, str) and smiles]
+
+
+def _predicted(candidates: CandidateTable, predict: Callable[[List[str]], List[Dict[str, Any]]]):
+    """State update filling the candidates' properties with predict(smiles list)."""
+    smiles_list = candidates.smiles.tolist()
+    predictions: List[Dict[str, Any]] = [
+        {"error": f"Invalid SMILES input: {smiles!r}"} for smiles in smiles_list
+    ]
+    valid_idx = _predictable(smiles_list)
+
+    try:
+        batch = predict([smiles_list[i] for i in valid_idx])
+        for i, pred in zip(valid_idx, batch):
+            predictions[i] = pred
+    except Exception:
+        # Fall back to one molecule at a time so a single bad input
+        # only fails its own prediction
+        for i in valid_idx:
             try:
-                value = float(value) if "." in value else int(value)
-            except (ValueError, AttributeError):
-                pass
-            result[key] = value
-            
-        predictions.append(result)
-        topk.append({"smiles": search_item.get("smiles", "")})
+                predictions[i] = predict_properties(smiles_list[i])
+            except Exception as e:
+                predictions[i] = {"error": str(e)}
 
     return {
-        "topk": topk,
-        "predictions": predictions,
-        "log": [f"Combined results: {len(topk)} total candidates"]
+        "candidates": candidates.with_predictions(predictions),
+        "log": [f"Predicted properties for {len(predictions)} molecules"]
     }
 
 
-# ============================
-# PIPELINE CONTROL
-# ============================
+def _constraint_columns(constraints: Dict[str, Any], tolerances: Dict[str, float]):
+    """
+    Turn a constraint dict into (property, target, tolerance, is_upper_bound)
+    columns, skipping keys that are not numeric property constraints.
+    """
+    columns = []
+    for key, value in constraints.items():
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if key == "max_atoms":
+            columns.append(("num_atoms", value, 0.0, True))
+        elif key in PROPERTY_NAMES:
+            columns.append((key, value, float(tolerances.get(key, 0.0)), False))
+    return columns
 
 
-def parse(state: ChemState):
+def _prediction_matrix(predictions, names: List[str]) -> np.ndarray:
+    """Stack predictions into an (n, len(names)) float array; gaps become NaN."""
+    if isinstance(predictions, CandidateTable):
+        return predictions.property_matrix(names)
+    return np.array([
+        [_as_float(pred.get(name)) if isinstance(pred, dict) else np.nan for name in names]
+        for pred in predictions
+    ], dtype=np.float64).reshape(len(predictions), len(names))
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def check_constraints(predictions, constraints: Dict[str, Any],
+                      tolerances: Optional[Dict[str, float]] = None):
     """
-    Initialize and normalize state with default values.
+    Check every prediction against the constraints in one vectorized pass.
+    
+    A property constraint passes when |predicted - target| <= tolerance;
+    ``max_atoms`` passes when the predicted ``num_atoms`` is at most its
+    value. Predictions that are missing a property (or are errors) fail it.
     
     Args:
-        state: Input state
+        predictions: CandidateTable, or a list of predicted-property dicts
+        constraints: Constraint dict, e.g. {"mu": 2.5, ..., "max_atoms": 20}
+        tolerances: Per-property absolute tolerance, defaults to CONSTRAINT_TOLERANCES
         
     Returns:
-        Normalized state with all required keys
+        Tuple of (passed, reasons): a bool array with one entry per
+        prediction, and a short text verdict for each
     """
-    defaults: ChemState = {
-        "constraints": state.get("constraints", {}),
-        "iteration": state.get("iteration", 0),
-        "max_iterations": state.get("max_iterations", 1),
-        "log": state.get("log", []),
-        "prompt": state.get("prompt", ""),
-        "candidates": state.get("candidates", []),
-        "predictions": state.get("predictions", []),
-        "cek_list": state.get("cek_list", []),
-        "is_optimize": state.get("is_optimize", False),
-        "llm_judge": state.get("llm_judge", []),
-        "topk": state.get("topk", []),
-        "explanations": state.get("explanations", []),
-        "search_results": state.get("search_results", []),
-        "passed_constraints": state.get("passed_constraints", False),
-    }
-    return defaults
-
-
-def llm_explainer(state: ChemState):
+    columns = _constraint_columns(constraints, tolerances or CONSTRAINT_TOLERANCES)
+
+    n = len(predictions)
+    if not columns:
+        return np.ones(n, dtype=bool), ["No numeric constraints"] * n
+
+    names = [col[0] for col in columns]
+    targets = np.array([col[1] for col in columns], dtype=np.float64)
+    tols = np.array([col[2] for col in columns], dtype=np.float64)
+    upper = np.array([col[3] for col in columns], dtype=bool)
+    values = _prediction_matrix(predictions, names)
+
+    with np.errstate(invalid="ignore"):
+        ok = np.where(upper, values <= targets, np.abs(values - targets) <= tols)
+    ok &= ~np.isnan(values)
+    passed = ok.all(axis=1)
+
+    reasons = []
+    for row_ok, row_values in zip(ok, values):
+        failures = [
+            f"{name} missing" if np.isnan(val) else
+            f"{name}={val:.3g} {'> max' if is_upper else 'vs target'} {target:g}"
+            + ("" if is_upper else f"±{tol:g}")
+            for name, val, target, tol, is_upper, good
+            in zip(names, row_values, targets, tols, upper, row_ok)
+            if not good
+        ]
+        reasons.append("Meets all constraints" if not failures else "Fails: " + "; ".join(failures))
+    return passed, reasons
+
+
+def constraint_distances(predictions, constraints: Dict[str, Any],
+                         weights: Optional[Dict[str, float]] = None,
+                         tolerances: Optional[Dict[str, float]] = None) -> np.ndarray:
     """
-    Generate explanations for top candidates using LLM (single API call).
+    Weighted, normalized distance from each prediction to the constraints.
+    
+    Each property's deviation is divided by its tolerance, so one unit means
+    "one tolerance away"; ``max_atoms`` only counts atoms above the limit.
+    Per-property distances are combined as a weighted root-mean-square.
+    Predictions missing a constrained property get ``inf``.
     
     Args:
-        state: Current pipeline state
+        predictions: CandidateTable, or a list of predicted-property dicts
+        constraints: Constraint dict
+        weights: Per-property weights, defaults to RANK_WEIGHTS
+        tolerances: Per-property scales, defaults to CONSTRAINT_TOLERANCES
         
     Returns:
-        Updated state with explanations for top-k molecules
+        Float array of distances (lower is better), one per prediction
     """
-    topk = state.get("topk", []) or []
-    predictions = state.get("predictions", []) or []
-    constraints = state.get("constraints", {})
-    
-    if not topk:
+    weights = weights or RANK_WEIGHTS
+    columns = _constraint_columns(constraints, tolerances or CONSTRAINT_TOLERANCES)
+
+    n = len(predictions)
+    if not columns:
+        return np.zeros(n, dtype=np.float64)
+
+    names = [col[0] for col in columns]
+    targets = np.array([col[1] for col in columns], dtype=np.float64)
+    scales = np.array([col[2] if col[2] > 0 else 1.0 for col in columns], dtype=np.float64)
+    upper = np.array([col[3] for col in columns], dtype=bool)
+    w = np.array([float(weights.get(name, 1.0)) for name in names], dtype=np.float64)
+    values = _prediction_matrix(predictions, names)
+
+    deviation = np.where(upper, np.maximum(values - targets, 0.0), np.abs(values - targets)) / scales
+    total = w.sum()
+    distances = np.sqrt((deviation ** 2) @ w / total) if total > 0 else np.zeros(n)
+    return np.where(np.isnan(distances), np.inf, distances)
+
+
+def top_k_indices(distances: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k smallest distances, best first.
+    
+    Uses a partition to find the k-th distance so only the selected k are
+    sorted; ties keep input order, including ties at the k-th place (NaN
+    distances rank last).
+    """
+    distances = np.asarray(distances)
+    n = len(distances)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k == n:
+        idx = np.arange(n)
+    else:
+        # argpartition picks an arbitrary subset of the rows tied with the
+        # k-th distance; take the earliest ones instead
+        kth = np.partition(distances, k - 1)[k - 1]
+        if np.isnan(kth):
+            below, tied = ~np.isnan(distances), np.isnan(distances)
+        else:
+            below, tied = distances < kth, distances == kth
+        below = np.flatnonzero(below)
+        idx = np.concatenate([below, np.flatnonzero(tied)[:k - len(below)]])
+    return idx[np.lexsort((idx, distances[idx]))]
+
+
+def _merge_into_pool(state: ChemState, candidates: CandidateTable, summary: str):
+    """
+    Add this iteration's evaluated candidates to the pool and decide whether
+    another iteration is needed, counting passes across the whole pool.
+    """
+    pool = _candidate_table(state, "pool")
+    candidates = candidates.take(~candidates.contains(pool.smiles))
+    pool = CandidateTable.concat([pool, candidates])
+
+    num_passed = pool.count(STATUS_PASSED)
+    passed_constraints = num_passed >= MIN_PASSING_CANDIDATES
+    is_optimize = not passed_constraints
+
+    return {
+        "candidates": candidates,
+        "pool": pool,
+        "is_optimize": is_optimize,
+        "passed_constraints": passed_constraints,
+        "log": [
+            f"{summary} Pool: {num_passed}/{len(pool)} passing. "
+            f"Passed: {passed_constraints}, Optimize: {is_optimize}"
+        ]
+    }
+
+
+def numeric_evaluate_step(state: ChemState):
+    """
+    Evaluate predictions against constraints numerically (no LLM call).
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with evaluation results, the grown pool and
+        optimization flag
+    """
+    candidates = _candidate_table(state)
+    constraints = state.get("constraints", {})
+
+    if not candidates:
+        return _evaluate_result(state)
+
+    # Unpredicted properties are NaN and fail every check
+    passed, reasons = check_constraints(candidates, constraints)
+    candidates = candidates.with_evaluation(passed, reasons)
+
+    return _merge_into_pool(
+        state, candidates,
+        f"Numeric evaluation: {candidates.count(STATUS_PASSED)}/{len(candidates)} "
+        f"new candidates within tolerance."
+    )
+
+
+def _evaluate_prompt(state: ChemState) -> Optional[str]:
+    """Build the LLM judge prompt, or None when there is nothing to evaluate."""
+    candidates = _candidate_table(state)
+    constraints = state.get("constraints", {})
+
+    if not candidates:
+        return None
+
+    # Build single prompt for all candidates
+    prompt = (
+        f"Evaluate the following molecules against QM9 constraints.\n"
+        f"Constraints: {constraints}\n\n"
+        "For each molecule below, answer with:\n"
+        "1. Whether it meets all constraints (Yes/No)\n"
+        "2. A one-sentence justification\n\n"
+        "Molecules:\n"
+    )
+    
+    for idx, (smiles, pred) in enumerate(zip(candidates.smiles, candidates.property_records())):
+        prompt += f"{idx+1}. SMILES: {smiles} | Predicted Properties: {pred}\n"
+    
+    prompt += "\nProvide your evaluation for each molecule in order (1, 2, 3, ...)."
+    return prompt
+
+
+def _evaluate_result(state: ChemState, content: Optional[str] = None,
+                     error: Optional[Exception] = None):
+    """Turn the LLM judge response (or the error it raised) into a state update."""
+    candidates = _candidate_table(state)
+
+    cek_list: List[bool] = []
+    llm_judge: List[str] = []
+
+    if not candidates:
+        return _merge_into_pool(state, candidates, "No new candidates to evaluate.")
+
+    if error is None:
+        # Split response by lines and parse each molecule's evaluation
+        lines = content.split('\n')
+        current_eval = ""
+        
+        for line in lines:
+            # Check if this line contains evaluation for a molecule
+            if any(str(i) in line[:5] for i in range(1, len(candidates) + 1)):
+                if current_eval:
+                    # Process previous evaluation
+                    is_ok = any(token in current_eval.lower() for token in ["yes", "true", "meets", "satisfi", "suitable", "pass"])
+                    cek_list.append(bool(is_ok))
+                    llm_judge.append(current_eval[:400])
+                current_eval = line
+            else:
+                current_eval += " " + line
+        
+        # Process last evaluation
+        if current_eval:
+            is_ok = any(token in current_eval.lower() for token in ["yes", "true", "meets", "satisfi", "suitable", "pass"])
+            cek_list.append(bool(is_ok))
+            llm_judge.append(current_eval[:400])
+        
+        # Ensure we have evaluations for all candidates
+        while len(cek_list) < len(candidates):
+            cek_list.append(False)
+            llm_judge.append("No evaluation found")
+    else:
+        # Fallback: mark all as failed
+        cek_list = [False] * len(candidates)
+        llm_judge = [f"Evaluation error: {error}"] * len(candidates)
+
+    # The parse can yield more entries than candidates; extra ones are dropped
+    n = len(candidates)
+    candidates = candidates.with_evaluation(cek_list[:n], llm_judge[:n])
+    return _merge_into_pool(state, candidates, "Evaluation complete.")
+
+
+def evaluate_step(state: ChemState):
+    """
+    Evaluate predictions against constraints using LLM.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with evaluation results and optimization flag
+    """
+    prompt = _evaluate_prompt(state)
+    if prompt is None:
+        return _evaluate_result(state)
+    try:
+        return _evaluate_result(state, content=call_llm(prompt))
+    except Exception as e:
+        return _evaluate_result(state, error=e)
+
+
+async def aevaluate_step(state: ChemState):
+    """Async variant of evaluate_step using the pooled LLM client."""
+    prompt = _evaluate_prompt(state)
+    if prompt is None:
+        return _evaluate_result(state)
+    try:
+        return _evaluate_result(state, content=await acall_llm(prompt))
+    except Exception as e:
+        return _evaluate_result(state, error=e)
+
+
+def _optimize_prompt(state: ChemState) -> str:
+    """Build the prompt asking the LLM for a better MolT5 generation prompt."""
+    candidates = _candidate_table(state)
+    constraints = state.get("constraints", {})
+
+    prompt = (
+        "We want to generate new molecules that better satisfy the following QM9 constraints:\n"
+        f"Constraints: {constraints}\n\n"
+        f"Current candidates and status:\n"
+    )
+    
+    rows = zip(candidates.smiles, candidates.status, candidates.property_records(), candidates.note)
+    for smiles, status, pred, judge in rows:
+        status = "OK" if status == STATUS_PASSED else "FAIL"
+        prompt += f"- {smiles} | Status: {status} | Predicted: {pred} | Judge: {judge}\n"
+
+    prompt += (
+        "\nProvide:\n"
+        "1) A short explanation of why candidates failed (one sentence each if possible).\n"
+        "2) A concrete generation prompt for MolT5 that increases the chance of meeting "
+        "the constraints. Keep prompt concise and machine-friendly.\n"
+    )
+    return prompt
+
+
+def _optimize_result(content: str):
+    return {
+        "prompt": content,
+        "log": ["Generated optimization prompt for next iteration"]
+    }
+
+
+def optimize_step(state: ChemState):
+    """
+    Generate improved prompt using LLM based on failed candidates.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with new generation prompt
+    """
+    try:
+        content = call_llm(_optimize_prompt(state))
+    except Exception as e:
+        content = f"LLM optimize_step failed: {e}"
+    return _optimize_result(content)
+
+
+async def aoptimize_step(state: ChemState):
+    """Async variant of optimize_step using the pooled LLM client."""
+    try:
+        content = await acall_llm(_optimize_prompt(state))
+    except Exception as e:
+        content = f"LLM optimize_step failed: {e}"
+    return _optimize_result(content)
+
+
+def rank_step(state: ChemState):
+    """
+    Rank every molecule in the pool by weighted distance to the constraints.
+    
+    Candidates from all iterations compete, so a later round can only add
+    better molecules. Without a pool (rank_step called on its own) the
+    current candidates are ranked.
+    
+    Args:
+        state: Current pipeline state (``top_k`` and ``rank_weights`` are optional)
+        
+    Returns:
+        Updated state with the top-k rows, best first, carrying their
+        scores and distances
+    """
+    candidates = _candidate_table(state, "pool")
+    if not candidates:
+        candidates = _candidate_table(state)
+    constraints = state.get("constraints", {})
+    k = state.get("top_k") or RANK_TOP_K
+    weights = state.get("rank_weights") or RANK_WEIGHTS
+
+    # Rows without usable predictions get inf and rank last
+    distances = constraint_distances(candidates, constraints, weights=weights)
+    order = top_k_indices(distances, k)
+    # Score in [0, 1]: 1 is an exact match, 0 means no usable prediction
+    topk = candidates.take(order).with_scores(distances[order])
+
+    return {
+        "topk": topk,
+        "log": [f"Ranked top {len(topk)} molecules"]
+    }
+
+
+# ============================
+# PIPELINE NODES - SEARCH
+# ============================
+
+
+# Caption key order for normalized captions; other keys follow alphabetically
+CAPTION_KEY_ORDER = PROPERTY_NAMES + ['max_atoms']
+
+
+def _format_caption_value(value, precision: Optional[int] = None) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if precision is not None:
+        value = round(float(value), precision)
+    # 70 and 70.0 produce the same text
+    return format(float(value), "g")
+
+
+def query_caption(constraints: Dict[str, Any]) -> str:
+    """
+    Build the "properties: ..." caption the models see.
+    
+    Same format as the captions MolT5 was fine-tuned on and the search index
+    was built from; constraint_caption is only for cache keys.
+    """
+    caption_parts = [f"{key}={item}" for key, item in constraints.items()]
+    return "properties: " + ", ".join(caption_parts)
+
+
+def constraint_caption(constraints: Dict[str, Any], precision: Optional[int] = None) -> str:
+    """
+    Build a normalized "properties: ..." caption from a constraint dict.
+    
+    Keys are emitted in a fixed order and numbers in a canonical format, so
+    equivalent constraint dicts produce the same caption. Used as a cache
+    key only; the encoder is given query_caption.
+    
+    Args:
+        constraints: Constraint dict
+        precision: Round numeric values to this many decimals (None = exact)
+        
+    Returns:
+        Caption string
+    """
+    ordered = [k for k in CAPTION_KEY_ORDER if k in constraints]
+    ordered += sorted(k for k in constraints if k not in CAPTION_KEY_ORDER)
+    caption_parts = [f"{k}={_format_caption_value(constraints[k], precision)}" for k in ordered]
+    return "properties: " + ", ".join(caption_parts)
+
+
+def _embedding_precision() -> Optional[int]:
+    return int(EMBEDDING_CACHE_PRECISION) if EMBEDDING_CACHE_PRECISION.strip() else None
+
+
+def encode_step(state: ChemState):
+    """
+    Encode constraints to embedding vector.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with embedding
+    """
+    return _encoded([state.get("constraints", {})], t5_encoder_batcher.run)[0]
+
+
+def _encoded(constraint_sets: List[Dict[str, Any]], embed: Callable[[List[str]], List[Any]]):
+    """
+    State updates with the embedding of each constraint set.
+    
+    Cached embeddings are reused; the rest are encoded with one
+    embed(captions) call.
+    """
+    keys = [constraint_caption(c, precision=_embedding_precision()) for c in constraint_sets]
+    try:
+        found = {}
+        for key in dict.fromkeys(keys):
+            cached = embedding_cache.get(key)
+            if cached is not None:
+                found[key] = cached
+        _record_cache_lookup(len(found), len(set(keys)))
+
+        # First constraint set of each uncached caption
+        misses = {}
+        for key, constraints in zip(keys, constraint_sets):
+            if key not in found:
+                misses.setdefault(key, constraints)
+        if misses:
+            start = time.perf_counter()
+            embeddings = embed([query_caption(constraints) for constraints in misses.values()])
+            _record_model_time("t5_encoder", time.perf_counter() - start)
+            for key, emb in zip(misses, embeddings):
+                embedding = emb if isinstance(emb, (list, tuple)) else getattr(emb, "tolist", lambda: emb)()
+                embedding_cache.set(key, tuple(embedding))
+                found[key] = embedding
+    except Exception as e:
+        return [{"embedding": [], "log": [f"encode_step failed: {e}"]} for _ in keys]
+
+    return [
+        {
+            "embedding": list(found[key]),
+            "log": [f"Encoded constraints to embedding (dim={len(found[key])}{'' if key in misses else ', cached'})"]
+        }
+        for key in keys
+    ]
+
+
+def search_step(state: ChemState):
+    """
+    Search similar molecules in vector database.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with search results
+    """
+    embedding = state.get("embedding", [])
+    
+    if not embedding:
         return {
-            "topk": topk,
-            "predictions": predictions,
-            "explanations": [],
-            "log": ["No top candidates to explain"]
+            "search_results": [], 
+            "log": ["No embedding available, skipping search"]
         }
+
+    try:
+        normalized = models.search.search(embedding, limit=SEARCH_LIMIT)
+    except Exception as e:
+        normalized = []
+        return {
+            "search_results": normalized,
+            "log": [f"search_step failed: {e}"]
+        }
+
+    return {
+        "search_results": normalized,
+        "log": [f"Found {len(normalized)} similar molecules from database"]
+    }
+
+
+def combine_results(state: ChemState):
+    """
+    Combine generative and search results.
+    
+    Args:
+        state: Current pipeline state
+        
+    Returns:
+        Updated state with the search hits appended to the top-k rows
+    """
+    topk = _candidate_table(state, "topk")
+    search_results = state.get("search_results", []) or []
+
+    # Parse search results into rows tagged as searched
+    records = []
+    for search_item in search_results:
+        text = search_item.get("property", "")
+        text = text.replace("properties:", "").strip()
+
+        # Parse properties
+        result = {}
+        for prop_pair in text.split(","):
+            if "=" not in prop_pair:
+                continue
+            key, value = prop_pair.split("=", 1)
+            key = key.strip()
+            value = value.strip()
+            
+            try:
+                value = float(value) if "." in value else int(value)
+            except (ValueError, AttributeError):
+                pass
+            result[key] = value
+            
+        result["smiles"] = search_item.get("smiles", "")
+        records.append(result)
+
+    searched = CandidateTable.from_records(records, PROPERTY_NAMES, source=SOURCE_SEARCHED)
+    topk = CandidateTable.concat([topk, searched])
+
+    return {
+        "topk": topk,
+        "log": [f"Combined results: {len(topk)} total candidates"]
+    }
+
+
+# ============================
+# PIPELINE CONTROL
+# ============================
+
+
+def parse(state: ChemState):
+    """
+    Initialize and normalize state with default values.
+    
+    Args:
+        state: Input state
+        
+    Returns:
+        Normalized state with all required keys (``log`` is left to its
+        reducer so existing entries are not duplicated)
+    """
+    defaults: ChemState = {
+        "constraints": state.get("constraints", {}),
+        "iteration": state.get("iteration", 0),
+        "max_iterations": state.get("max_iterations", 1),
+        "prompt": state.get("prompt", ""),
+        "candidates": _candidate_table(state),
+        "pool": _candidate_table(state, "pool"),
+        "is_optimize": state.get("is_optimize", False),
+        "topk": _candidate_table(state, "topk"),
+        "search_results": state.get("search_results", []),
+        "passed_constraints": state.get("passed_constraints", False),
+        "top_k": state.get("top_k", RANK_TOP_K),
+        "rank_weights": state.get("rank_weights", RANK_WEIGHTS),
+    }
+    return defaults
+
+
+def _explainer_prompt(state: ChemState) -> Optional[str]:
+    """Build the explanation prompt, or None when there is nothing to explain."""
+    topk = _candidate_table(state, "topk")
+    constraints = state.get("constraints", {})
+    
+    if not topk:
+        return None
     
     # Build single prompt for all molecules
     prompt = (
@@ -730,17 +2190,25 @@ def llm_explainer(state: ChemState):
         "Molecules:\n"
     )
     
-    for idx, item in enumerate(topk):
-        smiles = item.get("smiles") if isinstance(item, dict) else item
-        pred = predictions[idx] if idx < len(predictions) else {}
+    for idx, (smiles, pred) in enumerate(zip(topk.smiles, topk.property_records())):
         prompt += f"{idx+1}. SMILES: {smiles} | Predicted: {pred}\n"
     
     prompt += "\nProvide explanations in order (1, 2, 3, ...), each on a new line starting with the number."
-    
-    try:
-        response = llm.invoke(prompt) if hasattr(llm, "invoke") else llm.generate(prompt)
-        content = getattr(response, "content", str(response))
-        
+    return prompt
+
+
+def _explainer_result(state: ChemState, content: Optional[str] = None,
+                      error: Optional[Exception] = None):
+    """Turn the explanation response (or the error it raised) into a state update."""
+    topk = _candidate_table(state, "topk")
+
+    if not topk:
+        return {
+            "topk": topk,
+            "log": ["No top candidates to explain"]
+        }
+
+    if error is None:
         # Parse explanations from response
         explanations = []
         lines = content.split('\n')
@@ -770,70 +2238,76 @@ def llm_explainer(state: ChemState):
             
         # Trim to exact number of top-k
         explanations = explanations[:len(topk)]
+    else:
+        explanations = [f"LLM explanation failed: {error}"] * len(topk)
+    
+    return {
+        "topk": topk.with_explanations(explanations),
+        "log": [f"Generated explanations for {len(topk)} candidates (1 API call)"]
+    }
+
+
+def llm_explainer(state: ChemState):
+    """
+    Generate explanations for top candidates using LLM (single API call).
+    
+    Args:
+        state: Current pipeline state
         
+    Returns:
+        Updated state with explanations for top-k molecules
+    """
+    prompt = _explainer_prompt(state)
+    if prompt is None:
+        return _explainer_result(state)
+    try:
+        return _explainer_result(state, content=call_llm(prompt))
+    except Exception as e:
+        return _explainer_result(state, error=e)
+
+
+async def allm_explainer(state: ChemState):
+    """Async variant of llm_explainer using the pooled LLM client."""
+    prompt = _explainer_prompt(state)
+    if prompt is None:
+        return _explainer_result(state)
+    try:
+        return _explainer_result(state, content=await acall_llm(prompt))
     except Exception as e:
-        explanations = [f"LLM explanation failed: {e}"] * len(topk)
-    
-    return {
-        "topk": topk,
-        "predictions": predictions,
-        "explanations": explanations,
-        "log": [f"Generated explanations for {len(topk)} candidates (1 API call)"]
-    }
+        return _explainer_result(state, error=e)
 
 
 # ============================
 # GRAPH CONSTRUCTION
 # ============================
 
-def build_llm_pipeline():
+@dataclass(frozen=True)
+class PipelineConfig:
     """
-    Build the molecule discovery pipeline graph.
+    Graph-shaping options; each distinct config is compiled once.
     
-    Pipeline flow:
-    1. Parse input
-    2. Encode constraints to embedding
-    3. Search vector database
-    4. Generate new molecules
-    5. Filter for validity
-    6. Predict properties
-    7. Evaluate against constraints
-    8. Optimize prompt if needed (iterative)
-    9. Rank candidates
-    10. Combine generative and search results
-    11. Generate explanations
-    
-    Returns:
-        Compiled LangGraph pipeline
+    Attributes:
+        use_search: Include the encode/search branch
+        explain: Run llm_explainer after combining results
+        stop_when_passed: End the optimize loop as soon as constraints pass
+        async_llm: Use the async LLM nodes; run with arun_pipeline
+        evaluation: "numeric" (tolerance check) or "llm" (LLM judge)
+        generation: "fixed" (one sampling call) or "adaptive" (sample until
+            enough valid unique molecules exist)
     """
-    g = StateGraph(ChemState)
+    use_search: bool = True
+    explain: bool = True
+    stop_when_passed: bool = True
+    async_llm: bool = False
+    evaluation: str = EVALUATION_MODE
+    generation: str = GENERATION_MODE
 
-    # Register all nodes
-    nodes = [
-        ("parse", parse),
-        ("encode", encode_step),
-        ("search", search_step),
-        ("generate_molecules", generate_molecules),
-        ("filter", filter_molecules),
-        ("predict", predict_step),
-        ("evaluate", evaluate_step),
-        ("optimize", optimize_step),
-        ("rank", rank_step),
-        ("combine", combine_results),
-        ("llm_explainer", llm_explainer),
-    ]
 
-    for name, func in nodes:
-        g.add_node(name, func)
+DEFAULT_PIPELINE_CONFIG = PipelineConfig()
 
-    # Define sequential flow
-    g.add_edge(START, "parse")
-    g.add_edge("parse", "encode")
-    g.add_edge("encode", "search")
-    g.add_edge("search", "generate_molecules")
-    g.add_edge("generate_molecules", "filter")
-    g.add_edge("filter", "predict")
-    g.add_edge("predict", "evaluate")
+
+def make_should_optimize(config: PipelineConfig = DEFAULT_PIPELINE_CONFIG):
+    """Return the iteration policy used after each evaluation."""
 
     def should_optimize(state: ChemState) -> str:
         """Decide whether to optimize or proceed to ranking."""
@@ -843,101 +2317,832 @@ def build_llm_pipeline():
         passed_constraints = state.get("passed_constraints", False)
         
         # Stop iterating if max iterations reached OR constraints already met
-        if iteration >= max_iter or passed_constraints:
+        if iteration >= max_iter or (config.stop_when_passed and passed_constraints):
             return "rank"
         
         # Optimize if constraints not met and we have iterations left
         return "optimize" if is_optimize else "rank"
 
+    return should_optimize
+
+
+def _add_nodes(g: StateGraph, nodes: List[Tuple[str, Any]]):
+    """Register nodes, wrapping node functions with instrument_node when enabled."""
+    for name, func in nodes:
+        # Compiled subgraphs are added as is; their own nodes are instrumented
+        if (PIPELINE_METRICS or PROFILING_ENABLED) and inspect.isfunction(func):
+            func = instrument_node(name, func)
+        g.add_node(name, func)
+
+
+def build_search_branch():
+    """
+    Build the encode -> search branch as a subgraph.
+    
+    Returns:
+        Compiled LangGraph subgraph writing embedding and search_results
+    """
+    g = StateGraph(ChemState, input_schema=SearchBranchInput, output_schema=SearchBranchOutput)
+
+    _add_nodes(g, [("encode", encode_step), ("search", search_step)])
+
+    g.add_edge(START, "encode")
+    g.add_edge("encode", "search")
+    g.add_edge("search", END)
+
+    return g.compile()
+
+
+def _select_evaluate_node(config: PipelineConfig):
+    if config.evaluation == "numeric":
+        return numeric_evaluate_step
+    if config.evaluation == "llm":
+        return aevaluate_step if config.async_llm else evaluate_step
+    raise ValueError(f"Unknown evaluation mode: {config.evaluation!r}")
+
+
+def _select_generate_node(config: PipelineConfig):
+    if config.generation == "fixed":
+        return generate_molecules
+    if config.generation == "adaptive":
+        return adaptive_generate_molecules
+    raise ValueError(f"Unknown generation mode: {config.generation!r}")
+
+
+def build_generation_branch(config: PipelineConfig = DEFAULT_PIPELINE_CONFIG):
+    """
+    Build the generate -> filter -> predict -> evaluate loop as a subgraph.
+    
+    optimize loops back to generate_molecules. New molecules are merged
+    into the pool by canonical SMILES, so an iteration only predicts and
+    evaluates molecules it has not seen, and rank draws from the whole pool.
+    
+    Args:
+        config: Pipeline configuration (iteration policy, sync/async LLM nodes)
+        
+    Returns:
+        Compiled LangGraph subgraph writing ranked candidates and predictions
+    """
+    g = StateGraph(ChemState, input_schema=GenerationBranchInput, output_schema=GenerationBranchOutput)
+
+    nodes = [
+        ("generate_molecules", _select_generate_node(config)),
+        ("filter", filter_molecules),
+        ("predict", predict_step),
+        ("evaluate", _select_evaluate_node(config)),
+        ("optimize", aoptimize_step if config.async_llm else optimize_step),
+        ("rank", rank_step),
+    ]
+
+    _add_nodes(g, nodes)
+
+    g.add_edge(START, "generate_molecules")
+    g.add_edge("generate_molecules", "filter")
+    g.add_edge("filter", "predict")
+    g.add_edge("predict", "evaluate")
+
     g.add_conditional_edges(
         "evaluate",
-        should_optimize,
+        make_should_optimize(config),
         {"optimize": "optimize", "rank": "rank"}
     )
 
-    # Complete the graph
-    g.add_edge("optimize", "filter")  # Loop back for another iteration
-    g.add_edge("rank", "combine")
-    g.add_edge("combine", "llm_explainer")
-    g.add_edge("llm_explainer", END)
+    # Each iteration samples fresh molecules from the optimized prompt
+    g.add_edge("optimize", "generate_molecules")
+    g.add_edge("rank", END)
+
+    return g.compile()
+
+
+# Parent-graph nodes that wrap a whole branch subgraph
+BRANCH_NODES = ("search_branch", "generation_branch")
+
+
+def build_llm_pipeline(config: PipelineConfig = DEFAULT_PIPELINE_CONFIG):
+    """
+    Build the molecule discovery pipeline graph.
+    
+    Pipeline flow:
+    1. Parse input
+    2. In parallel:
+       a. Search branch: encode constraints, search vector database
+       b. Generation branch: generate, filter, predict, evaluate,
+          optimize and generate again if needed (iterative), rank the pool
+    3. Combine generative and search results (waits for both branches)
+    4. Generate explanations
+    
+    Each branch is a subgraph, so the slow Qdrant round-trip overlaps with
+    the whole generation loop instead of one of its steps. Branch outputs
+    are limited to their own keys; ``log`` is the only shared key and is
+    merged by its reducer.
+    
+    Args:
+        config: Pipeline configuration (node set and iteration policy)
+    
+    Returns:
+        Compiled LangGraph pipeline
+    """
+    g = StateGraph(ChemState)
+
+    # Register all nodes
+    nodes = [
+        ("parse", parse),
+        (BRANCH_NODES[1], build_generation_branch(config)),
+        ("combine", combine_results),
+    ]
+    if config.use_search:
+        nodes.append((BRANCH_NODES[0], build_search_branch()))
+    if config.explain:
+        nodes.append(("llm_explainer", allm_explainer if config.async_llm else llm_explainer))
+
+    _add_nodes(g, nodes)
+
+    # Fan out from parse, join at combine
+    branches = [BRANCH_NODES[1]]
+    if config.use_search:
+        branches.insert(0, BRANCH_NODES[0])
+
+    g.add_edge(START, "parse")
+    for branch in branches:
+        g.add_edge("parse", branch)
+    g.add_edge(branches, "combine")
+
+    if config.explain:
+        g.add_edge("combine", "llm_explainer")
+        g.add_edge("llm_explainer", END)
+    else:
+        g.add_edge("combine", END)
 
     return g.compile()
 
 
+# Compiled graphs are stateless, so one instance per config is shared by
+# every request and thread
+_compiled_pipelines: Dict[PipelineConfig, Any] = {}
+_compiled_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(config: Optional[PipelineConfig] = None):
+    """
+    Return the compiled pipeline for a config, building it on first use.
+    
+    Args:
+        config: Pipeline configuration, defaults to DEFAULT_PIPELINE_CONFIG
+        
+    Returns:
+        Compiled LangGraph pipeline
+    """
+    config = config or DEFAULT_PIPELINE_CONFIG
+    app = _compiled_pipelines.get(config)
+    if app is None:
+        with _compiled_pipelines_lock:
+            app = _compiled_pipelines.get(config)
+            if app is None:
+                app = build_llm_pipeline(config)
+                _compiled_pipelines[config] = app
+    return app
+
+
 # ============================
 # PUBLIC API
 # ============================
 
-def run_pipeline(constraints: Dict[str, Any], max_iterations: int = 1):
+def _pipeline_cache_precision() -> Optional[int]:
+    return int(PIPELINE_CACHE_PRECISION) if PIPELINE_CACHE_PRECISION.strip() else None
+
+
+def _default_seed() -> Optional[int]:
+    return int(PIPELINE_SEED) if PIPELINE_SEED.strip() else None
+
+
+def quantize_constraints(constraints: Dict[str, Any], precision: Optional[int] = None) -> Dict[str, Any]:
     """
-    Run the molecule discovery pipeline.
+    Round float constraint values to `precision` decimals.
+    
+    Args:
+        constraints: Constraint dict
+        precision: Decimals to keep (None = unchanged)
+        
+    Returns:
+        New constraint dict
+    """
+    if precision is None:
+        return dict(constraints)
+    return {
+        key: round(value, precision) if isinstance(value, float) else value
+        for key, value in constraints.items()
+    }
+
+
+def _search_index_identity() -> List[Any]:
+    """What the search branch queries: the Qdrant collection, or the local index and when it was last built."""
+    if SEARCH_BACKEND != "local":
+        return [SEARCH_BACKEND, QDRANT_URL, QDRANT_COLLECTION]
+    manifest = os.path.join(LOCAL_INDEX_DIR, "manifest.json")
+    built_at = os.path.getmtime(manifest) if os.path.exists(manifest) else None
+    return [SEARCH_BACKEND, os.path.abspath(LOCAL_INDEX_DIR), LOCAL_INDEX_METRIC, LOCAL_INDEX_ANN, built_at]
+
+
+def pipeline_cache_key(constraints: Dict[str, Any], max_iterations: int = 1,
+                       config: Optional[PipelineConfig] = None,
+                       top_k: int = RANK_TOP_K,
+                       rank_weights: Optional[Dict[str, float]] = None,
+                       seed: Optional[int] = None) -> str:
+    """
+    Build the pipeline cache key for a request.
+    
+    Constraints are canonicalized the same way as captions (fixed key
+    order, 70 == 70.0, optional rounding), numeric options are normalized
+    the same way (2 == 2.0), and every option or setting that changes the
+    result is part of the key, including which search index is queried.
+    The models and their inference backends are part of the cache
+    namespace instead.
     
     Args:
         constraints: Dictionary of molecular property constraints
-                    e.g., {"mu": 2.5, "alpha": 70, "gap": 0.3, "Cv": 30, "max_atoms": 20}
         max_iterations: Maximum number of optimization iterations
+        config: Pipeline configuration, defaults to DEFAULT_PIPELINE_CONFIG
+        top_k: Number of generated candidates to keep
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base sampling seed, None = unseeded
         
     Returns:
-        Final state with top candidate molecules and explanations
+        Hex digest
     """
-    app = build_llm_pipeline()
-    
-    initial_state: ChemState = {
-        "constraints": constraints,
-        "max_iterations": max_iterations,
-        "iteration": 0,
-        "log": [],
-        "prompt": "",
-        "candidates": [],
-        "predictions": [],
-        "cek_list": [],
-        "is_optimize": False,
-        "llm_judge": [],
-        "topk": [],
-        "explanations": [],
-        "embedding": [],
-        "search_results": [],
-        "passed_constraints": False,
+    # Sync and async runs produce the same result
+    config = replace(config or DEFAULT_PIPELINE_CONFIG, async_llm=False)
+    payload = {
+        "constraints": constraint_caption(constraints, _pipeline_cache_precision()),
+        "max_iterations": int(max_iterations),
+        "config": asdict(config),
+        "top_k": int(top_k),
+        "rank_weights": {name: float(w) for name, w in (rank_weights or RANK_WEIGHTS).items()},
+        "seed": None if seed is None else int(seed),
+        "settings": {
+            "tolerances": CONSTRAINT_TOLERANCES,
+            "min_passing": MIN_PASSING_CANDIDATES,
+            "generation": [GENERATION_BATCH_SIZE, GENERATION_TARGET_VALID, GENERATION_MAX_SAMPLES,
+                           GENERATION_DEADLINE_MS, GENERATION_GRAMMAR, GENERATION_GRAMMAR_MAX_ATOMS],
+            "validation": [VALIDATION_DEDUPE, VALIDATION_ENFORCE_MAX_ATOMS],
+            "search": [SEARCH_LIMIT, EMBEDDING_CACHE_PRECISION, *_search_index_identity()],
+            "llm": LLM_MODEL,
+        },
     }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _json_default(value):
+    # numpy scalars and arrays
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+def serialize_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace the candidate tables in a state or node update with plain lists.
+    
+    ``candidates`` and ``pool`` become one dict per row with its properties inline;
+    ``topk`` becomes the ranked rows plus aligned ``predictions`` and
+    ``explanations`` lists, the shape the API returns.
+    
+    Args:
+        state: Pipeline state or a single node's update
+        
+    Returns:
+        Shallow copy safe to pass to json.dumps
+    """
+    if not isinstance(state, dict):
+        return state
+    state = dict(state)
+    for key in ("candidates", "pool"):
+        if isinstance(state.get(key), CandidateTable):
+            state[key] = state[key].to_records(properties=True)
+    topk = state.get("topk")
+    if isinstance(topk, CandidateTable):
+        state["topk"] = topk.to_records()
+        state["predictions"] = topk.property_records()
+        state["explanations"] = topk.explanation_list()
+    return state
+
+
+def _prepare_run(constraints, max_iterations, config, top_k, rank_weights, seed, use_cache):
+    """Return (constraints to run with, seed, cache key or None)."""
+    seed = seed if seed is not None else _default_seed()
+    constraints = quantize_constraints(constraints, _pipeline_cache_precision())
+    key = None
+    if use_cache and PIPELINE_CACHE_SIZE > 0:
+        key = pipeline_cache_key(constraints, max_iterations, config, top_k, rank_weights, seed)
+    return constraints, seed, key
+
+
+def graph_config(max_iterations: int) -> Dict[str, Any]:
+    """
+    LangGraph run config for a pipeline run.
     
-    result = app.invoke(initial_state)
+    generate, filter, predict, evaluate and optimize run once per iteration,
+    so the recursion limit grows with max_iterations instead of capping it.
+    """
+    return {"recursion_limit": 25 + 5 * max(int(max_iterations), 1)}
+
+
+def _cached_result(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    if key is None:
+        return None
+    cached = pipeline_cache.get(key)
+    if cached is None:
+        return None
+    PIPELINE_RUNS.labels(cache="hit").inc()
+    result = copy.deepcopy(cached)
+    result["log"] = list(result.get("log", [])) + ["Served from pipeline cache"]
+    result["cache_hit"] = True
+    return result
+
+
+def _finish_run(key: Optional[str], result: Optional[Dict[str, Any]]):
+    """Summarize node metrics, count the run and fill the cache."""
+    if result is None:
+        return result
+    result = serialize_state(result)
+    result["metrics"] = summarize_node_metrics(result.get("node_metrics", []))
+    PIPELINE_RUNS.labels(cache="miss" if key is not None else "off").inc()
+    # Runs that produced nothing (e.g. a model that failed to load) are not kept
+    if key is not None and result.get("topk"):
+        # A JSON round-trip gives an independent copy that the disk tier can store as is
+        pipeline_cache.set(key, json.loads(json.dumps(result, default=_json_default)))
+    result["cache_hit"] = False
     return result
 
 
-def run_stream(constraints: Dict[str, Any], max_iterations: int = 1):
+def run_pipeline(constraints: Dict[str, Any], max_iterations: int = 1,
+                 config: Optional[PipelineConfig] = None,
+                 on_node: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 top_k: int = RANK_TOP_K,
+                 rank_weights: Optional[Dict[str, float]] = None,
+                 seed: Optional[int] = None,
+                 use_cache: bool = True):
+    """
+    Run the molecule discovery pipeline.
+    
+    Args:
+        constraints: Dictionary of molecular property constraints
+                    e.g., {"mu": 2.5, "alpha": 70, "gap": 0.3, "Cv": 30, "max_atoms": 20}
+        max_iterations: Maximum number of optimization iterations
+        config: Pipeline configuration, defaults to DEFAULT_PIPELINE_CONFIG
+        on_node: Optional callback called as on_node(node_name, update)
+                 after every node, including those inside branch subgraphs
+        top_k: Number of generated candidates to keep
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base sampling seed, defaults to PIPELINE_SEED
+        use_cache: Consult and fill the pipeline result cache
+        
+    Returns:
+        Final state with top candidate molecules, their predictions and
+        explanations as plain lists (see serialize_state), plus "cache_hit"
+        telling whether it came from the pipeline cache
+    """
+    constraints, seed, key = _prepare_run(
+        constraints, max_iterations, config, top_k, rank_weights, seed, use_cache
+    )
+    cached = _cached_result(key)
+    if cached is not None:
+        return cached
+
+    app = get_pipeline(config)
+    initial_state = make_initial_state(constraints, max_iterations, top_k, rank_weights, seed)
+
+    if on_node is None:
+        return _finish_run(key, app.invoke(initial_state, graph_config(max_iterations)))
+
+    result = None
+    for namespace, mode, chunk in app.stream(
+        initial_state, graph_config(max_iterations), stream_mode=["updates", "values"], subgraphs=True
+    ):
+        if mode == "values":
+            if not namespace:
+                result = chunk
+            continue
+        for name, update in chunk.items():
+            if namespace or name not in BRANCH_NODES:
+                on_node(name, serialize_state(update))
+    return _finish_run(key, result)
+
+
+async def arun_pipeline(constraints: Dict[str, Any], max_iterations: int = 1,
+                        config: Optional[PipelineConfig] = None,
+                        top_k: int = RANK_TOP_K,
+                        rank_weights: Optional[Dict[str, float]] = None,
+                        seed: Optional[int] = None,
+                        use_cache: bool = True):
+    """
+    Run the pipeline on the current event loop with async LLM calls.
+    
+    Model-bound nodes and the result cache's SQLite and JSON work still run
+    in worker threads; only the LLM round-trips are awaited, so a waiting
+    request does not hold a thread.
+    
+    Args:
+        constraints: Dictionary of molecular property constraints
+        max_iterations: Maximum number of optimization iterations
+        config: Pipeline configuration; async_llm is always switched on
+        top_k: Number of generated candidates to keep
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base sampling seed, defaults to PIPELINE_SEED
+        use_cache: Consult and fill the pipeline result cache
+        
+    Returns:
+        Final state with top candidate molecules and explanations, plus
+        "cache_hit"
+    """
+    constraints, seed, key = _prepare_run(
+        constraints, max_iterations, config, top_k, rank_weights, seed, use_cache
+    )
+    cached = await asyncio.to_thread(_cached_result, key)
+    if cached is not None:
+        return cached
+
+    config = replace(config or DEFAULT_PIPELINE_CONFIG, async_llm=True)
+    app = get_pipeline(config)
+    initial_state = make_initial_state(constraints, max_iterations, top_k, rank_weights, seed)
+    result = await app.ainvoke(initial_state, graph_config(max_iterations))
+    return await asyncio.to_thread(_finish_run, key, result)
+
+
+def run_stream(constraints: Dict[str, Any], max_iterations: int = 1,
+               config: Optional[PipelineConfig] = None,
+               top_k: int = RANK_TOP_K,
+               rank_weights: Optional[Dict[str, float]] = None,
+               seed: Optional[int] = None,
+               use_cache: bool = True):
     """
     Run pipeline with streaming to see state changes at each node.
     
+    A pipeline cache hit is yielded as a single "pipeline_cache" step
+    holding the whole cached result.
+    
     Args:
         constraints: Dictionary of molecular property constraints
         max_iterations: Maximum number of optimization iterations
+        config: Pipeline configuration, defaults to DEFAULT_PIPELINE_CONFIG
+        top_k: Number of generated candidates to keep
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base sampling seed, defaults to PIPELINE_SEED
+        use_cache: Consult and fill the pipeline result cache
         
     Yields:
         Tuple of (node_name, updated_state) for each step
     """
-    app = build_llm_pipeline()
+    constraints, seed, key = _prepare_run(
+        constraints, max_iterations, config, top_k, rank_weights, seed, use_cache
+    )
+    cached = _cached_result(key)
+    if cached is not None:
+        yield {"pipeline_cache": cached}
+        return
+
+    app = get_pipeline(config)
+    initial_state = make_initial_state(constraints, max_iterations, top_k, rank_weights, seed)
     
-    initial_state: ChemState = {
-        "constraints": constraints,
-        "max_iterations": max_iterations,
-        "iteration": 0,
-        "log": [],
-        "prompt": "",
-        "candidates": [],
-        "predictions": [],
-        "cek_list": [],
-        "is_optimize": False,
-        "llm_judge": [],
-        "topk": [],
-        "explanations": [],
-        "embedding": [],
-        "search_results": [],
-        "passed_constraints": False,
-    }
+    # Stream through each node, including those inside the branch
+    # subgraphs, and yield state updates
+    result = None
+    for namespace, mode, output in app.stream(
+        initial_state, graph_config(max_iterations), stream_mode=["updates", "values"], subgraphs=True
+    ):
+        if mode == "values":
+            if not namespace:
+                result = output
+            continue
+        if not namespace and any(name in BRANCH_NODES for name in output):
+            continue  # Branch totals repeat what their inner nodes already yielded
+        yield {name: serialize_state(update) for name, update in output.items()}
+    _finish_run(key, result)
+
+
+@dataclass
+class _BatchRun:
+    """One distinct constraint set of a batch and its pipeline state."""
+    indices: List[int]  # Positions in constraint_sets that share this run
+    key: Optional[str]  # Pipeline cache key
+    state: ChemState
+    error: Optional[str] = None
+    reported: bool = False  # The error has been yielded
+    search: Optional[Any] = None  # Pending search_step future
+
+
+# ChemState keys whose updates are appended instead of replaced
+REDUCED_STATE_KEYS = ("log", "node_metrics")
+
+
+def _apply_update(state: ChemState, update: Dict[str, Any]):
+    """Merge a node update into a state the way the graph's reducers do."""
+    for key, value in update.items():
+        state[key] = state.get(key, []) + list(value) if key in REDUCED_STATE_KEYS else value
+
+
+def _batch_node(name: str, func: Callable) -> Callable:
+    """A node function as the graph would run it, instrumented when enabled."""
+    if PIPELINE_METRICS or PROFILING_ENABLED:
+        return instrument_node(name, func)
+    return func
+
+
+def _run_batched(name: str, runs: List[_BatchRun], func: Callable[[List[ChemState]], List[Dict[str, Any]]]):
+    """
+    Run a node over the states of all live runs in one call and apply each update.
+    
+    The shared call's time, model time and cache hits go into the
+    node_metrics record of every run. If the call raises, every run fails.
+    """
+    runs = [run for run in runs if run.error is None]
+    states = [run.state for run in runs]
+    stats: Dict[str, float] = {}
+    token = _node_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        with thread_scope():
+            updates = func(states)
+    except Exception as e:
+        NODE_ERRORS.labels(node=name).inc()
+        for run in runs:
+            run.error = f"{type(e).__name__}: {e}"
+        return
+    finally:
+        _node_stats.reset(token)
+    if PIPELINE_METRICS or PROFILING_ENABLED:
+        seconds = time.perf_counter() - start
+        updates = [{**update, "node_metrics": [_node_record(name, update, stats, seconds)]} for update in updates]
+    for state, update in zip(states, updates):
+        _apply_update(state, update)
+
+
+def _run_each(executor: Optional[ThreadPoolExecutor], runs: List[_BatchRun], node: Callable):
+    """
+    Run a per-state node for every live run and apply the updates.
+    
+    With an executor the calls overlap (LLM round-trips). A run whose node
+    raises fails.
+    """
+    runs = [run for run in runs if run.error is None]
+    if executor is None:
+        results = []
+        for run in runs:
+            try:
+                results.append((run, node(run.state), None))
+            except Exception as e:
+                results.append((run, None, e))
+    else:
+        # Nodes get a snapshot, so they never see a state mid-update
+        futures = [(run, executor.submit(node, dict(run.state))) for run in runs]
+        results = []
+        for run, future in futures:
+            try:
+                results.append((run, future.result(), None))
+            except Exception as e:
+                results.append((run, None, e))
+    for run, update, error in results:
+        if error is not None:
+            run.error = f"{type(error).__name__}: {error}"
+        else:
+            _apply_update(run.state, update)
+
+
+def _generate_batch(states: List[ChemState], generation: str) -> List[Dict[str, Any]]:
+    """
+    One generation round for every state, sampled together.
+    
+    Adaptive states sample their rounds in lockstep: each round of every
+    state still sampling goes into the same sample_smiles_batch call.
+    """
+    if generation == "adaptive":
+        samplings = [_AdaptiveSampling(state) for state in states]
+        while True:
+            pending = [(sampling, sampling.next_request()) for sampling in samplings]
+            pending = [(sampling, request) for sampling, request in pending if request is not None]
+            if not pending:
+                break
+            try:
+                results = _sample_many([request for _, request in pending])
+            except Exception as e:
+                for sampling, _ in pending:
+                    sampling.fail(e)
+                continue
+            for (sampling, request), smiles_list in zip(pending, results):
+                sampling.add_round(request[1], smiles_list)
+        return [sampling.update() for sampling in samplings]
+
+    if generation != "fixed":
+        raise ValueError(f"Unknown generation mode: {generation!r}")
+    try:
+        results = _sample_many([_sampling_request(state, GENERATION_BATCH_SIZE) for state in states])
+    except Exception as e:
+        return [_generated(state, error=e) for state in states]
+    return [_generated(state, smiles_list) for state, smiles_list in zip(states, results)]
+
+
+def _predict_batch(states: List[ChemState]) -> List[Dict[str, Any]]:
+    """Predict the new candidates of every state with one ChemBERTa batch over their union."""
+    tables = [_candidate_table(state) for state in states]
+    union = list(dict.fromkeys(
+        table.smiles[i] for table in tables for i in _predictable(table.smiles.tolist())
+    ))
+    try:
+        found = dict(zip(union, predict_properties_cached(union))) if union else {}
+    except Exception:
+        # Each state falls back to its own call, and from there to one molecule at a time
+        return [_predicted(table, predict_properties_cached) for table in tables]
+    return [_predicted(table, lambda smiles: [dict(found[s]) for s in smiles]) for table in tables]
+
+
+def _fan_out(indices: List[int], result: Dict[str, Any]):
+    """Yield one result for every constraint set that shares it."""
+    first, *rest = indices
+    yield first, result
+    for index in rest:
+        yield index, copy.deepcopy(result)
+
+
+def run_batch_stream(constraint_sets: List[Dict[str, Any]], max_iterations: int = 1,
+                     config: Optional[PipelineConfig] = None,
+                     top_k: int = RANK_TOP_K,
+                     rank_weights: Optional[Dict[str, float]] = None,
+                     seed: Optional[int] = None,
+                     use_cache: bool = True,
+                     max_concurrency: int = BATCH_MAX_CONCURRENCY):
+    """
+    Run the pipeline for several constraint sets and yield each result as it finishes.
+
+    The sets go through the pipeline's stages together instead of as
+    separate graph runs: all captions are encoded in one T5 encoder pass,
+    every generation round samples all sets still iterating with one padded
+    generate call per (num_samples, grammar, max_atoms) group, and their
+    new candidates are predicted in one ChemBERTa batch over the union.
+    Vector searches, LLM evaluation, optimization and explanations run
+    concurrently, up to max_concurrency calls at once. Cached results are
+    yielded first; identical constraint sets run once.
+
+    Args:
+        constraint_sets: Constraint dicts, one per run
+        max_iterations: Maximum number of optimization iterations per run
+        config: Pipeline configuration, defaults to DEFAULT_PIPELINE_CONFIG
+                (LLM nodes always run in their sync form)
+        top_k: Number of generated candidates to keep per run
+        rank_weights: Per-property ranking weights, defaults to RANK_WEIGHTS
+        seed: Base sampling seed, defaults to PIPELINE_SEED; a seeded set
+              samples the same molecules as it would alone
+        use_cache: Consult and fill the pipeline result cache
+        max_concurrency: Searches and LLM calls in flight at once
+
+    Yields:
+        Tuple of (index into constraint_sets, result) in completion order;
+        a failed run yields {"error": message}
+    """
+    config = replace(config or DEFAULT_PIPELINE_CONFIG, async_llm=False)
+    groups: Dict[str, List[int]] = {}
+    for index, constraints in enumerate(constraint_sets):
+        key = json.dumps(constraints, sort_keys=True, default=str)
+        groups.setdefault(key, []).append(index)
+
+    runs: List[_BatchRun] = []
+    for indices in groups.values():
+        try:
+            constraints, run_seed, key = _prepare_run(
+                constraint_sets[indices[0]], max_iterations, config, top_k, rank_weights, seed, use_cache
+            )
+            cached = _cached_result(key)
+        except Exception as e:
+            yield from _fan_out(indices, {"error": f"{type(e).__name__}: {e}"})
+            continue
+        if cached is not None:
+            yield from _fan_out(indices, cached)
+            continue
+        state = make_initial_state(constraints, max_iterations, top_k, rank_weights, run_seed)
+        runs.append(_BatchRun(indices, key, state))
+    if not runs:
+        return
+
+    def drop_failed(batch: List[_BatchRun]):
+        """Yield the errors of runs that failed since the last call; return the live runs."""
+        for run in batch:
+            if run.error is not None and not run.reported:
+                run.reported = True
+                yield from _fan_out(run.indices, {"error": run.error})
+        return [run for run in batch if run.error is None]
+
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_concurrency, len(runs))), thread_name_prefix="batch"
+    )
+    try:
+        _run_each(None, runs, _batch_node("parse", parse))
+
+        # Searches overlap with the whole generation loop, as the search branch does
+        if config.use_search:
+            _run_batched("encode", runs, lambda states: _encoded(
+                [state.get("constraints", {}) for state in states], t5_encoder_batcher.run
+            ))
+            search = _batch_node("search", search_step)
+            for run in runs:
+                if run.error is None:
+                    run.search = executor.submit(search, dict(run.state))
+
+        filter_node = _batch_node("filter", filter_molecules)
+        evaluate = _batch_node("evaluate", _select_evaluate_node(config))
+        optimize = _batch_node("optimize", optimize_step)
+        rank = _batch_node("rank", rank_step)
+        should_optimize = make_should_optimize(config)
+
+        active = runs
+        while active:
+            _run_batched("generate_molecules", active, lambda states: _generate_batch(states, config.generation))
+            _run_each(None, active, filter_node)
+            _run_batched("predict", active, _predict_batch)
+            _run_each(executor if config.evaluation == "llm" else None, active, evaluate)
+            active = yield from drop_failed(active)
+
+            decisions = [should_optimize(run.state) for run in active]
+            _run_each(None, [run for run, d in zip(active, decisions) if d == "rank"], rank)
+            active = [run for run, d in zip(active, decisions) if d == "optimize"]
+            _run_each(executor, active, optimize)
+            active = yield from drop_failed(active)
+
+        finished = yield from drop_failed(runs)
+        for run in finished:
+            if run.search is not None:
+                try:
+                    _apply_update(run.state, run.search.result())
+                except Exception as e:
+                    run.error = f"{type(e).__name__}: {e}"
+        finished = yield from drop_failed(finished)
+        _run_each(None, finished, _batch_node("combine", combine_results))
+        finished = yield from drop_failed(finished)
+
+        if config.explain:
+            explain = _batch_node("llm_explainer", llm_explainer)
+            futures = {executor.submit(explain, dict(run.state)): run for run in finished}
+            for future in as_completed(futures):
+                run = futures[future]
+                try:
+                    _apply_update(run.state, future.result())
+                    result = _finish_run(run.key, run.state)
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                yield from _fan_out(run.indices, result)
+        else:
+            for run in finished:
+                try:
+                    result = _finish_run(run.key, run.state)
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                yield from _fan_out(run.indices, result)
+    finally:
+        # A consumer that stops early does not wait for calls not yet started
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pipeline_batch(constraint_sets: List[Dict[str, Any]], max_iterations: int = 1,
+                       **kwargs) -> List[Dict[str, Any]]:
+    """
+    Run the pipeline for several constraint sets with batched model calls.
+
+    Args:
+        constraint_sets: Constraint dicts, one per run
+        max_iterations: Maximum number of optimization iterations per run
+        **kwargs: Passed to run_batch_stream (config, top_k, seed, ...)
+
+    Returns:
+        One result per constraint set, in input order (see run_batch_stream)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(constraint_sets)
+    for index, result in run_batch_stream(constraint_sets, max_iterations, **kwargs):
+        results[index] = result
+    return results
+
+
+def profile_pipeline(constraints: Dict[str, Any], **kwargs):
+    """
+    Run the pipeline once under cProfile and the PyTorch profiler.
     
-    # Stream through each node and yield state updates
-    for output in app.stream(initial_state):
-        yield output
+    The result cache is bypassed so the run does the full work. Profiles
+    run one at a time; other requests served meanwhile can show up in the
+    PyTorch trace.
+    
+    Args:
+        constraints: Dictionary of molecular property constraints
+        **kwargs: Passed to run_pipeline (max_iterations, config, top_k, ...)
+        
+    Returns:
+        Final state as from run_pipeline, plus a "profile" summary with the
+        profile id, wall time, artifact files, top functions by cumulative
+        time and per-operator CPU time of the model forwards
+        
+    Raises:
+        RuntimeError: If PROFILING_ENABLED is off
+    """
+    if not PROFILING_ENABLED:
+        raise RuntimeError("Profiling is disabled (set PROFILING_ENABLED=1)")
+    kwargs["use_cache"] = False
+    session = ProfileSession(PROFILE_DIR, keep=PROFILE_KEEP)
+    result, summary = session.run(run_pipeline, constraints, **kwargs)
+    result["profile"] = summary
+    return result
 
 
 # ============================
@@ -4,8 +4,18 @@ Gradio Web Interface & API for Molecule Properties Prediction Agent
 
 import gradio as gr
 import json
-from typing import Dict, Any, Tuple
-from agent import run_pipeline, PROPERTY_NAMES
+import os
+import time
+from typing import Dict, Any, Iterator, List, Literal, Optional, Tuple
+from jobs import JobManager, JobQueueFull
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiling import profile_file
+from agent import (
+    run_pipeline, arun_pipeline, run_stream, run_batch_stream, PipelineConfig, BATCH_MAX_SIZE, inference_stats, cache_stats, model_status, start_model_warmup,
+    start_validation_pool, stop_validation_pool,
+    render_metrics, summarize_node_metrics, profile_pipeline, PROFILING_ENABLED, PROFILE_DIR,
+    MODEL_WARMUP, LLM_ASYNC, EVALUATION_MODE, GENERATION_MODE, RANK_TOP_K, PROPERTY_NAMES,
+)
 
 # ============================================================
 # HELPERS
@@ -33,6 +43,8 @@ def format_results(result: Dict[str, Any]) -> Tuple[str, str, str]:
 
         summary_parts.append(f"\n### Candidate {idx+1}\n")
         summary_parts.append(f"**SMILES:** `{smiles}`\n\n")
+        if isinstance(cand, dict) and cand.get("score") is not None:
+            summary_parts.append(f"**Score:** {cand['score']}\n\n")
         summary_parts.append("**Predicted Properties:**\n")
 
         for prop in PROPERTY_NAMES:
@@ -48,6 +60,7 @@ def format_results(result: Dict[str, Any]) -> Tuple[str, str, str]:
         {
             "rank": i + 1,
             "smiles": topk[i].get("smiles", "N/A") if isinstance(topk[i], dict) else str(topk[i]),
+            "score": topk[i].get("score") if isinstance(topk[i], dict) else None,
             "properties": predictions[i] if i < len(predictions) else {},
             "explanation": explanations[i] if i < len(explanations) else ""
         }
@@ -65,6 +78,85 @@ def format_results(result: Dict[str, Any]) -> Tuple[str, str, str]:
 
 
 
+def stream_pipeline(constraints: Dict[str, Any], max_iterations: int = 1,
+                    **kwargs) -> Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+    """
+    Yield (node, update, state) as each pipeline node finishes.
+    `state` accumulates every update so far, so after the last node it
+    holds the same keys as run_pipeline's result. Extra keyword arguments
+    (config, top_k, rank_weights) are passed to run_stream.
+    """
+    state: Dict[str, Any] = {"log": [], "node_metrics": []}
+    for output in run_stream(constraints, max_iterations=max_iterations, **kwargs):
+        for node, update in output.items():
+            update = update or {}
+            for key, value in update.items():
+                if key in ("log", "node_metrics"):
+                    state[key] = state.get(key, []) + list(value)
+                else:
+                    state[key] = value
+            yield node, update, state
+
+
+def event_payload(node: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    payload = {key: value for key, value in update.items() if key != "embedding"}
+    if "embedding" in update:
+        payload["embedding_dim"] = len(update["embedding"] or [])
+    payload["node"] = node
+    return payload
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def format_progress(node: str, state: Dict[str, Any]) -> Tuple[str, str, str]:
+    """Render a partial state while the pipeline is still running."""
+    parts = [f"## ⏳ Running… (last step: `{node}`)\n"]
+
+    search_results = state.get("search_results", [])
+    if search_results:
+        parts.append("\n### 🔎 Similar molecules from database\n")
+        for item in search_results:
+            parts.append(f"- `{item.get('smiles', 'N/A')}` — {item.get('property', '')}\n")
+
+    candidates = state.get("candidates", [])
+    if candidates:
+        parts.append("\n### 🧪 Generated candidates\n")
+        for cand in candidates:
+            pred = cand.get("properties")
+            parts.append(f"- `{cand.get('smiles', 'N/A')}` {pred if pred else ''}\n")
+
+    partial_json = json.dumps({
+        "search_results": search_results,
+        "candidates": candidates,
+    }, indent=2, default=str)
+    logs = state.get("log", [])
+    logs_text = "=== PIPELINE LOG (running) ===\n" + "\n".join(f"[{i}] {l}" for i, l in enumerate(logs, 1))
+    return logs_text, "".join(parts), partial_json
+
+
+def discover_molecules_stream(mu, alpha, gap, cv, max_atoms, max_iterations):
+    """Generator version of discover_molecules that updates the UI per node."""
+    try:
+        constraints = {
+            "mu": mu,
+            "alpha": alpha,
+            "gap": gap,
+            "Cv": cv,
+            "max_atoms": max_atoms,
+        }
+        state: Dict[str, Any] = {}
+        for node, _, state in stream_pipeline(constraints, max_iterations=max_iterations):
+            yield format_progress(node, state)
+
+        summary, json_data, logs = format_results(state)
+        yield logs, summary, json_data
+
+    except Exception as e:
+        yield f"ERROR: {str(e)}", "Error", json.dumps({"error": str(e)})
+
+
 def discover_molecules(mu, alpha, gap, cv, max_atoms, max_iterations):
     try:
         constraints = {
@@ -106,11 +198,17 @@ def discover_molecules_json(payload: str, max_iterations: int = 2):
 
 
 def health_check():
+    status = model_status()
     return {
         "status": "healthy",
         "service": "Molecule Agent",
-        "models_loaded": True,
-        "version": "1.0.0"
+        "models_loaded": status["loaded"],
+        "ready": status["ready"],
+        "models": status,
+        "version": "1.0.0",
+        "inference": inference_stats(),
+        "caches": cache_stats(),
+        "jobs": job_manager.stats(),
     }
 
 
@@ -140,7 +238,7 @@ with gr.Blocks() as demo:
         json_box = gr.Code(language="json")
 
         btn.click(
-            discover_molecules,
+            discover_molecules_stream,
             inputs=[mu, alpha, gap, cv, max_atoms, iters],
             outputs=[logs_box, summary_md, json_box]
         )
@@ -173,47 +271,177 @@ with gr.Blocks() as demo:
 # ============================================================
 
 # Custom API route (Health)
-import fastapi
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-
-app = fastapi.FastAPI()
+from contextlib import asynccontextmanager
 
-class MoleculeRequest(BaseModel):
+import fastapi
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Bind the port right away; models load and warm up in the background
+    if MODEL_WARMUP:
+        start_model_warmup()
+    # Validation workers start once, before any request can need them
+    start_validation_pool()
+    yield
+    stop_validation_pool()
+
+app = fastapi.FastAPI(lifespan=lifespan)
+
+class ConstraintSet(BaseModel):
     mu: float = 2.5
     alpha: float = 70.0
     gap: float = 0.3
     Cv: float = 30.0
     max_atoms: int = 20
+
+    def constraints(self) -> Dict[str, Any]:
+        return {
+            "mu": self.mu,
+            "alpha": self.alpha,
+            "gap": self.gap,
+            "Cv": self.Cv,
+            "max_atoms": self.max_atoms,
+        }
+
+
+class ScalarRunOptions(BaseModel):
+    # Options that fit in a query string
     max_iterations: int = 1
+    evaluation: Literal["numeric", "llm"] = EVALUATION_MODE
+    generation: Literal["fixed", "adaptive"] = GENERATION_MODE
+    top_k: int = Field(RANK_TOP_K, ge=1, le=100)
+    seed: Optional[int] = None  # Sampling seed, defaults to PIPELINE_SEED
+    use_cache: bool = True  # False forces a fresh run
+
+
+class RunOptions(ScalarRunOptions):
+    rank_weights: Optional[Dict[str, float]] = None
+
+    def pipeline_config(self) -> PipelineConfig:
+        return PipelineConfig(evaluation=self.evaluation, generation=self.generation)
+
+    def run_kwargs(self) -> Dict[str, Any]:
+        """Keyword arguments for run_pipeline / arun_pipeline / run_stream."""
+        return {
+            "max_iterations": self.max_iterations,
+            "config": self.pipeline_config(),
+            "top_k": self.top_k,
+            "rank_weights": self.rank_weights,
+            "seed": self.seed,
+            "use_cache": self.use_cache,
+        }
+
+
+class MoleculeRequest(ConstraintSet, RunOptions):
+    profile: bool = False  # Profile this run (needs PROFILING_ENABLED=1); also via "X-Profile: 1"
+
+
+class MoleculeQuery(ConstraintSet, ScalarRunOptions):
+    # Query-parameter form of MoleculeRequest for GET /generate/stream
+    rank_weights: Optional[str] = None  # JSON object, e.g. {"mu": 2.0}
+
+    def request(self) -> MoleculeRequest:
+        """Parse rank_weights and validate as a MoleculeRequest (raises ValueError)."""
+        fields = self.model_dump(exclude={"rank_weights"})
+        if self.rank_weights:
+            fields["rank_weights"] = json.loads(self.rank_weights)
+        return MoleculeRequest(**fields)
+
+
+class BatchRequest(RunOptions):
+    # Options apply to every set; identical sets are run once
+    constraint_sets: List[ConstraintSet] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+def build_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    response = {
+        "status": "success",
+        "cache_hit": result.get("cache_hit", False),
+        "passed_constraints": result.get("passed_constraints", False),
+        "iterations": result.get("iteration", 0),
+        "predictions": result.get("predictions", []),
+        "topk": result.get("topk", []),
+        "explanations": result.get("explanations", []),
+        "generation_stats": result.get("generation_stats", []),
+        "metrics": result.get("metrics") or summarize_node_metrics(result.get("node_metrics", [])),
+    }
+    if "profile" in result:
+        profile = result["profile"]
+        response["profile"] = {
+            **profile,
+            "download": {kind: f"/profiles/{profile['id']}/{kind}" for kind in profile["files"]},
+        }
+    return response
+
+
+# Background jobs: bounded concurrency, results kept for JOB_TTL_SECONDS
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+
+job_manager = JobManager(
+    max_workers=JOB_WORKERS,
+    ttl_seconds=JOB_TTL_SECONDS,
+    max_pending=JOB_MAX_PENDING,
+)
 
 @app.get("/health")
 def _health():
     return JSONResponse(health_check())
 
+@app.get("/metrics")
+def _metrics():
+    """
+    Prometheus metrics: per-node latency, model and LLM time, tokens, cache hits
+    """
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/profiles/{profile_id}/{kind}")
+def get_profile_file(profile_id: str, kind: str):
+    """
+    Download a profile artifact: trace, stacks, pstats or summary
+    """
+    path = profile_file(PROFILE_DIR, profile_id, kind) if PROFILING_ENABLED else None
+    if path is None:
+        return JSONResponse({"status": "error", "error": "Unknown profile or file"}, status_code=404)
+    return FileResponse(path, filename=f"{profile_id}-{os.path.basename(path)}")
+
+@app.get("/ready")
+def _ready():
+    """
+    Readiness probe: 200 once every model is loaded and warmed up, 503 before
+    """
+    status = model_status()
+    if MODEL_WARMUP and status["warmup"]["state"] == "failed":
+        # Retry a failed warm-up instead of staying unready until a request loads the models
+        start_model_warmup()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.post("/generate")
-def generate_molecule(request: MoleculeRequest):
+async def generate_molecule(request: MoleculeRequest, x_profile: Optional[str] = fastapi.Header(None)):
     """
     Generate molecules based on constraints
     """
+    profile = request.profile or (x_profile or "").lower() in ("1", "true", "yes")
+    if profile and not PROFILING_ENABLED:
+        return JSONResponse({
+            "status": "error",
+            "error": "Profiling is disabled on this server (PROFILING_ENABLED=0)",
+        }, status_code=403)
+
     try:
-        constraints = {
-            "mu": request.mu,
-            "alpha": request.alpha,
-            "gap": request.gap,
-            "Cv": request.Cv,
-            "max_atoms": request.max_atoms,
-        }
-        result = run_pipeline(constraints, max_iterations=request.max_iterations)
+        if profile:
+            result = await run_in_threadpool(profile_pipeline, request.constraints(), **request.run_kwargs())
+        elif LLM_ASYNC:
+            # LLM round-trips are awaited instead of blocking a worker thread
+            result = await arun_pipeline(request.constraints(), **request.run_kwargs())
+        else:
+            result = await run_in_threadpool(run_pipeline, request.constraints(), **request.run_kwargs())
         
-        return JSONResponse({
-            "status": "success",
-            "passed_constraints": result.get("passed_constraints", False),
-            "iterations": result.get("iteration", 0),
-            "predictions": result.get("predictions", []),
-            "topk": result.get("topk", []),
-            "explanations": result.get("explanations", []),
-        }, status_code=200)
+        return JSONResponse(build_response(result), status_code=200)
     except Exception as e:
         return JSONResponse({
             "status": "error",
@@ -223,6 +451,107 @@ def generate_molecule(request: MoleculeRequest):
             "explanations": []
         }, status_code=500)
 
+def _sse_response(request: MoleculeRequest) -> StreamingResponse:
+    constraints = request.constraints()
+
+    def events():
+        try:
+            state: Dict[str, Any] = {}
+            for node, update, state in stream_pipeline(constraints, **request.run_kwargs()):
+                yield format_sse(node, event_payload(node, update))
+            yield format_sse("result", build_response(state))
+        except Exception as e:
+            yield format_sse("error", {"status": "error", "error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/generate/stream")
+def generate_molecule_stream(request: MoleculeRequest):
+    """
+    Stream per-node results as server-sent events; the final event is "result"
+    """
+    return _sse_response(request)
+
+@app.get("/generate/stream")
+def generate_molecule_stream_get(query: MoleculeQuery = fastapi.Depends()):
+    """
+    Same as POST /generate/stream with constraints as query parameters (for EventSource)
+    """
+    try:
+        request = query.request()
+    except ValueError as e:
+        return JSONResponse({"status": "error", "error": f"Invalid rank_weights: {e}"}, status_code=422)
+    return _sse_response(request)
+
+@app.post("/generate/batch")
+def generate_molecule_batch(request: BatchRequest):
+    """
+    Run several constraint sets with batched model calls; one "result" (or
+    "error") event per set as it finishes, then "done"
+    """
+    constraint_sets = [item.constraints() for item in request.constraint_sets]
+
+    def events():
+        start = time.perf_counter()
+        failed = 0
+        for index, result in run_batch_stream(constraint_sets, **request.run_kwargs()):
+            if "error" in result:
+                failed += 1
+                yield format_sse("error", {"index": index, "status": "error", "error": result["error"]})
+                continue
+            yield format_sse("result", {
+                "index": index,
+                "constraints": constraint_sets[index],
+                **build_response(result),
+            })
+        yield format_sse("done", {
+            "count": len(constraint_sets),
+            "failed": failed,
+            "seconds": round(time.perf_counter() - start, 3),
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/jobs")
+def create_job(request: MoleculeRequest):
+    """
+    Queue a generation job and return its id immediately
+    """
+    constraints = request.constraints()
+
+    def job(progress):
+        result = run_pipeline(constraints, on_node=progress, **request.run_kwargs())
+        return build_response(result)
+
+    try:
+        record = job_manager.submit(job, request=request.model_dump())
+    except JobQueueFull as e:
+        return JSONResponse({"status": "error", "error": str(e)}, status_code=429)
+
+    return JSONResponse({
+        "job_id": record["job_id"],
+        "status": record["status"],
+        "status_url": f"/jobs/{record['job_id']}",
+    }, status_code=202)
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Poll a job's status, per-node progress and result
+    """
+    record = job_manager.get(job_id)
+    if record is None:
+        return JSONResponse({"status": "error", "error": "Unknown or expired job"}, status_code=404)
+    return JSONResponse(record)
+
 # Mount Gradio app to FastAPI
 app = gr.mount_gradio_app(app, demo, path="/")
 
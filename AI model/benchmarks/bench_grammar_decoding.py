@@ -0,0 +1,117 @@
+"""
+Benchmark: unconstrained vs SMILES-grammar-constrained MolT5 sampling.
+Samples the same captions with and without the grammar LogitsProcessor and
+reports RDKit validity, unique valid molecules, tokens generated per valid
+molecule and wall time per valid molecule.
+
+Usage:
+    python benchmarks/bench_grammar_decoding.py [--rounds 5] [--samples 10] [--max-atoms 20]
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch  # noqa: E402
+from transformers import LogitsProcessorList  # noqa: E402
+
+import agent  # noqa: E402
+from smiles_grammar import grammar_processor  # noqa: E402
+
+
+CAPTIONS = [
+    "properties: mu=2.5, alpha=70, gap=0.3, Cv=30, max_atoms=20",
+    "properties: mu=0.0, alpha=50, gap=0.25, Cv=20, max_atoms=9",
+    "properties: mu=4.0, alpha=80, gap=0.2, Cv=35, max_atoms=12",
+]
+
+
+def sample(caption, samples, grammar, max_atoms):
+    """Return (decoded strings, generated token count) for one caption."""
+    tokenizer, model = agent.models.tokenizer_t5, agent.models.model_t5
+    input_ids = tokenizer(caption, return_tensors="pt").input_ids
+    processors = None
+    if grammar:
+        processors = LogitsProcessorList([grammar_processor(tokenizer, model.config, max_atoms=max_atoms)])
+
+    with torch.no_grad():
+        outputs = model.generate(
+            input_ids,
+            max_length=256,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            temperature=0.8,
+            num_return_sequences=samples,
+            logits_processor=processors,
+        )
+
+    pad = model.config.pad_token_id
+    tokens = int((outputs[:, 1:] != pad).sum())
+    texts = [tokenizer.decode(out, skip_special_tokens=True).strip() for out in outputs]
+    return texts, tokens
+
+
+def run(mode, args):
+    grammar = mode == "grammar"
+    torch.manual_seed(args.seed)
+    total = valid = tokens = 0
+    unique = set()
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for caption in CAPTIONS:
+            texts, n_tokens = sample(caption, args.samples, grammar, args.max_atoms)
+            tokens += n_tokens
+            total += len(texts)
+            for text in texts:
+                mol = agent.Chem.MolFromSmiles(text) if text else None
+                if mol is not None:
+                    valid += 1
+                    unique.add(agent.Chem.MolToSmiles(mol))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "samples": total,
+        "valid": valid,
+        "unique_valid": len(unique),
+        "validity": round(valid / total, 4) if total else 0.0,
+        "tokens": tokens,
+        "tokens_per_valid": round(tokens / valid, 2) if valid else None,
+        "seconds": round(elapsed, 3),
+        "ms_per_valid": round(elapsed * 1000.0 / valid, 2) if valid else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5, help="Passes over the captions")
+    parser.add_argument("--samples", type=int, default=10, help="Sequences per caption per pass")
+    parser.add_argument("--max-atoms", type=int, default=None, help="Heavy-atom cap for the grammar run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    if agent.Chem is None:
+        raise SystemExit("RDKit is required to measure validity")
+
+    results = [run("unconstrained", args), run("grammar", args)]
+
+    print(f"{'mode':<14} {'validity':>9} {'unique':>7} {'tok/valid':>10} {'ms/valid':>9}")
+    for r in results:
+        print(
+            f"{r['mode']:<14} {r['validity']:>9.3f} {r['unique_valid']:>7} "
+            f"{str(r['tokens_per_valid']):>10} {str(r['ms_per_valid']):>9}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
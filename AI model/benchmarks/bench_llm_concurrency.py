@@ -0,0 +1,76 @@
+"""
+Benchmark: blocking vs async LLM calls under concurrent load.
+Starts the local LLM stub server, then runs the same batch of evaluate_step
+calls through a fixed-size thread pool (sync path) and through asyncio
+(async path). No model weights are needed.
+
+Usage:
+    python benchmarks/bench_llm_concurrency.py [--requests 64] [--threads 8] [--delay 1.0]
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from llm_stub_server import start_in_thread  # noqa: E402
+
+
+def make_state(i):
+    prediction = {"mu": 2.0 + i % 3, "alpha": 65.0, "gap": 0.3, "Cv": 29.0, "num_atoms": 9.0}
+    return {
+        "constraints": {"mu": 2.5, "alpha": 70, "gap": 0.3, "Cv": 30, "max_atoms": 20},
+        "candidates": [{"smiles": s, **prediction} for s in ("CCO", "CCN", "c1ccccc1")],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8, help="Worker threads for the sync path")
+    parser.add_argument("--delay", type=float, default=1.0, help="Simulated LLM latency (s)")
+    parser.add_argument("--port", type=int, default=8808)
+    args = parser.parse_args()
+
+    start_in_thread(port=args.port, delay=args.delay)
+    os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENROUTER_API_KEY", "stub")
+
+    import agent  # Imported after LLM_BASE_URL points at the stub
+
+    states = [make_state(i) for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        sync_results = list(pool.map(agent.evaluate_step, states))
+    sync_elapsed = time.perf_counter() - start
+
+    async def run_async():
+        return await asyncio.gather(*(agent.aevaluate_step(s) for s in states))
+
+    start = time.perf_counter()
+    async_results = asyncio.run(run_async())
+    async_elapsed = time.perf_counter() - start
+
+    errors = sum(
+        1 for r in sync_results + list(async_results)
+        if any("error" in note.lower() for note in r["candidates"].note)
+    )
+    print(f"requests={args.requests} delay={args.delay}s threads={args.threads} "
+          f"llm_max_concurrency={agent.LLM_MAX_CONCURRENCY}")
+    print(f"{'path':<8} {'seconds':>9} {'req/s':>9}")
+    print(f"{'sync':<8} {sync_elapsed:>9.2f} {args.requests / sync_elapsed:>9.2f}")
+    print(f"{'async':<8} {async_elapsed:>9.2f} {args.requests / async_elapsed:>9.2f}")
+    if errors:
+        print(f"warning: {errors} responses contained errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark: offline per-node latency, end-to-end throughput and peak memory.
+Replaces the LLM and Qdrant clients with deterministic local stand-ins
+(and, by default, both Hub models with tiny random ones), then
+  1. times every node of build_llm_pipeline over sequential run_pipeline calls
+     (from the node_metrics records the pipeline writes),
+  2. drives POST /generate on the FastAPI app at several concurrency levels,
+  3. records peak RSS after each phase,
+and writes everything as JSON so runs from different commits can be diffed.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--runs 20] [--concurrency 1 4 16] [--output results.json]
+    python benchmarks/bench_pipeline.py --models hub   # real MolT5/ChemBERTa from the Hub
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))]
+
+
+def summarize(timings_ms):
+    """Count, mean and tail latency of a list of millisecond timings."""
+    if not timings_ms:
+        return {"count": 0}
+    return {
+        "count": len(timings_ms),
+        "mean_ms": round(statistics.fmean(timings_ms), 3),
+        "p50_ms": round(percentile(timings_ms, 50), 3),
+        "p95_ms": round(percentile(timings_ms, 95), 3),
+        "max_ms": round(max(timings_ms), 3),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ============================
+# PER-NODE TIMING
+# ============================
+
+
+def bench_nodes(agent, constraints, args):
+    """Time each node over `args.runs` sequential run_pipeline calls."""
+    if not agent.PIPELINE_METRICS:
+        raise SystemExit("Per-node timing needs PIPELINE_METRICS=1")
+
+    def run_once():
+        return agent.run_pipeline(constraints, args.max_iterations, seed=args.seed, use_cache=False)
+
+    for _ in range(args.warmup):
+        run_once()
+
+    timings = defaultdict(list)
+    model_ms = defaultdict(float)
+    end_to_end = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        result = run_once()
+        end_to_end.append((time.perf_counter() - start) * 1000.0)
+        for record in result.get("node_metrics", []):
+            timings[record["node"]].append(record["ms"])
+            model_ms[record["node"]] += record.get("model_ms", 0.0)
+
+    nodes = {}
+    for name, values in sorted(timings.items()):
+        nodes[name] = summarize(values)
+        nodes[name]["mean_model_ms"] = round(model_ms[name] / len(values), 3)
+    return {"nodes": nodes, "run_pipeline": summarize(end_to_end)}
+
+
+# ============================
+# THROUGHPUT
+# ============================
+
+
+async def drive_app(fastapi_app, payload, concurrency, requests):
+    """Send `requests` POST /generate calls with at most `concurrency` in flight."""
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(client):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/generate", json=payload)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=fastapi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else None,
+        **{k: v for k, v in summarize(latencies).items() if k != "count"},
+    }
+
+
+def bench_throughput(payload, args):
+    import app as web
+
+    results = []
+    for concurrency in args.concurrency:
+        asyncio.run(drive_app(web.app, payload, concurrency, max(concurrency, args.warmup)))
+        requests = args.requests or concurrency * 4
+        results.append(asyncio.run(drive_app(web.app, payload, concurrency, requests)))
+        print(
+            f"concurrency {concurrency:>3}: {results[-1]['throughput_rps']} req/s, "
+            f"p50 {results[-1]['p50_ms']} ms, p95 {results[-1]['p95_ms']} ms, errors {results[-1]['errors']}"
+        )
+    return results
+
+
+# ============================
+# MAIN
+# ============================
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", choices=["tiny", "hub"], default="tiny",
+                        help="Tiny random models (offline) or the real Hub models")
+    parser.add_argument("--runs", type=int, default=20, help="Sequential runs for per-node timing")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs before each phase")
+    parser.add_argument("--max-iterations", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=0,
+                        help="Requests per concurrency level (default 4x the level)")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--search-delay", type=float, default=0.0, help="Simulated seconds per vector search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="Leave the prediction, embedding and pipeline caches on")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    # Configuration is read at import time
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
+    os.environ.setdefault("SEARCH_BACKEND", "qdrant")
+    os.environ["PIPELINE_SEED"] = str(args.seed)
+    if not args.keep_caches:
+        for name in ("PIPELINE_CACHE_SIZE", "PREDICTION_CACHE_SIZE", "EMBEDDING_CACHE_SIZE"):
+            os.environ[name] = "0"
+
+    import torch  # noqa: E402
+
+    import agent  # noqa: E402
+    from offline import install  # noqa: E402
+
+    start = time.perf_counter()
+    install(agent, tiny_models=args.models == "tiny", llm_delay=args.llm_delay,
+            search_delay=args.search_delay, seed=args.seed)
+    agent.models.load_all()
+    setup_seconds = time.perf_counter() - start
+
+    constraints = {"mu": 2.5, "alpha": 70.0, "gap": 0.3, "Cv": 30.0, "max_atoms": 20}
+    payload = {**constraints, "max_iterations": args.max_iterations, "seed": args.seed}
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "device": str(agent.device),
+            "args": vars(args),
+            "setup_seconds": round(setup_seconds, 3),
+        },
+        "memory": {"after_setup_peak_rss_mb": peak_rss_mb()},
+    }
+
+    print(f"Per-node latency over {args.runs} runs ({args.models} models)")
+    results.update(bench_nodes(agent, constraints, args))
+    results["memory"]["after_nodes_peak_rss_mb"] = peak_rss_mb()
+
+    print(f"{'node':<20} {'count':>6} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'model ms':>10}")
+    for name, stats in list(results["nodes"].items()) + [("run_pipeline", results["run_pipeline"])]:
+        print(
+            f"{name:<20} {stats['count']:>6} {stats['mean_ms']:>10.2f} {stats['p50_ms']:>10.2f} "
+            f"{stats['p95_ms']:>10.2f} {stats.get('mean_model_ms', 0.0):>10.2f}"
+        )
+
+    print("\nThroughput against POST /generate")
+    results["throughput"] = bench_throughput(payload, args)
+    results["memory"]["after_throughput_peak_rss_mb"] = peak_rss_mb()
+    print(f"\nPeak RSS: {results['memory']['after_throughput_peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: sequential run_pipeline calls against one run_pipeline_batch call.
+Runs the same constraint sets both ways with the offline stand-ins (see
+bench_pipeline.py) and reports wall time plus the micro-batcher stats, so the
+effect of cross-request batched MolT5 generation and ChemBERTa prediction
+shows up as fewer, larger forward passes. Both passes use the same seed, so
+the batch results are also checked against the sequential ones.
+
+Usage:
+    python benchmarks/bench_pipeline_batch.py [--sets 16] [--max-iterations 1] [--output results.json]
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+
+def constraint_sets(count):
+    """`count` distinct constraint sets around the demo defaults."""
+    return [
+        {"mu": round(1.5 + 0.1 * i, 2), "alpha": 70.0 + i, "gap": 0.3, "Cv": 30.0, "max_atoms": 20}
+        for i in range(count)
+    ]
+
+
+BATCHERS = ("t5_generate", "t5_encoder", "chemberta")
+
+
+def top_smiles(result):
+    """Ranked SMILES of one pipeline result."""
+    return [row.get("smiles") for row in result.get("topk", [])]
+
+
+def batcher_counts(agent):
+    stats = agent.inference_stats()
+    return {name: (stats[name]["batches"], stats[name]["items"]) for name in BATCHERS}
+
+
+def batcher_delta(before, after):
+    """Batches, items and mean batch size of each batcher between two snapshots."""
+    delta = {}
+    for name in BATCHERS:
+        batches = after[name][0] - before[name][0]
+        items = after[name][1] - before[name][1]
+        delta[name] = {
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+        }
+    return delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models", choices=["tiny", "hub"], default="tiny",
+                        help="Tiny random models (offline) or the real Hub models")
+    parser.add_argument("--sets", type=int, default=16, help="Constraint sets per run")
+    parser.add_argument("--max-iterations", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=16, help="max_concurrency for run_pipeline_batch")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed shared by both passes")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    # Configuration is read at import time; caches would turn the second pass into lookups
+    os.environ.setdefault("MODEL_WARMUP", "0")
+    os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
+    os.environ.setdefault("SEARCH_BACKEND", "qdrant")
+    for name in ("PIPELINE_CACHE_SIZE", "PREDICTION_CACHE_SIZE", "EMBEDDING_CACHE_SIZE"):
+        os.environ[name] = "0"
+
+    import agent  # noqa: E402
+    from offline import install  # noqa: E402
+
+    install(agent, tiny_models=args.models == "tiny", llm_delay=args.llm_delay)
+    agent.models.load_all()
+
+    sets = constraint_sets(args.sets)
+    agent.run_pipeline(sets[0], args.max_iterations, seed=args.seed, use_cache=False)  # Warm-up
+
+    results = {"args": vars(args)}
+
+    before = batcher_counts(agent)
+    start = time.perf_counter()
+    sequential = [
+        agent.run_pipeline(constraints, args.max_iterations, seed=args.seed, use_cache=False)
+        for constraints in sets
+    ]
+    results["sequential"] = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "batchers": batcher_delta(before, batcher_counts(agent)),
+    }
+
+    before = batcher_counts(agent)
+    start = time.perf_counter()
+    batch = agent.run_pipeline_batch(
+        sets, args.max_iterations, seed=args.seed, use_cache=False, max_concurrency=args.concurrency
+    )
+    results["batch"] = {
+        "seconds": round(time.perf_counter() - start, 3),
+        "failed": sum(1 for result in batch if "error" in result),
+        "same_molecules": sum(
+            1 for one, batched in zip(sequential, batch)
+            if top_smiles(one) == top_smiles(batched)
+        ),
+        "batchers": batcher_delta(before, batcher_counts(agent)),
+    }
+
+    print(f"{'mode':<12} {'seconds':>9} {'sets/s':>8}  t5_generate / t5_encoder / chemberta avg batch")
+    for mode in ("sequential", "batch"):
+        entry = results[mode]
+        sizes = " / ".join(f"{entry['batchers'][name]['avg_batch_size']:.2f}" for name in BATCHERS)
+        print(f"{mode:<12} {entry['seconds']:>9.3f} {args.sets / entry['seconds']:>8.2f}  {sizes}")
+    print(f"Batch results with the same top-k molecules as sequential: "
+          f"{results['batch']['same_molecules']}/{args.sets}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
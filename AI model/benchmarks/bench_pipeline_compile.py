@@ -0,0 +1,53 @@
+"""
+Benchmark: per-request graph construction overhead.
+Compares rebuilding the LangGraph pipeline on every request with reusing
+the compiled instance from the registry.
+
+Usage:
+    python benchmarks/bench_pipeline_compile.py [--repeats N]
+"""
+
+# Standard library imports
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import build_llm_pipeline, get_pipeline  # noqa: E402
+
+
+def time_calls(fn, repeats):
+    """Return per-call wall times in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    get_pipeline()  # Warm the registry so only lookups are timed
+
+    rebuild = time_calls(build_llm_pipeline, args.repeats)
+    cached = time_calls(get_pipeline, args.repeats)
+
+    print(f"{'mode':<10} {'mean ms':>10} {'median ms':>10} {'max ms':>10}")
+    for name, timings in (("rebuild", rebuild), ("registry", cached)):
+        print(
+            f"{name:<10} {statistics.mean(timings):>10.3f} "
+            f"{statistics.median(timings):>10.3f} {max(timings):>10.3f}"
+        )
+    saved = statistics.mean(rebuild) - statistics.mean(cached)
+    print(f"\nOverhead removed per request: {saved:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
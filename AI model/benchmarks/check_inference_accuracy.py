@@ -0,0 +1,117 @@
+"""
+Accuracy regression check: quantized / ONNX ChemBERTa vs fp32.
+Predicts the five QM9 properties for a held-out SMILES set with the fp32
+model and each requested backend, then reports per-property error and
+latency. Exits non-zero if any backend drifts beyond the allowed error.
+
+Usage:
+    python benchmarks/check_inference_accuracy.py [--backends int8 onnx] [--smiles-file FILE]
+"""
+
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+import agent  # noqa: E402
+from inference import apply_regressor_backend  # noqa: E402
+
+
+# Small QM9 molecules not used to pick any tolerance below
+HELD_OUT_SMILES = [
+    "C", "N", "O", "C#C", "C#N", "C=O", "CC", "CO", "CC#C", "CC#N",
+    "CC=O", "NC=O", "CCC", "CCO", "COC", "C1CC1", "C1CO1", "CC(C)=O",
+    "CC(=O)N", "NC(=O)N", "OC=O", "CC(C)C", "CC(C)O", "C1CCC1", "c1ccoc1",
+    "c1cc[nH]c1", "CC1CC1", "OCC#C", "CC(O)C#N", "c1ccncc1", "Cc1ccccc1", "OC1CCC1",
+]
+
+# Largest allowed absolute error per property, as a fraction of the
+# constraint tolerance used by the numeric evaluator
+DEFAULT_TOLERANCE_FRACTION = 0.1
+NUM_ATOMS_MAX_ERROR = 0.5
+
+
+def predict(smiles, model, repeats):
+    """Return predictions as an (n, 5) matrix and the best wall time in ms."""
+    best = float("inf")
+    rows = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = agent.predict_properties_batch(smiles, model=model)
+        best = min(best, (time.perf_counter() - start) * 1000.0)
+    matrix = np.array([[row[name] for name in agent.PROPERTY_NAMES] for row in rows], dtype=np.float64)
+    return matrix, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"])
+    parser.add_argument("--smiles-file", help="One SMILES per line (default: built-in held-out set)")
+    parser.add_argument("--tolerance-fraction", type=float, default=DEFAULT_TOLERANCE_FRACTION)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per backend (best is kept)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    smiles = HELD_OUT_SMILES
+    if args.smiles_file:
+        with open(args.smiles_file, "r", encoding="utf-8") as f:
+            smiles = [line.strip() for line in f if line.strip()]
+
+    max_error = {
+        name: agent.CONSTRAINT_TOLERANCES[name] * args.tolerance_fraction
+        for name in agent.CONSTRAINT_TOLERANCES
+    }
+    max_error["num_atoms"] = NUM_ATOMS_MAX_ERROR
+
+    reference_model = agent.load_chemberta_fp32().cpu()
+    reference, reference_ms = predict(smiles, reference_model, args.repeats)
+
+    results = {"smiles": len(smiles), "fp32_ms": round(reference_ms, 3), "backends": {}}
+    failed = False
+
+    print(f"{len(smiles)} held-out SMILES, fp32 batch time {reference_ms:.2f} ms\n")
+    print(f"{'backend':<8} {'property':<10} {'MAE':>10} {'max err':>10} {'allowed':>10}")
+    for backend in args.backends:
+        model = apply_regressor_backend(
+            agent.load_chemberta_fp32().cpu(),
+            backend,
+            name=f"chemberta_{agent.MODEL_CHEMBERTA_HUB}",
+            cache_dir=agent.ONNX_CACHE_DIR,
+            num_threads=agent.ONNX_NUM_THREADS,
+        )
+        predicted, elapsed_ms = predict(smiles, model, args.repeats)
+        errors = np.abs(predicted - reference)
+
+        per_property = {}
+        for i, name in enumerate(agent.PROPERTY_NAMES):
+            mae, worst = float(errors[:, i].mean()), float(errors[:, i].max())
+            ok = worst <= max_error[name]
+            failed = failed or not ok
+            per_property[name] = {"mae": mae, "max_error": worst, "allowed": max_error[name], "ok": ok}
+            flag = "" if ok else "  FAIL"
+            print(f"{backend:<8} {name:<10} {mae:>10.5f} {worst:>10.5f} {max_error[name]:>10.5f}{flag}")
+
+        speedup = reference_ms / elapsed_ms if elapsed_ms else 0.0
+        print(f"{backend:<8} batch time {elapsed_ms:.2f} ms ({speedup:.2f}x vs fp32)\n")
+        results["backends"][backend] = {
+            "ms": round(elapsed_ms, 3),
+            "speedup": round(speedup, 3),
+            "properties": per_property,
+        }
+
+    results["passed"] = not failed
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print("PASSED" if not failed else "FAILED")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local OpenAI-compatible stub server for LLM load testing.
+Answers /v1/chat/completions after a configurable delay, so the pipeline's
+LLM nodes can be exercised without OpenRouter.
+
+Usage:
+    python benchmarks/llm_stub_server.py --port 8808 --delay 2.0
+    LLM_BASE_URL=http://127.0.0.1:8808/v1 python app.py
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import random
+import re
+import threading
+import time
+import uuid
+
+# Third-party imports
+import fastapi
+import uvicorn
+
+
+def fake_completion(prompt: str) -> str:
+    """Answer in the numbered format the pipeline's parsers expect."""
+    n_molecules = len(re.findall(r"SMILES:", prompt))
+    if n_molecules == 0:
+        return "1) Candidates were too large.\n2) properties: smaller molecule, fewer heavy atoms"
+    return "\n".join(
+        f"{i}. {'Yes' if i % 2 else 'No'} - predicted properties are "
+        f"{'within' if i % 2 else 'outside'} the requested range."
+        for i in range(1, n_molecules + 1)
+    )
+
+
+def create_app(delay: float = 1.0, jitter: float = 0.0) -> fastapi.FastAPI:
+    """
+    Build the stub app.
+
+    Args:
+        delay: Seconds to wait before answering each request
+        jitter: Extra uniform random delay in [0, jitter] seconds
+    """
+    app = fastapi.FastAPI()
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        app.state.requests += 1
+        app.state.in_flight += 1
+        app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+        try:
+            await asyncio.sleep(delay + random.uniform(0, jitter))
+        finally:
+            app.state.in_flight -= 1
+
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        content = fake_completion(prompt)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt.split()),
+                "completion_tokens": len(content.split()),
+                "total_tokens": len(prompt.split()) + len(content.split()),
+            },
+        }
+
+    @app.get("/stats")
+    def stats():
+        return {
+            "requests": app.state.requests,
+            "in_flight": app.state.in_flight,
+            "max_in_flight": app.state.max_in_flight,
+        }
+
+    return app
+
+
+def start_in_thread(port: int = 8808, delay: float = 1.0, jitter: float = 0.0) -> uvicorn.Server:
+    """Start the stub server in a daemon thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(delay, jitter), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    threading.Thread(target=server.run, name="llm-stub", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--delay", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay, args.jitter), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Deterministic in-process stand-ins for the pipeline's external services.
+Replaces the LLM client and the Qdrant client, and optionally the Hub
+models, with local objects so benchmarks run offline and repeatably.
+
+Usage (from another benchmark):
+    import agent
+    from offline import install
+    install(agent, tiny_models=True)
+"""
+
+# Standard library imports
+import asyncio
+import time
+import types
+from typing import Any, Dict
+
+# Third-party imports
+import numpy as np
+import torch
+from langchain_core.messages import AIMessage
+
+from llm_stub_server import fake_completion
+
+
+# Search hits returned by the stub Qdrant client, with QM9-like properties
+STUB_MOLECULES = [
+    ("C", 0.0, 13.2, 0.50, 6.5, 5),
+    ("CO", 1.6, 16.8, 0.36, 10.7, 6),
+    ("CCO", 1.5, 27.5, 0.32, 15.4, 9),
+    ("CC=O", 2.7, 24.6, 0.25, 13.5, 7),
+    ("CC(C)=O", 2.8, 34.9, 0.24, 18.5, 10),
+    ("NC=O", 3.8, 19.5, 0.27, 11.4, 6),
+    ("c1ccoc1", 0.7, 42.1, 0.25, 18.3, 9),
+    ("c1ccncc1", 2.2, 54.0, 0.24, 20.6, 11),
+    ("Cc1ccccc1", 0.4, 77.9, 0.24, 28.3, 15),
+    ("CC(C)C", 0.1, 44.0, 0.34, 23.4, 14),
+    ("OCC#C", 1.9, 33.6, 0.26, 17.8, 8),
+    ("CC(O)C#N", 3.6, 39.1, 0.28, 21.5, 10),
+]
+
+# Characters of the tiny models' vocabularies (SMILES plus caption text)
+SMILES_CHARS = list("CNOFScnos()[]=#123456789+-@H/\\.%")
+CAPTION_CHARS = list("abdefghijklmpqrtuvwxyz ABDEGIJKLMPQRTUVWXYZ0_:,")
+
+# Mean and spread of the five QM9 targets, used by the tiny label scaler
+QM9_MEAN = [2.7, 75.2, 0.25, 31.6, 18.0]
+QM9_SCALE = [1.5, 8.2, 0.047, 4.1, 3.0]
+
+
+# ============================
+# LLM
+# ============================
+
+
+class StubLLM:
+    """
+    Chat-model stand-in answering in the numbered format the pipeline parses.
+
+    Responses depend only on the prompt. Token usage is reported the way
+    langchain chat models do, counting whitespace-separated words.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def _respond(self, prompt: str) -> AIMessage:
+        self.calls += 1
+        content = fake_completion(str(prompt))
+        input_tokens, output_tokens = len(str(prompt).split()), len(content.split())
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+
+    def invoke(self, prompt, **kwargs) -> AIMessage:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt, **kwargs) -> AIMessage:
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self._respond(prompt)
+
+
+# ============================
+# VECTOR DATABASE
+# ============================
+
+
+class StubQdrantClient:
+    """
+    `query_points` stand-in ranking STUB_MOLECULES by cosine similarity.
+
+    Each molecule gets a fixed random vector (drawn from `seed`) the first
+    time a query of a given dimension arrives.
+    """
+
+    def __init__(self, delay: float = 0.0, seed: int = 0):
+        self.delay = delay
+        self.seed = seed
+        self.calls = 0
+        self._vectors: Dict[int, np.ndarray] = {}
+
+    def _matrix(self, dim: int) -> np.ndarray:
+        if dim not in self._vectors:
+            vectors = np.random.RandomState(self.seed).randn(len(STUB_MOLECULES), dim).astype(np.float32)
+            self._vectors[dim] = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return self._vectors[dim]
+
+    def query_points(self, collection_name: str, query, limit: int = 5, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        query = np.asarray(query, dtype=np.float32)
+        scores = self._matrix(query.shape[0]) @ (query / (np.linalg.norm(query) or 1.0))
+        points = []
+        for i in np.argsort(-scores)[:limit]:
+            smiles, mu, alpha, gap, cv, num_atoms = STUB_MOLECULES[i]
+            points.append(types.SimpleNamespace(id=int(i), score=float(scores[i]), payload={
+                "smiles": smiles,
+                "property": (
+                    f"properties: mu={mu:.4f}, alpha={alpha:.4f}, gap={gap:.4f}, "
+                    f"Cv={cv:.4f}, num_atoms={num_atoms}"
+                ),
+            }))
+        return types.SimpleNamespace(points=points)
+
+
+# ============================
+# TINY MODELS
+# ============================
+
+
+def _char_tokenizer(specials, template, **special_tokens):
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {token: i for i, token in enumerate(specials + SMILES_CHARS + CAPTION_CHARS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split("", "isolated")
+    tokenizer.decoder = decoders.Fuse()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single=template, special_tokens=[(token, vocab[token]) for token in specials if token in template]
+    )
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", **special_tokens)
+
+
+def tiny_components(agent, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build randomly initialized, character-level stand-ins for both models.
+
+    Outputs are meaningless but shapes, control flow and per-token costs
+    are those of the real pipeline at a fraction of the size. Most sampled
+    SMILES are invalid; set GENERATION_GRAMMAR=1 for more molecules to
+    reach the filter, predict and rank nodes.
+
+    Args:
+        agent: The imported agent module
+        seed: Seed for the weight initialization
+
+    Returns:
+        Components keyed like agent.models
+    """
+    from sklearn.preprocessing import StandardScaler
+    from transformers import RobertaConfig, RobertaModel, T5Config, T5ForConditionalGeneration
+
+    class TinyChemBERTa(agent.ChemBERTaMulti):
+        """ChemBERTaMulti with a small, randomly initialized encoder."""
+
+        def __init__(self, encoder, n_outputs=5):
+            torch.nn.Module.__init__(self)
+            self.encoder = encoder
+            hidden = encoder.config.hidden_size
+            self.head = torch.nn.Sequential(
+                torch.nn.Linear(hidden, hidden), torch.nn.ReLU(), torch.nn.Linear(hidden, n_outputs)
+            )
+
+    tokenizer_t5 = _char_tokenizer(
+        ["<pad>", "</s>", "<unk>"], "$A </s>", pad_token="<pad>", eos_token="</s>"
+    )
+    tokenizer_chemberta = _char_tokenizer(
+        ["<s>", "<pad>", "</s>", "<unk>"], "<s> $A </s>",
+        bos_token="<s>", pad_token="<pad>", eos_token="</s>",
+    )
+
+    torch.manual_seed(seed)
+    model_t5 = T5ForConditionalGeneration(T5Config(
+        vocab_size=len(tokenizer_t5), d_model=64, d_kv=16, d_ff=128, num_layers=2,
+        num_heads=4, decoder_start_token_id=0, pad_token_id=0, eos_token_id=1,
+    )).to(agent.device).eval()
+    encoder = RobertaModel(RobertaConfig(
+        vocab_size=len(tokenizer_chemberta), hidden_size=64, num_hidden_layers=2,
+        num_attention_heads=4, intermediate_size=128,
+        max_position_embeddings=agent.CHEMBERTA_MAX_LENGTH + 4, pad_token_id=1,
+    ))
+    model_chemberta = TinyChemBERTa(encoder).to(agent.device).eval()
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(QM9_MEAN)
+    scaler.scale_ = np.array(QM9_SCALE)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(QM9_MEAN)
+    scaler.n_samples_seen_ = 1
+
+    return {
+        "tokenizer_t5": tokenizer_t5,
+        "model_t5": model_t5,
+        "tokenizer_chemberta": tokenizer_chemberta,
+        "model_chemberta": model_chemberta,
+        "scaler": scaler,
+    }
+
+
+def install(agent, tiny_models: bool = True, llm_delay: float = 0.0,
+            search_delay: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Swap the agent's LLM, Qdrant client and (optionally) models for stand-ins.
+
+    Args:
+        agent: The imported agent module
+        tiny_models: Also replace both Hub models with tiny random ones
+        llm_delay: Simulated seconds per LLM call
+        search_delay: Simulated seconds per vector search
+        seed: Seed for the stand-ins' random state
+
+    Returns:
+        The installed stand-ins keyed like agent.models
+    """
+    client = StubQdrantClient(delay=search_delay, seed=seed)
+    components: Dict[str, Any] = {
+        "llm": StubLLM(delay=llm_delay),
+        "qdrant": client,
+        "search": agent.QdrantBackend(client, agent.QDRANT_COLLECTION),
+    }
+    if tiny_models:
+        components.update(tiny_components(agent, seed=seed))
+    for name, component in components.items():
+        agent.models.set(name, component)
+    return components
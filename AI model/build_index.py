@@ -0,0 +1,390 @@
+"""
+Offline embedding index builder for the QM9 caption corpus.
+Streams QM9 rows from a local file, embeds their captions with the MolT5
+encoder and writes resumable shards that the local search backend loads
+directly. Finished shards can be bulk-upserted into Qdrant.
+
+Usage:
+    python build_index.py --input qm9_caption2smiles.jsonl --out qm9_index
+    python build_index.py --input qm9.csv --out qm9_index --upsert qdrant
+"""
+
+# Standard library imports
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Third-party imports
+import numpy as np
+
+# Local imports
+import agent
+from search import PAYLOAD_SHARD_PREFIX, VECTOR_SHARD_PREFIX, read_payloads, shard_paths
+
+
+MANIFEST_FILE = "manifest.json"
+
+# Bump when the caption text or payload layout changes, so stale shards
+# are never mixed with new ones
+CAPTION_VERSION = 1
+
+
+# ============================
+# CAPTIONS
+# ============================
+
+
+def format_caption(record: Dict[str, Any]) -> str:
+    """Build a caption in the format used to fine-tune MolT5."""
+    return (
+        f"properties: mu={record['mu']:.4f}, "
+        f"alpha={record['alpha']:.4f}, "
+        f"gap={record['gap']:.4f}, "
+        f"Cv={record['Cv']:.4f}, "
+        f"num_atoms={record['num_atoms']}"
+    )
+
+
+def parse_caption(caption: str) -> Dict[str, Any]:
+    """Parse "properties: k=v, ..." back into numeric fields."""
+    values: Dict[str, Any] = {}
+    for pair in caption.replace("properties:", "").split(","):
+        if "=" not in pair:
+            continue
+        key, value = pair.split("=", 1)
+        try:
+            values[key.strip()] = float(value) if "." in value else int(value)
+        except ValueError:
+            continue
+    return values
+
+
+def _first(row: Dict[str, Any], *keys: str) -> Any:
+    for key in keys:
+        if row.get(key) not in (None, ""):
+            return row[key]
+    return None
+
+
+def _count_atoms(smiles: str) -> Optional[int]:
+    # QM9 num_atoms includes hydrogens
+    if agent.Chem is None:
+        return None
+    mol = agent.Chem.MolFromSmiles(smiles)
+    return agent.Chem.AddHs(mol).GetNumAtoms() if mol is not None else None
+
+
+def normalize_row(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Turn a raw dataset row into a record with SMILES, caption and properties.
+
+    Accepts the notebook's caption2smiles rows ({"input", "target"}) as
+    well as flat QM9 rows with mu/alpha/gap (or homo/lumo)/Cv columns.
+
+    Args:
+        row: Raw row from a JSONL or CSV file
+
+    Returns:
+        Normalized record, or None if the row is unusable
+    """
+    smiles = _first(row, "smiles", "SMILES", "target")
+    if not smiles:
+        return None
+
+    if row.get("input"):
+        caption = str(row["input"])
+        values = parse_caption(caption)
+        if any(name not in values for name in agent.PROPERTY_NAMES):
+            return None
+        return {"smiles": smiles, "caption": caption, **values}
+
+    try:
+        homo, lumo = _first(row, "homo"), _first(row, "lumo")
+        if homo is not None and lumo is not None:
+            gap = float(lumo) - float(homo)
+        else:
+            gap = float(_first(row, "gap"))
+        record = {
+            "smiles": smiles,
+            "mu": float(_first(row, "mu")),
+            "alpha": float(_first(row, "alpha")),
+            "gap": gap,
+            "Cv": float(_first(row, "Cv", "cv")),
+        }
+    except (TypeError, ValueError):
+        return None
+
+    num_atoms = _first(row, "num_atoms")
+    record["num_atoms"] = int(num_atoms) if num_atoms is not None else _count_atoms(smiles)
+    if record["num_atoms"] is None:
+        return None
+    record["caption"] = format_caption(record)
+    return record
+
+
+# ============================
+# DATASET READING
+# ============================
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream raw rows from a .jsonl/.json-lines or .csv file."""
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            yield json.loads(line) if line else {}
+
+
+# ============================
+# MANIFEST
+# ============================
+
+
+def load_manifest(out_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir: str, manifest: Dict[str, Any]):
+    # Write-then-rename so an interrupted run never leaves a torn manifest
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def new_manifest(args) -> Dict[str, Any]:
+    return {
+        "model": agent.MODEL_T5_PATH,
+        "caption_version": CAPTION_VERSION,
+        "source": os.path.abspath(args.input),
+        "source_bytes": os.path.getsize(args.input),
+        "shard_size": args.shard_size,
+        "dtype": args.dtype,
+        "dim": None,
+        "rows": 0,
+        "source_offset": 0,
+        "skipped": 0,
+        "shards": [],
+        "complete": False,
+        "upserted": {},
+    }
+
+
+def check_resumable(manifest: Dict[str, Any], fresh: Dict[str, Any]):
+    """Refuse to append to shards built from a different model or source."""
+    for key in ("model", "caption_version", "source", "source_bytes", "shard_size", "dtype"):
+        if manifest.get(key) != fresh[key]:
+            raise SystemExit(
+                f"Existing index was built with {key}={manifest.get(key)!r}, "
+                f"now {fresh[key]!r}. Use --overwrite to rebuild."
+            )
+
+
+# ============================
+# SHARD WRITING
+# ============================
+
+
+def write_shard(out_dir: str, shard_id: int, vectors: np.ndarray,
+                payloads: List[Dict[str, Any]]):
+    """
+    Write one shard atomically.
+
+    Payloads are written before vectors; the search backend only picks up
+    shards whose vector file exists, so a crash never exposes half a shard.
+    """
+    paths = shard_paths(out_dir, shard_id)
+    tmp_payloads = paths["payloads"] + ".tmp"
+    with open(tmp_payloads, "w", encoding="utf-8") as f:
+        for payload in payloads:
+            f.write(json.dumps(payload) + "\n")
+    os.replace(tmp_payloads, paths["payloads"])
+
+    tmp_vectors = paths["vectors"] + ".tmp"
+    with open(tmp_vectors, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp_vectors, paths["vectors"])
+
+
+def clear_shards(out_dir: str):
+    """Remove shards left by an earlier build so they are not mixed in."""
+    for name in os.listdir(out_dir):
+        if name.startswith((VECTOR_SHARD_PREFIX, PAYLOAD_SHARD_PREFIX)):
+            os.remove(os.path.join(out_dir, name))
+
+
+def embed_records(records: List[Dict[str, Any]], batch_size: int, dtype: str) -> np.ndarray:
+    """Embed record captions in batches with mask-aware mean pooling."""
+    chunks = []
+    for start in range(0, len(records), batch_size):
+        captions = [r["caption"] for r in records[start:start + batch_size]]
+        chunks.append(np.stack(agent.generate_embedding_batch(captions)))
+    return np.concatenate(chunks).astype(dtype)
+
+
+def build(args) -> Dict[str, Any]:
+    """Embed the dataset into shards, resuming from an existing manifest."""
+    os.makedirs(args.out, exist_ok=True)
+    fresh = new_manifest(args)
+    manifest = None if args.overwrite else load_manifest(args.out)
+    if manifest is None:
+        manifest = fresh
+        clear_shards(args.out)
+        save_manifest(args.out, manifest)
+    else:
+        check_resumable(manifest, fresh)
+        if manifest["complete"]:
+            print(f"Index already complete: {manifest['rows']} rows in {len(manifest['shards'])} shards")
+            return manifest
+        print(f"Resuming after {manifest['rows']} rows ({len(manifest['shards'])} shards)")
+
+    rows = itertools.islice(iter_rows(args.input), manifest["source_offset"], None)
+    if args.limit:
+        rows = itertools.islice(rows, max(0, args.limit - manifest["source_offset"]))
+
+    start = time.perf_counter()
+    built = 0
+    source_offset = manifest["source_offset"]
+    records: List[Dict[str, Any]] = []
+    consumed = 0
+    skipped = 0
+
+    def flush():
+        nonlocal records, consumed, skipped, built
+        shard_id = len(manifest["shards"])
+        if records:
+            vectors = embed_records(records, args.batch_size, args.dtype)
+            first_id = manifest["rows"]
+            payloads = [
+                {
+                    "id": first_id + i,
+                    "smiles": r["smiles"],
+                    "property": r["caption"],
+                    **{name: r[name] for name in agent.PROPERTY_NAMES},
+                }
+                for i, r in enumerate(records)
+            ]
+            write_shard(args.out, shard_id, vectors, payloads)
+            manifest["dim"] = int(vectors.shape[1])
+            manifest["shards"].append({"id": shard_id, "rows": len(records), "first_id": first_id})
+            manifest["rows"] += len(records)
+            built += len(records)
+            rate = built / max(time.perf_counter() - start, 1e-9)
+            print(f"Shard {shard_id}: {len(records)} rows, {manifest['rows']} total ({rate:.1f} rows/s)")
+        manifest["source_offset"] += consumed
+        manifest["skipped"] += skipped
+        save_manifest(args.out, manifest)
+        records, consumed, skipped = [], 0, 0
+
+    for row in rows:
+        consumed += 1
+        record = normalize_row(row)
+        if record is None:
+            skipped += 1
+        else:
+            records.append(record)
+        if len(records) >= args.shard_size:
+            flush()
+
+    if records or consumed:
+        flush()
+
+    # A --limit run can be extended later, so only a full pass completes
+    manifest["complete"] = not args.limit
+    save_manifest(args.out, manifest)
+    print(
+        f"Indexed {manifest['rows']} rows ({manifest['skipped']} skipped) "
+        f"from source rows {source_offset}-{manifest['source_offset']}"
+    )
+    return manifest
+
+
+# ============================
+# UPSERT
+# ============================
+
+
+def upsert_qdrant(args, manifest: Dict[str, Any]):
+    """
+    Bulk-upsert finished shards into the Qdrant collection.
+
+    Point ids are the global row numbers, so re-running replaces points
+    instead of duplicating them. Shards already upserted are skipped.
+    """
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+
+    client = agent.models.qdrant
+    collection = args.collection
+    if args.recreate or not client.collection_exists(collection):
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=VectorParams(size=manifest["dim"], distance=Distance.COSINE),
+        )
+        manifest["upserted"][collection] = []
+
+    done = set(manifest["upserted"].get(collection, []))
+    for shard in manifest["shards"]:
+        if shard["id"] in done:
+            continue
+        paths = shard_paths(args.out, shard["id"])
+        vectors = np.load(paths["vectors"], mmap_mode="r")
+        payloads = read_payloads(paths["payloads"])
+
+        for start in range(0, len(payloads), args.upsert_batch):
+            block = np.asarray(vectors[start:start + args.upsert_batch], dtype=np.float32)
+            points = [
+                PointStruct(id=p["id"], vector=v.tolist(), payload=p)
+                for p, v in zip(payloads[start:start + args.upsert_batch], block)
+            ]
+            client.upsert(collection_name=collection, points=points, wait=True)
+
+        done.add(shard["id"])
+        manifest["upserted"][collection] = sorted(done)
+        save_manifest(args.out, manifest)
+        print(f"Upserted shard {shard['id']} ({shard['rows']} points) into {collection}")
+
+
+# ============================
+# CLI
+# ============================
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", required=True, help="QM9 rows as .jsonl or .csv")
+    parser.add_argument("--out", default=agent.LOCAL_INDEX_DIR, help="Shard output directory")
+    parser.add_argument("--batch-size", type=int, default=256, help="Captions per encoder pass")
+    parser.add_argument("--shard-size", type=int, default=16384, help="Rows per shard")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--limit", type=int, default=0, help="Only read the first N source rows")
+    parser.add_argument("--overwrite", action="store_true", help="Ignore existing shards and rebuild")
+    parser.add_argument("--upsert", choices=["none", "qdrant"], default="none",
+                        help="Also push the shards into Qdrant")
+    parser.add_argument("--collection", default=agent.QDRANT_COLLECTION)
+    parser.add_argument("--recreate", action="store_true", help="Drop the Qdrant collection first")
+    parser.add_argument("--upsert-batch", type=int, default=1024)
+    args = parser.parse_args()
+
+    manifest = build(args)
+    if args.upsert == "qdrant":
+        upsert_qdrant(args, manifest)
+
+
+if __name__ == "__main__":
+    main()
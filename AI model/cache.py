@@ -0,0 +1,254 @@
+"""
+Caching helpers for the molecule discovery pipeline.
+Bounded in-memory LRU caches with an optional SQLite tier and optional
+time-to-live.
+"""
+
+# Standard library imports
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with hit/miss counters.
+
+    With `ttl_seconds` > 0, entries older than that are treated as misses
+    and dropped on lookup.
+    """
+
+    def __init__(self, maxsize: int = 1024, name: str = "cache", ttl_seconds: float = 0.0):
+        self.maxsize = max(0, int(maxsize))
+        self.name = name
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        # key -> (expiry timestamp or None, value)
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` on a miss."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] is not None and entry[0] <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None):
+        """
+        Store `value` under `key`, evicting the least recently used entry.
+
+        `expires_at` overrides the expiry computed from `ttl_seconds`.
+        """
+        if self.maxsize == 0:
+            return
+        if expires_at is None and self.ttl_seconds > 0:
+            expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and (entry[0] is None or entry[0] > time.time())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class SQLiteStore:
+    """
+    Persistent key/value store backed by a single SQLite table.
+
+    Values are stored as JSON next to their write time. Keys are namespaced
+    so entries written by a different model version are never returned.
+    """
+
+    def __init__(self, path: str, table: str = "cache", namespace: str = ""):
+        self.path = path
+        self.table = table
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get_entries(self, keys: Iterable[str]) -> Dict[str, Tuple[Any, float]]:
+        """Return (value, write time) for whichever of `keys` exist."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        lookup = {self._key(k): k for k in keys}
+        found: Dict[str, Tuple[Any, float]] = {}
+        with self._lock:
+            ns_keys = list(lookup)
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(ns_keys), 500):
+                chunk = ns_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, stored_at FROM {self.table} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for ns_key, value, stored_at in rows:
+                    found[lookup[ns_key]] = (json.loads(value), stored_at)
+        return found
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the stored values for whichever of `keys` exist."""
+        return {key: value for key, (value, _) in self.get_entries(keys).items()}
+
+    def set_many(self, items: Dict[str, Any]):
+        """Insert or replace several entries in one transaction."""
+        if not items:
+            return
+        now = time.time()
+        rows = [(self._key(k), json.dumps(v), now) for k, v in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def delete_many(self, keys: Iterable[str]):
+        rows = [(self._key(k),) for k in keys]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", rows)
+            self._conn.commit()
+
+    def delete_older_than(self, cutoff: float) -> int:
+        """Delete this namespace's entries written at or before `cutoff`; return how many."""
+        prefix = self._key("")
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE stored_at <= ? AND substr(key, 1, ?) = ?",
+                (cutoff, len(prefix), prefix),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional SQLite store.
+
+    Memory hits are served directly; disk hits are promoted to memory. With
+    `ttl_seconds` > 0 disk entries expire on the same schedule as memory
+    entries: expired rows are deleted at startup and when a lookup finds them.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None,
+                 table: str = "cache", namespace: str = "", name: str = "cache",
+                 ttl_seconds: float = 0.0):
+        self.name = name
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.memory = LRUCache(maxsize, name=name, ttl_seconds=self.ttl_seconds)
+        self.disk = SQLiteStore(path, table=table, namespace=namespace) if path else None
+        self.disk_hits = 0
+        if self.disk is not None and self.ttl_seconds > 0:
+            self.disk.delete_older_than(time.time() - self.ttl_seconds)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return cached values for whichever of `keys` are present."""
+        found: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            value = self.memory.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if self.disk is not None and missing:
+            now = time.time()
+            expired = []
+            for key, (value, stored_at) in self.disk.get_entries(missing).items():
+                expires_at = None
+                if self.ttl_seconds > 0:
+                    expires_at = stored_at + self.ttl_seconds
+                    if expires_at <= now:
+                        expired.append(key)
+                        continue
+                self.memory.set(key, value, expires_at=expires_at)
+                found[key] = value
+                self.disk_hits += 1
+            self.disk.delete_many(expired)
+        return found
+
+    def set_many(self, items: Dict[str, Any]):
+        """Write entries to memory and, if configured, to disk."""
+        for key, value in items.items():
+            self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set_many(items)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` on a miss."""
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key: str, value: Any):
+        """Store one entry in memory and, if configured, on disk."""
+        self.set_many({key: value})
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory counters plus disk-tier hits."""
+        stats = self.memory.stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats["disk_enabled"] = self.disk is not None
+        stats["memory_hits"] = stats["hits"]
+        stats["disk_hits"] = self.disk_hits
+        stats["hits"] = stats["memory_hits"] + self.disk_hits
+        stats["misses"] = lookups - stats["hits"]
+        stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+        return stats
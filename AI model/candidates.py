@@ -0,0 +1,295 @@
+"""
+Columnar candidate table for the molecule discovery pipeline.
+Keeps canonical SMILES, predicted properties, evaluation status, ranking
+scores and provenance in aligned numpy columns, so nodes work on whole
+columns instead of re-zipping parallel lists of dicts.
+"""
+
+# Standard library imports
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Third-party imports
+import numpy as np
+
+
+# RDKit descriptors filled in by the validation stage
+DESCRIPTOR_NAMES = ("heavy_atoms", "total_atoms", "mol_weight")
+
+# Evaluation status per row
+STATUS_PENDING = 0  # Not evaluated (yet)
+STATUS_PASSED = 1
+STATUS_FAILED = 2
+STATUS_ERROR = 3    # Property prediction failed
+STATUS_LABELS = ("pending", "passed", "failed", "error")
+
+# Where a row came from
+SOURCE_GENERATED = 0
+SOURCE_SEARCHED = 1
+SOURCE_LABELS = ("generated", "searched")
+
+# Per-row columns, in the order take() and concat() handle them
+COLUMNS = (
+    "smiles", "properties", "descriptors", "status", "score", "distance",
+    "source", "iteration", "note", "explanation",
+)
+
+
+def _float_or_none(value) -> Optional[float]:
+    """A float32 value as the shortest Python float that round-trips; NaN becomes None."""
+    return None if np.isnan(value) else float(str(value))
+
+
+def _object_array(values: Iterable[Any], n: int) -> np.ndarray:
+    array = np.empty(n, dtype=object)
+    array[:] = list(values)
+    return array
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+@dataclass(frozen=True, eq=False)
+class CandidateTable:
+    """
+    Candidate molecules as aligned columns, one row per molecule.
+
+    Tables are immutable: every method returns a new table, sharing the
+    columns it does not change, so passing one between nodes copies nothing.
+
+    Attributes:
+        property_names: Names of the property matrix columns
+        smiles: Canonical SMILES (object array)
+        properties: (n, len(property_names)) float32 predictions, NaN = missing
+        descriptors: (n, len(DESCRIPTOR_NAMES)) float32, NaN = unknown
+        status: int8 STATUS_* codes
+        score: float32 ranking score in [0, 1], NaN = not ranked
+        distance: float32 weighted distance to the constraints, NaN = not ranked
+        source: int8 SOURCE_* codes
+        iteration: int16 generation round that produced the row (0 for search hits)
+        note: Evaluation verdict or prediction error per row (object array)
+        explanation: LLM explanation per row, None = not explained (object array)
+    """
+    property_names: tuple
+    smiles: np.ndarray
+    properties: np.ndarray
+    descriptors: np.ndarray
+    status: np.ndarray
+    score: np.ndarray
+    distance: np.ndarray
+    source: np.ndarray
+    iteration: np.ndarray
+    note: np.ndarray
+    explanation: np.ndarray
+
+    # ----------------------------
+    # Construction
+    # ----------------------------
+
+    @classmethod
+    def from_smiles(cls, smiles: Sequence[str], property_names: Sequence[str],
+                    source: int = SOURCE_GENERATED, iteration: int = 0) -> "CandidateTable":
+        """
+        Build a table of unpredicted, unevaluated rows.
+
+        Args:
+            smiles: SMILES strings, one per row
+            property_names: Names of the property columns
+            source: SOURCE_* code for every row
+            iteration: Generation round for every row
+
+        Returns:
+            CandidateTable
+        """
+        n = len(smiles)
+        return cls(
+            property_names=tuple(property_names),
+            smiles=_object_array(smiles, n),
+            properties=np.full((n, len(property_names)), np.nan, dtype=np.float32),
+            descriptors=np.full((n, len(DESCRIPTOR_NAMES)), np.nan, dtype=np.float32),
+            status=np.full(n, STATUS_PENDING, dtype=np.int8),
+            score=np.full(n, np.nan, dtype=np.float32),
+            distance=np.full(n, np.nan, dtype=np.float32),
+            source=np.full(n, source, dtype=np.int8),
+            iteration=np.full(n, iteration, dtype=np.int16),
+            note=_object_array([""] * n, n),
+            explanation=_object_array([None] * n, n),
+        )
+
+    @classmethod
+    def empty(cls, property_names: Sequence[str]) -> "CandidateTable":
+        return cls.from_smiles([], property_names)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]], property_names: Sequence[str],
+                     source: int = SOURCE_GENERATED, iteration: int = 0) -> "CandidateTable":
+        """
+        Build a table from dicts with a "smiles" key.
+
+        Descriptor and property keys present in a record fill their columns;
+        missing ones stay NaN.
+
+        Args:
+            records: Candidate dicts (or bare SMILES strings)
+            property_names: Names of the property columns
+            source: SOURCE_* code for every row
+            iteration: Generation round for every row
+
+        Returns:
+            CandidateTable
+        """
+        records = [r if isinstance(r, dict) else {"smiles": r} for r in records]
+        table = cls.from_smiles([r.get("smiles") for r in records], property_names, source, iteration)
+        if not records:
+            return table
+        descriptors = np.array([
+            [_as_float(r.get(name)) for name in DESCRIPTOR_NAMES] for r in records
+        ], dtype=np.float32)
+        properties = np.array([
+            [_as_float(r.get(name)) for name in table.property_names] for r in records
+        ], dtype=np.float32)
+        return replace(table, descriptors=descriptors, properties=properties)
+
+    @classmethod
+    def concat(cls, tables: Sequence["CandidateTable"]) -> "CandidateTable":
+        """Stack tables row-wise; property columns follow the first table."""
+        names = tables[0].property_names
+        columns = {
+            column: np.concatenate([getattr(t, column) for t in tables])
+            for column in COLUMNS if column != "properties"
+        }
+        columns["properties"] = np.concatenate([
+            t.properties if t.property_names == names else t.property_matrix(names).astype(np.float32)
+            for t in tables
+        ])
+        return cls(property_names=names, **columns)
+
+    # ----------------------------
+    # Column operations
+    # ----------------------------
+
+    def __len__(self) -> int:
+        return len(self.smiles)
+
+    def take(self, index) -> "CandidateTable":
+        """Rows selected by an index array or boolean mask, in that order."""
+        return replace(self, **{column: getattr(self, column)[index] for column in COLUMNS})
+
+    def contains(self, smiles: Iterable[str]) -> np.ndarray:
+        """Boolean mask of the rows whose SMILES are in `smiles`."""
+        seen = set(smiles)
+        return np.fromiter((s in seen for s in self.smiles), dtype=bool, count=len(self))
+
+    def property_matrix(self, names: Sequence[str]) -> np.ndarray:
+        """(n, len(names)) float64 view of the named properties; unknown names are NaN."""
+        matrix = np.full((len(self), len(names)), np.nan, dtype=np.float64)
+        for j, name in enumerate(names):
+            if name in self.property_names:
+                matrix[:, j] = self.properties[:, self.property_names.index(name)]
+        return matrix
+
+    def with_predictions(self, predictions: Sequence[Dict[str, Any]]) -> "CandidateTable":
+        """
+        Fill the property matrix from one prediction dict per row.
+
+        Dicts with an "error" key mark their row STATUS_ERROR and keep the
+        message as the row's note.
+        """
+        properties = np.array([
+            [_as_float(pred.get(name)) for name in self.property_names] for pred in predictions
+        ], dtype=np.float32).reshape(len(self), len(self.property_names))
+        errors = [isinstance(pred, dict) and "error" in pred for pred in predictions]
+        is_error = np.array(errors, dtype=bool).reshape(len(self))
+        note = _object_array(
+            (str(pred["error"]) if error else "" for pred, error in zip(predictions, errors)), len(self)
+        )
+        status = np.where(is_error, STATUS_ERROR, STATUS_PENDING).astype(np.int8)
+        return replace(self, properties=properties, status=status, note=note)
+
+    def with_evaluation(self, passed: Sequence[bool], notes: Sequence[str]) -> "CandidateTable":
+        """Mark rows passed or failed; rows whose prediction failed stay STATUS_ERROR."""
+        passed = np.asarray(passed, dtype=bool).reshape(len(self))
+        is_error = self.status == STATUS_ERROR
+        status = np.where(is_error, STATUS_ERROR, np.where(passed, STATUS_PASSED, STATUS_FAILED))
+        note = np.where(is_error, self.note, _object_array(notes, len(self)))
+        return replace(self, status=status.astype(np.int8), note=note)
+
+    def with_scores(self, distances: np.ndarray) -> "CandidateTable":
+        """Store distances and their scores, 1 / (1 + distance) (0 for inf)."""
+        distance = np.asarray(distances, dtype=np.float32).reshape(len(self))
+        with np.errstate(over="ignore"):
+            score = np.where(np.isfinite(distance), 1.0 / (1.0 + distance), 0.0).astype(np.float32)
+        return replace(self, distance=distance, score=score)
+
+    def with_explanations(self, explanations: Sequence[str]) -> "CandidateTable":
+        return replace(self, explanation=_object_array(explanations, len(self)))
+
+    def count(self, status: int) -> int:
+        return int(np.count_nonzero(self.status == status))
+
+    # ----------------------------
+    # Serialization
+    # ----------------------------
+
+    def property_records(self) -> List[Dict[str, Any]]:
+        """
+        One prediction dict per row, as the API returns them.
+
+        Failed predictions become {"error": message}; missing properties
+        are left out.
+        """
+        records = []
+        for row, status, note in zip(self.properties, self.status, self.note):
+            if status == STATUS_ERROR:
+                records.append({"error": note})
+                continue
+            values = (_float_or_none(value) for value in row)
+            records.append({
+                name: value for name, value in zip(self.property_names, values) if value is not None
+            })
+        return records
+
+    def to_records(self, properties: bool = False) -> List[Dict[str, Any]]:
+        """
+        One JSON-ready dict per row.
+
+        Args:
+            properties: Also include each row's "properties" dict and "note"
+
+        Returns:
+            List of dicts with smiles, source, status, the generation round
+            of generated rows, known descriptors, and score/distance once
+            ranked
+        """
+        records = []
+        prediction_records = self.property_records() if properties else None
+        for i in range(len(self)):
+            record: Dict[str, Any] = {
+                "smiles": self.smiles[i],
+                "source": SOURCE_LABELS[self.source[i]],
+                "status": STATUS_LABELS[self.status[i]],
+            }
+            if self.source[i] == SOURCE_GENERATED:
+                record["iteration"] = int(self.iteration[i])
+            for name, value in zip(DESCRIPTOR_NAMES, self.descriptors[i]):
+                if not np.isnan(value):
+                    record[name] = float(str(value)) if name == "mol_weight" else int(value)
+            if not np.isnan(self.distance[i]):
+                distance = float(self.distance[i])
+                record["score"] = round(float(self.score[i]), 4)
+                record["distance"] = round(distance, 4) if np.isfinite(distance) else None
+            if properties:
+                record["properties"] = prediction_records[i]
+                record["note"] = self.note[i]
+            records.append(record)
+        return records
+
+    def explanation_list(self) -> List[str]:
+        """Explanations in row order, or [] if no row has been explained."""
+        if all(text is None for text in self.explanation):
+            return []
+        return [text if text is not None else "" for text in self.explanation]
@@ -0,0 +1,207 @@
+"""
+Inference backends for the ChemBERTa regressor and the MolT5 model.
+Eager fp32 PyTorch, dynamic INT8 quantization, or ONNX Runtime.
+"""
+
+# Standard library imports
+import os
+import re
+from typing import Any, Dict, Optional
+
+# Third-party imports
+import numpy as np
+import torch
+
+
+INFERENCE_BACKENDS = ("torch", "int8", "onnx")
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")
+
+
+def check_backend(backend: str) -> str:
+    """Validate a backend name."""
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+    return backend
+
+
+# ============================
+# INT8
+# ============================
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Dynamically quantize every Linear layer to INT8.
+
+    Weights are quantized once; activations are quantized on the fly, so no
+    calibration data is needed. CPU only.
+    """
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    quantized.eval()
+    return quantized
+
+
+# ============================
+# ONNX RUNTIME
+# ============================
+
+
+def _session_options(num_threads: int = 0):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    return options
+
+
+class OnnxRegressor:
+    """
+    ONNX Runtime session with the ChemBERTaMulti call signature.
+
+    Takes and returns torch tensors so `predict_properties_batch` works
+    unchanged.
+    """
+
+    def __init__(self, path: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        self.path = path
+        self.session = ort.InferenceSession(
+            path, sess_options=_session_options(num_threads), providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        outputs = self.session.run(
+            ["predictions"],
+            {
+                "input_ids": input_ids.cpu().numpy().astype(np.int64),
+                "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+            },
+        )
+        return torch.from_numpy(outputs[0])
+
+    def eval(self):
+        return self
+
+
+def export_regressor_onnx(model: torch.nn.Module, path: str, opset: int = 17):
+    """Export the ChemBERTa regressor with dynamic batch and sequence axes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    dummy_ids = torch.ones(2, 16, dtype=torch.long)
+    dummy_mask = torch.ones(2, 16, dtype=torch.long)
+    tmp = path + ".tmp"
+    with torch.inference_mode():
+        torch.onnx.export(
+            model.cpu().eval(),
+            (dummy_ids, dummy_mask),
+            tmp,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["predictions"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "predictions": {0: "batch"},
+            },
+            opset_version=opset,
+            dynamo=False,
+        )
+    os.replace(tmp, path)
+
+
+def load_regressor_onnx(model: torch.nn.Module, name: str, cache_dir: str,
+                        num_threads: int = 0) -> OnnxRegressor:
+    """Export `model` once into `cache_dir` and open it with ONNX Runtime."""
+    path = os.path.join(cache_dir, f"{_slug(name)}.onnx")
+    if not os.path.exists(path):
+        print(f"Exporting ChemBERTa to ONNX: {path}")
+        export_regressor_onnx(model, path)
+    return OnnxRegressor(path, num_threads=num_threads)
+
+
+def load_seq2seq_onnx(model_path: str, cache_dir: str):
+    """
+    Export MolT5 (encoder, decoder and decoder-with-past) to ONNX once and
+    load it with ONNX Runtime.
+
+    The returned model keeps the `generate()` and `.encoder` interface used
+    by the pipeline. Requires ``optimum[onnxruntime]``.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("The onnx backend for MolT5 requires optimum[onnxruntime]") from e
+
+    export_dir = os.path.join(cache_dir, _slug(model_path))
+    if os.path.exists(os.path.join(export_dir, "config.json")):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+
+    print(f"Exporting MolT5 to ONNX: {export_dir}")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+# ============================
+# BACKEND SELECTION
+# ============================
+
+
+def apply_regressor_backend(model: torch.nn.Module, backend: str, name: str,
+                            cache_dir: str, num_threads: int = 0) -> Any:
+    """
+    Return the ChemBERTa regressor for the configured backend.
+
+    Args:
+        model: Loaded fp32 ChemBERTaMulti on CPU
+        backend: "torch", "int8" or "onnx"
+        name: Model identifier, used to name the ONNX export
+        cache_dir: Directory for exported ONNX files
+        num_threads: ONNX Runtime intra-op threads (0 = library default)
+
+    Returns:
+        A callable taking (input_ids, attention_mask) and returning a tensor
+    """
+    backend = check_backend(backend)
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend == "onnx":
+        return load_regressor_onnx(model, name, cache_dir, num_threads=num_threads)
+    return model
+
+
+def apply_seq2seq_backend(model: Optional[torch.nn.Module], backend: str, model_path: str,
+                          cache_dir: str) -> Any:
+    """
+    Return the MolT5 model for the configured backend.
+
+    Args:
+        model: Loaded fp32 T5ForConditionalGeneration (unused for "onnx")
+        backend: "torch", "int8" or "onnx"
+        model_path: Hub id or local path of the model
+        cache_dir: Directory for exported ONNX files
+
+    Returns:
+        A model exposing `generate()` and `.encoder`
+    """
+    backend = check_backend(backend)
+    if backend == "int8":
+        return quantize_int8(model)
+    if backend == "onnx":
+        return load_seq2seq_onnx(model_path, cache_dir)
+    return model
+
+
+def backend_info(backends: Dict[str, str]) -> Dict[str, Any]:
+    """Describe the active backends for /health."""
+    return {
+        "backends": dict(backends),
+        "torch_threads": torch.get_num_threads(),
+        "quantized_engine": torch.backends.quantized.engine,
+    }
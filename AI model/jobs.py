@@ -0,0 +1,144 @@
+"""
+Background job runner for long pipeline requests.
+Jobs run on a bounded thread pool and expire after a TTL.
+"""
+
+# Standard library imports
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+class JobManager:
+    """
+    Run callables in the background and keep their status for polling.
+
+    The callable receives a `progress(node_name, update)` callback as its
+    only argument and returns the job result. Finished jobs are dropped
+    `ttl_seconds` after they complete.
+    """
+
+    def __init__(self, max_workers: int = 2, ttl_seconds: float = 3600.0,
+                 max_pending: int = 100):
+        self.max_workers = max(1, int(max_workers))
+        self.ttl_seconds = float(ttl_seconds)
+        self.max_pending = max(1, int(max_pending))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="job"
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[[Callable[[str, Dict[str, Any]], None]], Any],
+               request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            fn: Callable taking a progress callback and returning the result
+            request: Original request payload, echoed back in the status
+
+        Returns:
+            Snapshot of the new job record
+
+        Raises:
+            JobQueueFull: If `max_pending` jobs are already queued or running
+        """
+        with self._lock:
+            self._purge_expired()
+            active = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if active >= self.max_pending:
+                raise JobQueueFull(f"{active} jobs already pending")
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "request": request,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "current_node": None,
+                "progress": [],
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job_id] = job
+            snapshot = self._snapshot(job)
+
+        self._executor.submit(self._run, job_id, fn)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of a job, or None if unknown or expired."""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "ttl_seconds": self.ttl_seconds,
+                "jobs": counts,
+            }
+
+    def _run(self, job_id: str, fn):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+        def progress(node: str, update: Dict[str, Any]):
+            entry = {
+                "node": node,
+                "elapsed": round(time.time() - job["started_at"], 3),
+                "log": list(update.get("log", [])) if isinstance(update, dict) else [],
+            }
+            with self._lock:
+                job["current_node"] = node
+                job["progress"].append(entry)
+
+        try:
+            result = fn(progress)
+            status, error = "succeeded", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+
+        with self._lock:
+            job.update(
+                status=status,
+                result=result,
+                error=error,
+                current_node=None,
+                finished_at=time.time(),
+            )
+
+    def _purge_expired(self):
+        now = time.time()
+        expired: List[str] = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+        snapshot = dict(job)
+        snapshot["progress"] = list(job["progress"])
+        return snapshot
@@ -0,0 +1,73 @@
+"""
+Prometheus metrics for the molecule discovery pipeline.
+Counters and histograms come from prometheus_client; CallbackCollector
+exports state that already lives elsewhere (such as cache counters) at
+scrape time. Everything is rendered in the text format for /metrics.
+"""
+
+# Standard library imports
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+# Third-party imports
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+
+# Seconds; covers sub-millisecond nodes up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Content type expected by Prometheus scrapers for Registry.render()
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class CallbackCollector(Collector):
+    """
+    Value(s) read from a callback at scrape time.
+
+    The callback returns {label values tuple: value}.
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple[str, ...], float]],
+                 labels: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = list(labels)
+        self.family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+
+    def collect(self):
+        family = self.family(self.name, self.documentation, labels=self.labels)
+        for key, value in sorted(self.callback().items()):
+            family.add_metric(list(key), value)
+        yield family
+
+
+class Registry:
+    """
+    The pipeline's metrics, rendered together.
+
+    Wraps its own CollectorRegistry rather than the process-global one, so
+    importing the pipeline twice (e.g. under a reloader) does not clash.
+    """
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return Counter(name, documentation, list(labels), registry=self.registry)
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Optional[Iterable[float]] = None) -> Histogram:
+        return Histogram(name, documentation, list(labels), registry=self.registry,
+                         buckets=tuple(buckets or DEFAULT_BUCKETS))
+
+    def gauge_callback(self, name: str, documentation: str, callback, labels: Sequence[str] = (),
+                       kind: str = "gauge") -> CallbackCollector:
+        collector = CallbackCollector(name, documentation, callback, labels, kind)
+        self.registry.register(collector)
+        return collector
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text format."""
+        return generate_latest(self.registry).decode("utf-8")
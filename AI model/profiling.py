@@ -0,0 +1,275 @@
+"""
+On-demand request profiling for the molecule discovery pipeline.
+Runs one call under cProfile and the PyTorch profiler and writes a Chrome
+trace, collapsed stacks for flamegraphs, cProfile stats and a JSON summary.
+"""
+
+# Standard library imports
+import contextlib
+import contextvars
+import cProfile
+import json
+import os
+import pstats
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Files written per profile: kind -> file name
+PROFILE_FILES = {
+    "trace": "trace.json",      # Chrome / Perfetto trace from the PyTorch profiler
+    "stacks": "stacks.txt",     # Collapsed stacks (flamegraph.pl, speedscope)
+    "pstats": "profile.pstats", # cProfile stats (snakeviz, flameprof, gprof2dot)
+    "summary": "summary.json",
+}
+
+# record_scope labels whose operators are broken down in the summary
+FORWARD_SCOPES = ("t5_generate", "t5_encoder", "chemberta_forward")
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+# Session whose torch profiler is running (process-wide), and the session
+# owning the current request (follows the request into node threads)
+_active: Optional["ProfileSession"] = None
+_session_var: "contextvars.ContextVar[Optional[ProfileSession]]" = contextvars.ContextVar(
+    "profile_session", default=None
+)
+# The torch profiler is process-wide, so profiles run one at a time
+_profile_lock = threading.Lock()
+
+
+def record_scope(name: str):
+    """Label a region in the torch profiler trace; a no-op unless a profile is running."""
+    if _active is None:
+        return _NULL_SCOPE
+    import torch
+    return torch.profiler.record_function(name)
+
+
+def thread_scope():
+    """
+    Run the caller under cProfile if it belongs to the profiled request.
+
+    cProfile only sees the thread that enabled it, so pipeline nodes that
+    run on worker threads are profiled separately and merged afterwards.
+    """
+    session = _session_var.get()
+    if session is None or threading.get_ident() == session.thread_id:
+        return _NULL_SCOPE
+    return session.profile_thread()
+
+
+def _experimental_config(torch):
+    """
+    Profiler options that export_stacks and worker-thread coverage need.
+
+    They are only reachable through torch's experimental config, whose
+    constructor changes between releases, so every step is feature-checked.
+
+    Returns:
+        (config or None, whether all threads are profiled)
+    """
+    import inspect
+
+    from torch.profiler import profile
+
+    config_cls = getattr(torch.profiler, "_ExperimentalConfig", None)
+    if config_cls is None or "experimental_config" not in inspect.signature(profile).parameters:
+        return None, False
+    # verbose keeps the Python stacks export_stacks needs; micro-batched
+    # forwards run on scheduler threads, hence profile_all_threads
+    for kwargs, all_threads in (({"verbose": True, "profile_all_threads": True}, True),
+                                ({"verbose": True}, False)):
+        try:
+            return config_cls(**kwargs), all_threads
+        except (TypeError, RuntimeError):
+            continue
+    return None, False
+
+
+def _torch_profiler():
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    config, all_threads = _experimental_config(torch)
+    kwargs = {"experimental_config": config} if config is not None else {}
+    prof = profile(activities=activities, record_shapes=True, with_stack=True, **kwargs)
+    return prof, all_threads
+
+
+class ProfileSession:
+    """
+    Profile one call and write its artifacts to ``out_dir/<profile_id>/``.
+
+    Args:
+        out_dir: Directory holding one subdirectory per profile
+        keep: Most recent profiles to keep on disk (0 = keep all)
+        use_torch: Also run the PyTorch profiler
+        top: Entries per table in the summary
+    """
+
+    def __init__(self, out_dir: str, keep: int = 20, use_torch: bool = True, top: int = 25):
+        self.out_dir = out_dir
+        self.keep = keep
+        self.use_torch = use_torch
+        self.top = top
+        self.profile_id = uuid.uuid4().hex
+        self.dir = os.path.join(out_dir, self.profile_id)
+        self.thread_id: Optional[int] = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def profile_thread(self):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler already covers this thread
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._thread_profiles.append(profiler)
+
+    def run(self, fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Call ``fn(*args, **kwargs)`` under the profilers.
+
+        Returns:
+            (fn's return value, summary dict)
+        """
+        global _active
+        with _profile_lock:
+            os.makedirs(self.dir, exist_ok=True)
+            self.thread_id = threading.get_ident()
+            main = cProfile.Profile()
+            torch_prof, all_threads = _torch_profiler() if self.use_torch else (None, False)
+
+            token = _session_var.set(self)
+            start = time.perf_counter()
+            try:
+                with torch_prof if torch_prof is not None else _NULL_SCOPE:
+                    _active = self
+                    main.enable()
+                    try:
+                        result = fn(*args, **kwargs)
+                    finally:
+                        main.disable()
+                        _active = None
+            finally:
+                _session_var.reset(token)
+            wall_ms = (time.perf_counter() - start) * 1000.0
+
+            summary = self._write(main, torch_prof, wall_ms, all_threads)
+        self._prune()
+        return result, summary
+
+    def _path(self, kind: str) -> str:
+        return os.path.join(self.dir, PROFILE_FILES[kind])
+
+    def _write(self, main: cProfile.Profile, torch_prof, wall_ms: float, all_threads: bool) -> Dict[str, Any]:
+        stats = pstats.Stats(main)
+        for profiler in self._thread_profiles:
+            stats.add(profiler)
+        stats.dump_stats(self._path("pstats"))
+
+        files = ["pstats"]
+        forward_ops: Dict[str, Any] = {}
+        if torch_prof is not None:
+            torch_prof.export_chrome_trace(self._path("trace"))
+            torch_prof.export_stacks(self._path("stacks"), "self_cpu_time_total")
+            forward_ops = self._forward_ops(torch_prof)
+            files += ["trace", "stacks"]
+
+        summary = {
+            "id": self.profile_id,
+            "wall_ms": round(wall_ms, 3),
+            "created_at": time.time(),
+            "files": {kind: PROFILE_FILES[kind] for kind in files + ["summary"]},
+            "torch_all_threads": all_threads,
+            "profiled_threads": 1 + len(self._thread_profiles),
+            "top_functions": self._top_functions(stats),
+            "forward_ops": forward_ops,
+        }
+        with open(self._path("summary"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        rows = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000.0, 3),
+                "cumtime_ms": round(cumtime * 1000.0, 3),
+            })
+        rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+        return rows[:self.top]
+
+    def _forward_ops(self, torch_prof) -> Dict[str, Any]:
+        """Per-operator self CPU time inside each FORWARD_SCOPES region."""
+        scopes: Dict[str, Dict[str, Any]] = {}
+        for event in torch_prof.events():
+            if event.name in FORWARD_SCOPES:
+                entry = scopes.setdefault(event.name, {"calls": 0, "cpu_ms": 0.0, "ops": {}})
+                entry["calls"] += 1
+                entry["cpu_ms"] += event.cpu_time_total / 1000.0
+                continue
+            parent = event.cpu_parent
+            while parent is not None and parent.name not in FORWARD_SCOPES:
+                parent = parent.cpu_parent
+            if parent is None:
+                continue
+            entry = scopes.setdefault(parent.name, {"calls": 0, "cpu_ms": 0.0, "ops": {}})
+            op = entry["ops"].setdefault(event.name, {"calls": 0, "self_cpu_ms": 0.0})
+            op["calls"] += 1
+            op["self_cpu_ms"] += event.self_cpu_time_total / 1000.0
+
+        for entry in scopes.values():
+            entry["cpu_ms"] = round(entry["cpu_ms"], 3)
+            ops = sorted(entry["ops"].items(), key=lambda item: item[1]["self_cpu_ms"], reverse=True)
+            entry["ops"] = [
+                {"op": name, "calls": op["calls"], "self_cpu_ms": round(op["self_cpu_ms"], 3)}
+                for name, op in ops[:self.top]
+            ]
+        return scopes
+
+    def _prune(self):
+        if self.keep <= 0:
+            return
+        profiles = [
+            os.path.join(self.out_dir, name) for name in os.listdir(self.out_dir)
+            if PROFILE_ID_PATTERN.match(name)
+        ]
+        profiles.sort(key=os.path.getmtime, reverse=True)
+        for path in profiles[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def profile_file(out_dir: str, profile_id: str, kind: str) -> Optional[str]:
+    """
+    Return the path of a profile artifact, or None if unknown.
+
+    Args:
+        out_dir: Profile directory
+        profile_id: Profile id from the summary
+        kind: One of PROFILE_FILES
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id or "") or kind not in PROFILE_FILES:
+        return None
+    path = os.path.join(out_dir, profile_id, PROFILE_FILES[kind])
+    return path if os.path.exists(path) else None
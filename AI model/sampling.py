@@ -0,0 +1,86 @@
+"""
+Per-row reproducible sampling for MolT5 generation.
+Turns greedy decoding into top-k/top-p sampling with Gumbel noise drawn
+from one torch.Generator per sequence, so a sequence's sample depends on
+its own seed only: not on the process-wide RNG, the other captions in a
+padded batch, or concurrent generate calls.
+"""
+
+# Standard library imports
+import random
+from typing import List, Optional, Sequence
+
+# Third-party imports
+import torch
+from transformers import (
+    LogitsProcessor, LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper,
+)
+
+
+def row_seeds(seeds: Sequence[Optional[int]], num_samples: int) -> List[int]:
+    """
+    One seed per generated sequence, in generate's output order.
+
+    Args:
+        seeds: Seed per caption, None = draw a fresh one
+        num_samples: Sequences per caption (num_return_sequences)
+
+    Returns:
+        len(seeds) * num_samples seeds
+    """
+    rows = []
+    for seed in seeds:
+        base = random.getrandbits(63) if seed is None else int(seed)
+        # A distinct stream per sample, so sample j of a caption never
+        # depends on how many samples were drawn alongside it
+        rows.extend((base * 1_000_003 + j) % 2**63 for j in range(num_samples))
+    return rows
+
+
+class GumbelSampler(LogitsProcessor):
+    """
+    Add Gumbel noise from one generator per row to the (warped) scores.
+
+    The argmax of log-probabilities plus Gumbel(0, 1) noise is a sample
+    from the softmax, so greedy decoding over these scores samples each
+    row with its own generator. Every row draws once per step, so a row's
+    noise at step t does not depend on when the other rows finish.
+    """
+
+    def __init__(self, seeds: Sequence[int]):
+        self.generators = [torch.Generator().manual_seed(int(seed)) for seed in seeds]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if scores.shape[0] != len(self.generators):
+            raise ValueError(f"Expected {len(self.generators)} rows, got {scores.shape[0]}")
+        noise = torch.empty(scores.shape, dtype=torch.float32)
+        for row, generator in enumerate(self.generators):
+            noise[row].exponential_(generator=generator)
+        # -log(Exp(1)) is Gumbel(0, 1); -inf scores stay -inf
+        return scores - noise.log().to(device=scores.device, dtype=scores.dtype)
+
+
+def sampling_processors(seeds: Sequence[int], temperature: float = 1.0, top_k: int = 0,
+                        top_p: float = 1.0) -> LogitsProcessorList:
+    """
+    Processors to append after any others for seeded sampling with greedy generate.
+
+    Args:
+        seeds: One seed per generated row (see row_seeds)
+        temperature: Softmax temperature
+        top_k: Keep only the k most likely tokens (0 = off)
+        top_p: Keep the smallest set of tokens with this total probability
+
+    Returns:
+        LogitsProcessorList ending in the GumbelSampler; pass it with
+        do_sample=False
+    """
+    processors = LogitsProcessorList()
+    if temperature != 1.0:
+        processors.append(TemperatureLogitsWarper(temperature))
+    if top_k > 0:
+        processors.append(TopKLogitsWarper(top_k))
+    if top_p < 1.0:
+        processors.append(TopPLogitsWarper(top_p))
+    processors.append(GumbelSampler(seeds))
+    return processors
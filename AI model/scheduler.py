@@ -0,0 +1,224 @@
+"""
+Micro-batching scheduler for in-process model inference.
+Collects concurrent requests into shared forward passes.
+"""
+
+# Standard library imports
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class MicroBatcher:
+    """
+    Batch concurrent calls to a list-in, list-out function.
+
+    Callers submit a list of items and receive a future for their own
+    slice of the output. A single worker thread drains the queue, merging
+    pending requests until `max_batch_size` items are collected or
+    `max_wait_ms` has passed since the oldest pending request, then runs
+    `batch_fn` once over the merged items.
+
+    If the worker thread itself dies (e.g. a BaseException escaping
+    `batch_fn`), every in-flight and queued future fails with that error and
+    the next submission starts a fresh worker, so no caller waits forever.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+        enabled: bool = True,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.enabled = enabled
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+
+        self._requests = 0
+        self._items = 0
+        self._batches = 0
+        self._max_seen = 0
+        self._size_hist: Counter = Counter()
+        self._worker_failures = 0
+
+    # ----------------------------
+    # Submission
+    # ----------------------------
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        """
+        Queue items for the next shared batch.
+
+        Args:
+            items: Items to process together with other callers
+
+        Returns:
+            Future resolving to the list of results for `items`
+        """
+        future: Future = Future()
+        items = list(items)
+        if not items:
+            future.set_result([])
+            return future
+
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((items, future, time.monotonic()))
+            self._requests += 1
+            self._cond.notify()
+        return future
+
+    def run(self, items: Sequence[Any]) -> List[Any]:
+        """
+        Process items through the scheduler and wait for the results.
+
+        Falls back to calling `batch_fn` directly when batching is disabled.
+        """
+        if not self.enabled:
+            return list(self.batch_fn(list(items)))
+        return self.submit(items).result()
+
+    # ----------------------------
+    # Worker
+    # ----------------------------
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._loop, name=f"{self.name}-worker", daemon=True
+            )
+            self._worker.start()
+
+    def _pending_items(self) -> int:
+        return sum(len(items) for items, _, _ in self._queue)
+
+    def _collect(self) -> List[Any]:
+        """Block until a batch is ready and pop its requests off the queue."""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            deadline = self._queue[0][2] + self.max_wait
+            while self._pending_items() < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Always take the oldest request, then as many more as fit
+            batch = [self._queue.popleft()]
+            size = len(batch[0][0])
+            while self._queue and size + len(self._queue[0][0]) <= self.max_batch_size:
+                request = self._queue.popleft()
+                size += len(request[0])
+                batch.append(request)
+            return batch
+
+    def _loop(self):
+        batch: List[Any] = []
+        try:
+            while True:
+                batch = self._collect()
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    # Not from batch_fn (that is handled in _process): fail this
+                    # batch and keep serving
+                    self._fail(batch, e)
+                batch = []
+        except BaseException as e:
+            error = RuntimeError(f"{self.name}: worker thread died: {e!r}")
+            error.__cause__ = e
+            with self._cond:
+                pending = list(self._queue)
+                self._queue.clear()
+                # The next submit starts a new worker instead of queueing behind this one
+                self._worker = None
+                self._worker_failures += 1
+            self._fail(batch + pending, error)
+            raise
+
+    @staticmethod
+    def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None):
+        """Resolve a future unless its caller already cancelled it."""
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _fail(self, batch, error: BaseException):
+        for _, future, _ in batch:
+            self._settle(future, error=error)
+
+    def _process(self, batch):
+        """Run batch_fn over the merged requests and hand each caller its slice."""
+        merged = [item for items, _, _ in batch for item in items]
+
+        with self._cond:
+            self._batches += 1
+            self._items += len(merged)
+            self._max_seen = max(self._max_seen, len(merged))
+            self._size_hist[len(merged)] += 1
+
+        try:
+            results = list(self.batch_fn(merged))
+            if len(results) != len(merged):
+                raise RuntimeError(
+                    f"{self.name}: expected {len(merged)} results, got {len(results)}"
+                )
+        except Exception as e:
+            self._run_isolated(batch, e)
+            return
+
+        offset = 0
+        for items, future, _ in batch:
+            self._settle(future, results[offset:offset + len(items)])
+            offset += len(items)
+
+    def _run_isolated(self, batch, error: Exception):
+        """Re-run each request on its own so one bad caller does not fail the rest."""
+        if len(batch) == 1:
+            self._settle(batch[0][1], error=error)
+            return
+        for items, future, _ in batch:
+            try:
+                result = list(self.batch_fn(items))
+            except Exception as e:
+                self._settle(future, error=e)
+            else:
+                self._settle(future, result)
+
+    # ----------------------------
+    # Stats
+    # ----------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and batch-size statistics."""
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": len(self._queue),
+                "queued_items": self._pending_items(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "max_batch_size_seen": self._max_seen,
+                "batch_size_histogram": dict(sorted(self._size_hist.items())),
+                "worker_failures": self._worker_failures,
+            }
@@ -0,0 +1,246 @@
+"""
+Vector search backends for the molecule discovery pipeline.
+A remote Qdrant collection or an in-process index over local shards.
+"""
+
+# Standard library imports
+import glob
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Sequence
+
+# Third-party imports
+import numpy as np
+
+# Optional approximate index
+try:
+    import hnswlib
+except ImportError:  # pragma: no cover - optional dependency
+    hnswlib = None
+
+
+# Shard file layout:
+#   <index_dir>/vectors-00000.npy    float16/float32 matrix, one row per caption
+#   <index_dir>/payloads-00000.jsonl one JSON payload per row, same order
+VECTOR_SHARD_PATTERN = "vectors-*.npy"
+VECTOR_SHARD_PREFIX = "vectors-"
+PAYLOAD_SHARD_PREFIX = "payloads-"
+
+# Rows scored per matmul when scanning the memory-mapped matrix
+SCAN_BLOCK_ROWS = 65536
+
+
+def shard_paths(index_dir: str, shard_id: int) -> Dict[str, str]:
+    """Return the vector and payload file paths for a shard number."""
+    return {
+        "vectors": os.path.join(index_dir, f"{VECTOR_SHARD_PREFIX}{shard_id:05d}.npy"),
+        "payloads": os.path.join(index_dir, f"{PAYLOAD_SHARD_PREFIX}{shard_id:05d}.jsonl"),
+    }
+
+
+def read_payloads(path: str) -> List[Dict[str, Any]]:
+    """Read a JSONL payload shard."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class SearchBackend(ABC):
+    """
+    Interface for vector search backends.
+
+    `search` returns a list of payload dicts, best match first. Payloads
+    carry at least `smiles` and `property` (the "properties: ..." caption),
+    which is what `combine_results` reads.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, embedding: Sequence[float], limit: int = 5) -> List[Dict[str, Any]]:
+        """Return the payloads of the `limit` nearest entries, best match first."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class QdrantBackend(SearchBackend):
+    """Query a remote Qdrant collection."""
+
+    name = "qdrant"
+
+    def __init__(self, client, collection: str):
+        self.client = client
+        self.collection = collection
+
+    def search(self, embedding: Sequence[float], limit: int = 5) -> List[Dict[str, Any]]:
+        resp = self.client.query_points(
+            collection_name=self.collection,
+            query=list(embedding),
+            limit=limit
+        )
+        points = getattr(resp, "points", resp)
+
+        # Normalize results to list of dicts
+        payloads = []
+        for item in points:
+            if isinstance(item, dict):
+                payloads.append(item)
+            else:
+                payloads.append(getattr(item, "payload", None) or {})
+        return payloads
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "collection": self.collection}
+
+
+class LocalIndex(SearchBackend):
+    """
+    In-process vector index over memory-mapped shards.
+
+    Vectors are read with ``np.load(mmap_mode="r")`` so the corpus is paged
+    in by the OS rather than copied. Exact search scores blocks of rows with
+    a single matrix-vector product each; with ``ann="hnsw"`` (requires
+    hnswlib) an HNSW graph is built once at load time and queried instead.
+    """
+
+    name = "local"
+
+    def __init__(self, index_dir: str, metric: str = "cosine", ann: str = "",
+                 hnsw_ef: int = 64, hnsw_m: int = 16):
+        """
+        Load every shard in `index_dir`.
+
+        Args:
+            index_dir: Directory containing vectors-*.npy / payloads-*.jsonl
+            metric: "cosine" or "dot"
+            ann: "" for exact search or "hnsw" for an approximate index
+            hnsw_ef: HNSW query-time ef (higher = more accurate)
+            hnsw_m: HNSW graph degree
+
+        Raises:
+            FileNotFoundError: If no shards are found
+            ValueError: On unknown options or mismatched shard files
+        """
+        if metric not in ("cosine", "dot"):
+            raise ValueError(f"Unknown metric: {metric}")
+        if ann not in ("", "hnsw"):
+            raise ValueError(f"Unknown approximate index: {ann}")
+
+        self.index_dir = index_dir
+        self.metric = metric
+        self.ann = ann
+        self._lock = threading.Lock()
+        self.queries = 0
+
+        vector_files = sorted(glob.glob(os.path.join(index_dir, VECTOR_SHARD_PATTERN)))
+        if not vector_files:
+            raise FileNotFoundError(f"No index shards found in {index_dir}")
+
+        self._shards: List[np.ndarray] = []
+        self._payloads: List[Dict[str, Any]] = []
+        for vector_file in vector_files:
+            vectors = np.load(vector_file, mmap_mode="r")
+            payload_file = os.path.join(
+                index_dir,
+                os.path.basename(vector_file)
+                .replace(VECTOR_SHARD_PREFIX, PAYLOAD_SHARD_PREFIX, 1)
+                .replace(".npy", ".jsonl")
+            )
+            payloads = read_payloads(payload_file)
+            if len(payloads) != vectors.shape[0]:
+                raise ValueError(
+                    f"{payload_file}: {len(payloads)} payloads for {vectors.shape[0]} vectors"
+                )
+            self._shards.append(vectors)
+            self._payloads.extend(payloads)
+
+        dims = {shard.shape[1] for shard in self._shards}
+        if len(dims) != 1:
+            raise ValueError(f"Shards have mismatched dimensions: {sorted(dims)}")
+        self.dim = dims.pop()
+        self.size = len(self._payloads)
+
+        # Row norms are computed once so queries only normalize themselves
+        self._norms = None
+        if metric == "cosine":
+            self._norms = np.concatenate([self._row_norms(s) for s in self._shards])
+
+        self._hnsw = None
+        if ann == "hnsw":
+            self._hnsw = self._build_hnsw(hnsw_ef, hnsw_m)
+
+    @staticmethod
+    def _row_norms(vectors: np.ndarray) -> np.ndarray:
+        norms = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], SCAN_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1.0
+        return norms
+
+    def _build_hnsw(self, ef: int, m: int):
+        if hnswlib is None:
+            raise ImportError("ann='hnsw' requires the hnswlib package")
+        index = hnswlib.Index(space="cosine" if self.metric == "cosine" else "ip", dim=self.dim)
+        index.init_index(max_elements=self.size, ef_construction=max(ef, 100), M=m)
+        offset = 0
+        for vectors in self._shards:
+            for start in range(0, vectors.shape[0], SCAN_BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                index.add_items(block, np.arange(offset + start, offset + start + len(block)))
+            offset += vectors.shape[0]
+        index.set_ef(ef)
+        return index
+
+    def _exact_scores(self, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(self.size, dtype=np.float32)
+        offset = 0
+        for vectors in self._shards:
+            for start in range(0, vectors.shape[0], SCAN_BLOCK_ROWS):
+                # float16 rows are upcast per block so the product runs in BLAS
+                block = np.asarray(vectors[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+                scores[offset + start:offset + start + len(block)] = block @ query
+            offset += vectors.shape[0]
+        if self._norms is not None:
+            scores /= self._norms
+        return scores
+
+    def search(self, embedding: Sequence[float], limit: int = 5) -> List[Dict[str, Any]]:
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query has dimension {query.shape[0]}, index has {self.dim}")
+        if self.metric == "cosine":
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+
+        limit = max(0, min(int(limit), self.size))
+        with self._lock:
+            self.queries += 1
+        if limit == 0:
+            return []
+
+        if self._hnsw is not None:
+            labels, _ = self._hnsw.knn_query(query, k=limit)
+            order = labels[0]
+        else:
+            scores = self._exact_scores(query)
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            order = top[np.argsort(-scores[top], kind="stable")]
+
+        return [dict(self._payloads[int(i)]) for i in order]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "index_dir": self.index_dir,
+            "size": self.size,
+            "dim": self.dim,
+            "shards": len(self._shards),
+            "dtype": str(self._shards[0].dtype),
+            "metric": self.metric,
+            "ann": self.ann or "exact",
+            "queries": self.queries,
+        }
@@ -0,0 +1,383 @@
+"""
+SMILES-grammar-constrained decoding for MolT5.
+A character-level SMILES syntax tracker and a LogitsProcessor that masks
+tokens which would make the decoded string unparseable.
+"""
+
+# Standard library imports
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Third-party imports
+import torch
+from transformers import LogitsProcessor
+
+
+# What the previous character left the parser expecting
+START, ATOM, BOND_AFTER_ATOM, BOND, OPEN, CLOSE, DOT = range(7)
+
+ORGANIC_ATOMS = set("BCNOPSFI")
+AROMATIC_ATOMS = set("bcnops")
+BOND_CHARS = set("-=#$:/\\")
+RING_DIGITS = set("0123456789")
+BRACKET_CHARS = set("ABCDEFGHIKLMNOPRSTUVWXYZabcdefghiklmnoprstuvy0123456789@+-:")
+SMILES_CHARS = ORGANIC_ATOMS | AROMATIC_ATOMS | BOND_CHARS | RING_DIGITS | BRACKET_CHARS | set("()[]%.lr")
+
+# SentencePiece word-boundary marker
+SPACE_MARKER = "▁"
+
+MAX_BRACKET_LENGTH = 12
+ELEMENTS = set("""
+H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn
+Ga Ge As Se Br Kr Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La
+Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po
+At Rn Fr Ra Ac Th Pa U Np Pu Am Cm Bk Cf Es Fm Md No Lr
+""".split())
+AROMATIC_BRACKET_ELEMENTS = {"b", "c", "n", "o", "p", "s", "se", "as"}
+
+
+class SmilesState(NamedTuple):
+    """Parser state after a SMILES prefix. Hashable, so transitions memoize."""
+    prev: int = START
+    depth: int = 0
+    rings: frozenset = frozenset()
+    heavy: int = 0
+    last: str = ""
+    bracket: Optional[str] = None
+    percent: Optional[str] = None
+    opened_here: frozenset = frozenset()  # Ring labels opened on the current atom
+
+
+INITIAL_STATE = SmilesState()
+
+
+def parse_bracket(content: str, complete: bool) -> Optional[str]:
+    """
+    Check the contents of a bracket atom.
+    
+    Grammar: isotope? element chirality? hcount? charge? class?
+    
+    Args:
+        content: Text between "[" and "]" seen so far
+        complete: True when "]" follows, False to accept valid prefixes
+        
+    Returns:
+        The element symbol ("" if not reached yet), or None if invalid
+    """
+    i, n = 0, len(content)
+    while i < n and content[i].isdigit() and i < 3:
+        i += 1
+    if i == n:
+        return None if complete else ""
+
+    # Element: longest symbol that is still valid
+    element = None
+    for size in (2, 1):
+        symbol = content[i:i + size]
+        if len(symbol) == size and (symbol in ELEMENTS or symbol in AROMATIC_BRACKET_ELEMENTS):
+            element = symbol
+            break
+    if element is None:
+        # Could still become a two-letter symbol ("S" -> "Se" is covered above,
+        # but "X" alone is not an element while "Xe" is)
+        if not complete and n - i == 1 and any(e.startswith(content[i]) for e in ELEMENTS | AROMATIC_BRACKET_ELEMENTS):
+            return ""
+        return None
+    i += len(element)
+
+    # Chirality, hydrogen count, charge, atom class, in that order
+    if content[i:i + 2] == "@@":
+        i += 2
+    elif content[i:i + 1] == "@":
+        i += 1
+    if content[i:i + 1] == "H" and element != "H":
+        i += 1
+        if content[i:i + 1].isdigit():
+            i += 1
+    if content[i:i + 1] in ("+", "-"):
+        sign = content[i]
+        i += 1
+        if content[i:i + 1].isdigit():
+            i += 1
+        else:
+            while content[i:i + 1] == sign:
+                i += 1
+    if content[i:i + 1] == ":":
+        i += 1
+        digits = 0
+        while content[i:i + 1].isdigit():
+            i += 1
+            digits += 1
+        if complete and digits == 0:
+            return None
+    return element if i == n else None
+
+
+def _atom(state: SmilesState, char: str, max_atoms: Optional[int]) -> Optional[SmilesState]:
+    heavy = state.heavy + 1
+    if max_atoms is not None and heavy > max_atoms:
+        return None
+    return state._replace(prev=ATOM, heavy=heavy, last=char, opened_here=frozenset())
+
+
+def _toggle_ring(state: SmilesState, label: str) -> Optional[SmilesState]:
+    if label in state.rings:
+        # An atom cannot close a ring onto itself
+        if label in state.opened_here:
+            return None
+        return state._replace(prev=ATOM, rings=state.rings - {label}, last=label[-1], percent=None)
+    return state._replace(
+        prev=ATOM, rings=state.rings | {label}, last=label[-1], percent=None,
+        opened_here=state.opened_here | {label},
+    )
+
+
+def step(state: SmilesState, char: str, max_atoms: Optional[int] = None) -> Optional[SmilesState]:
+    """
+    Advance the parser by one character.
+
+    Args:
+        state: State after the prefix so far
+        char: Next character
+        max_atoms: Optional cap on heavy atoms
+
+    Returns:
+        The new state, or None if the character cannot follow the prefix
+    """
+    # Inside [...]: collect until the closing bracket, then validate the atom
+    if state.bracket is not None:
+        if char == "]":
+            element = parse_bracket(state.bracket, complete=True)
+            if not element:
+                return None
+            heavy = state.heavy + (0 if element == "H" else 1)
+            if max_atoms is not None and heavy > max_atoms:
+                return None
+            return state._replace(prev=ATOM, heavy=heavy, last=char, bracket=None, opened_here=frozenset())
+        content = state.bracket + char
+        if char not in BRACKET_CHARS or len(content) > MAX_BRACKET_LENGTH:
+            return None
+        if parse_bracket(content, complete=False) is None:
+            return None
+        return state._replace(bracket=content, last=char)
+
+    # Two-digit ring label after %
+    if state.percent is not None:
+        if char not in RING_DIGITS:
+            return None
+        label = state.percent + char
+        if len(label) < 2:
+            if max_atoms is not None and state.heavy >= max_atoms and not any(
+                    r.startswith("%" + label) for r in state.rings):
+                return None
+            return state._replace(percent=label, last=char)
+        if max_atoms is not None and state.heavy >= max_atoms and "%" + label not in state.rings:
+            return None
+        return _toggle_ring(state, "%" + label)
+
+    ring_ok = state.prev in (ATOM, BOND_AFTER_ATOM)
+    # At the atom cap, only moves that can finish without another atom remain
+    at_cap = max_atoms is not None and state.heavy >= max_atoms
+
+    if char in ORGANIC_ATOMS or char in AROMATIC_ATOMS:
+        return _atom(state, char, max_atoms)
+    if char == "l":
+        # Second letter of Cl
+        return state._replace(last=char) if state.prev == ATOM and state.last == "C" else None
+    if char == "r":
+        # Second letter of Br
+        return state._replace(last=char) if state.prev == ATOM and state.last == "B" else None
+    if char == "[":
+        return state._replace(bracket="", last=char) if not at_cap else None
+    if char in RING_DIGITS:
+        if not ring_ok or (at_cap and char not in state.rings):
+            return None
+        return _toggle_ring(state, char)
+    if char == "%":
+        if not ring_ok or (at_cap and not any(r.startswith("%") for r in state.rings)):
+            return None
+        return state._replace(percent="", last=char)
+    # Leaving the current atom with rings still open would need another atom
+    if at_cap and (char in BOND_CHARS | {"(", "."} or (char == ")" and state.rings)):
+        return None
+    if char in BOND_CHARS:
+        if state.prev == ATOM:
+            return state._replace(prev=BOND_AFTER_ATOM, last=char)
+        if state.prev in (CLOSE, OPEN):
+            return state._replace(prev=BOND, last=char)
+        return None
+    if char == "(":
+        return state._replace(prev=OPEN, depth=state.depth + 1, last=char) if state.prev in (ATOM, CLOSE) else None
+    if char == ")":
+        if state.depth == 0 or state.prev not in (ATOM, CLOSE):
+            return None
+        return state._replace(prev=CLOSE, depth=state.depth - 1, last=char)
+    if char == ".":
+        return state._replace(prev=DOT, last=char) if state.prev in (ATOM, CLOSE) and state.depth == 0 else None
+    return None
+
+
+def is_complete(state: SmilesState) -> bool:
+    """True if the prefix is a syntactically complete SMILES string."""
+    return (
+        state.heavy > 0
+        and state.depth == 0
+        and not state.rings
+        and state.prev in (ATOM, CLOSE)
+        and state.bracket is None
+        and state.percent is None
+    )
+
+
+def parse_prefix(text: str, max_atoms: Optional[int] = None) -> Optional[SmilesState]:
+    """Run the parser over a whole string; None if it is not a valid prefix."""
+    state = INITIAL_STATE
+    for char in text:
+        state = step(state, char, max_atoms)
+        if state is None:
+            return None
+    return state
+
+
+# ============================
+# TOKEN TABLES
+# ============================
+
+
+_token_tables: Dict[Tuple[str, int], List[Optional[Tuple[bool, str]]]] = {}
+
+
+def token_table(tokenizer) -> List[Optional[Tuple[bool, str]]]:
+    """
+    Map every token id to (starts_word, text), or None if it can never be
+    part of a SMILES string. Built once per tokenizer.
+    """
+    key = (getattr(tokenizer, "name_or_path", ""), len(tokenizer))
+    table = _token_tables.get(key)
+    if table is not None:
+        return table
+
+    special = set(tokenizer.all_special_ids)
+    table = []
+    for token_id in range(len(tokenizer)):
+        piece = tokenizer.convert_ids_to_tokens(token_id)
+        if token_id in special or not isinstance(piece, str):
+            table.append(None)
+            continue
+        starts_word = piece.startswith(SPACE_MARKER)
+        text = piece[1:] if starts_word else piece
+        if text and not set(text) <= SMILES_CHARS:
+            table.append(None)
+            continue
+        table.append((starts_word, text))
+    _token_tables[key] = table
+    return table
+
+
+# ============================
+# LOGITS PROCESSOR
+# ============================
+
+
+class SmilesGrammarLogitsProcessor(LogitsProcessor):
+    """
+    Mask next tokens that would make the decoded SMILES unparseable.
+
+    The parser state of each sequence is derived from its prefix and
+    memoized, so rows can be reordered (beam search) without losing track.
+    Only the `max_candidates` highest-scoring legal tokens per row are kept;
+    sampling with top_k/top_p never looks further than that anyway. EOS is
+    allowed only once the string is complete; a row with no legal
+    continuation is forced to EOS so sampling never sees an all -inf row.
+    """
+
+    def __init__(self, tokenizer, eos_token_id: int, pad_token_id: int = 0,
+                 max_atoms: Optional[int] = None, max_candidates: int = 64,
+                 max_scan: int = 512):
+        self.table = token_table(tokenizer)
+        self.eos_token_id = eos_token_id
+        self.pad_token_id = pad_token_id
+        self.max_atoms = max_atoms
+        self.max_candidates = max_candidates
+        self.max_scan = max_scan
+
+        self._prefix_states: Dict[Tuple[int, ...], Optional[SmilesState]] = {(): INITIAL_STATE}
+        self._transitions: Dict[Tuple[SmilesState, int], Optional[SmilesState]] = {}
+        self._start = None
+
+    def _advance(self, state: SmilesState, token_id: int) -> Optional[SmilesState]:
+        key = (state, token_id)
+        if key in self._transitions:
+            return self._transitions[key]
+
+        entry = self.table[token_id] if token_id < len(self.table) else None
+        new_state = None
+        if entry is not None:
+            starts_word, text = entry
+            # A word boundary is only acceptable before the first character
+            if not starts_word or (state == INITIAL_STATE):
+                new_state = state
+                for char in text:
+                    new_state = step(new_state, char, self.max_atoms)
+                    if new_state is None:
+                        break
+        self._transitions[key] = new_state
+        return new_state
+
+    def _state_for(self, prefix: Tuple[int, ...]) -> Optional[SmilesState]:
+        if prefix in self._prefix_states:
+            return self._prefix_states[prefix]
+        parent = self._state_for(prefix[:-1])
+        token_id = prefix[-1]
+        if parent is None or token_id in (self.eos_token_id, self.pad_token_id):
+            state = None
+        else:
+            state = self._advance(parent, token_id)
+        self._prefix_states[prefix] = state
+        return state
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self._start is None:
+            # Skip the decoder start token(s) present at the first call
+            self._start = input_ids.shape[1]
+
+        k = min(self.max_scan, scores.shape[-1])
+        top_ids = torch.topk(scores, k, dim=-1).indices.tolist()
+        mask = torch.full_like(scores, float("-inf"))
+
+        for row, candidates in enumerate(top_ids):
+            prefix = tuple(input_ids[row, self._start:].tolist())
+            state = self._state_for(prefix)
+
+            allowed = []
+            if state is None:
+                # Finished (or already broken) sequence: let it end
+                allowed = [self.eos_token_id, self.pad_token_id]
+            else:
+                for token_id in candidates:
+                    if token_id == self.eos_token_id:
+                        continue
+                    if self._advance(state, token_id) is not None:
+                        allowed.append(token_id)
+                        if len(allowed) >= self.max_candidates:
+                            break
+                if is_complete(state) or not allowed:
+                    allowed.append(self.eos_token_id)
+
+            index = torch.tensor(allowed, dtype=torch.long, device=scores.device)
+            mask[row, index] = scores[row, index]
+        return mask
+
+
+def grammar_processor(tokenizer, model_config, max_atoms: Optional[int] = None,
+                      **kwargs) -> SmilesGrammarLogitsProcessor:
+    """Build a processor using the model's EOS/pad ids."""
+    eos = model_config.eos_token_id
+    pad = model_config.pad_token_id
+    return SmilesGrammarLogitsProcessor(
+        tokenizer,
+        eos_token_id=eos if eos is not None else tokenizer.eos_token_id,
+        pad_token_id=pad if pad is not None else tokenizer.pad_token_id,
+        max_atoms=max_atoms,
+        **kwargs,
+    )
+
@@ -0,0 +1,13 @@
+"""
+Shared pytest setup: make the pipeline modules importable from tests/ and
+keep importing agent from loading models or reaching the network.
+"""
+
+# Standard library imports
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("MODEL_WARMUP", "0")
+os.environ.setdefault("GRADIO_ANALYTICS_ENABLED", "False")
@@ -0,0 +1,111 @@
+"""Tests for the async LLM path: timeout, concurrency limit and arun_pipeline."""
+
+# Standard library imports
+import asyncio
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+import agent
+
+sys.path.insert(0, os.path.join(os.path.dirname(agent.__file__), "benchmarks"))
+
+from llm_stub_server import start_in_thread  # noqa: E402
+from offline import StubLLM, install  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def offline_agent():
+    """The agent with the stub LLM, stub Qdrant client and tiny models installed."""
+    install(agent, tiny_models=True)
+    return agent
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_slow_response_hits_the_timeout(offline_agent):
+    agent.models.set("llm", StubLLM(delay=1.0))
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(agent.acall_llm("Explain SMILES: C", timeout=0.05))
+    finally:
+        agent.models.set("llm", StubLLM())
+
+
+def test_slow_llm_fails_the_node_not_the_run(offline_agent, monkeypatch):
+    async def timeout(prompt):
+        raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(agent, "acall_llm", timeout)
+    update = asyncio.run(agent.aoptimize_step({"candidates": agent.CandidateTable.empty(agent.PROPERTY_NAMES)}))
+    assert update["prompt"].startswith("LLM optimize_step failed")
+
+
+def test_in_flight_calls_never_exceed_the_limit(offline_agent, monkeypatch):
+    server = start_in_thread(port=_free_port(), delay=0.05)
+    try:
+        monkeypatch.setattr(agent, "LLM_MAX_CONCURRENCY", 3)
+        monkeypatch.setattr(agent, "LLM_BASE_URL", f"http://127.0.0.1:{server.config.port}/v1")
+        agent.models.set("llm", agent._load_llm())
+
+        async def burst():
+            return await asyncio.gather(*(agent.acall_llm(f"Explain SMILES: C{i}") for i in range(12)))
+
+        answers = asyncio.run(burst())
+        app = server.config.app
+        assert len(answers) == 12
+        assert app.state.requests == 12
+        assert app.state.max_in_flight == 3
+    finally:
+        server.should_exit = True
+        agent.models.set("llm", StubLLM())
+
+
+def test_arun_pipeline_matches_run_pipeline(offline_agent, monkeypatch):
+    # The tiny MolT5 only yields valid molecules under the grammar, and the
+    # evaluate and optimize nodes only call the LLM when there are some
+    monkeypatch.setattr(agent, "GENERATION_GRAMMAR", True)
+    config = agent.PipelineConfig(evaluation="llm", stop_when_passed=False)
+    constraints = {"mu": 2.0, "gap": 0.3, "max_atoms": 12}
+
+    sync_llm = agent.models.llm
+    sync_result = agent.run_pipeline(constraints, max_iterations=2, config=config, seed=5, use_cache=False)
+    async_llm = StubLLM()
+    agent.models.set("llm", async_llm)
+    async_result = asyncio.run(agent.arun_pipeline(constraints, max_iterations=2, config=config,
+                                                   seed=5, use_cache=False))
+
+    assert set(async_result) == set(sync_result)
+    assert async_result["cache_hit"] is False
+    assert async_result["topk"]
+    for key in ("topk", "predictions", "explanations", "search_results"):
+        assert isinstance(async_result[key], list)
+        assert async_result[key] == sync_result[key]
+    assert async_result["iteration"] == sync_result["iteration"] == 2
+    # Evaluate, optimize and explain all went through the LLM on both paths
+    assert async_llm.calls == sync_llm.calls >= 3
+
+
+def test_arun_pipeline_keeps_cache_io_off_the_event_loop(offline_agent, monkeypatch):
+    threads = {}
+
+    def recording(name, func):
+        def wrapper(*args):
+            threads[name] = threading.current_thread()
+            return func(*args)
+        return wrapper
+
+    monkeypatch.setattr(agent, "_cached_result", recording("lookup", agent._cached_result))
+    monkeypatch.setattr(agent, "_finish_run", recording("store", agent._finish_run))
+    config = agent.PipelineConfig(use_search=False, explain=False)
+    asyncio.run(agent.arun_pipeline({"mu": 2.0}, config=config, seed=1))
+
+    assert set(threads) == {"lookup", "store"}
+    assert threading.main_thread() not in threads.values()
@@ -0,0 +1,68 @@
+"""Tests for seeded sampling and the batched pipeline driver."""
+
+# Standard library imports
+import os
+import sys
+
+import pytest
+import torch
+
+import agent
+from sampling import GumbelSampler, row_seeds
+
+sys.path.insert(0, os.path.join(os.path.dirname(agent.__file__), "benchmarks"))
+
+from offline import install  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def offline_agent():
+    """The agent with the stub LLM, stub Qdrant client and tiny models installed."""
+    install(agent, tiny_models=True)
+    return agent
+
+
+def test_row_seeds_do_not_depend_on_the_other_captions():
+    alone = row_seeds([7], 3)
+    assert row_seeds([1, 7, 2], 3)[3:6] == alone
+    assert len(set(alone)) == 3
+
+
+def test_gumbel_sampler_rows_use_their_own_generator():
+    scores = torch.zeros(3, 10)
+    first = GumbelSampler([1, 2, 3])(None, scores)
+    second = GumbelSampler([9, 2, 8])(None, scores)
+    assert torch.equal(first[1], second[1])
+    assert not torch.equal(first[0], second[0])
+    with pytest.raises(ValueError):
+        GumbelSampler([1, 2])(None, scores)
+
+
+def test_seeded_samples_do_not_depend_on_the_batch(offline_agent, monkeypatch):
+    monkeypatch.setattr(agent, "GENERATION_GRAMMAR", True)
+    request = ("Molecule with mu=2.0", 4, True, 12, 5)
+    alone = agent.sample_smiles(*request)
+    batched = agent.sample_smiles_batch([
+        ("Molecule with mu=0.5", 4, True, 12, 1),
+        request,
+        ("Molecule with gap=0.3 and a much longer caption", 4, True, 12, None),
+    ])
+    assert batched[1] == alone
+
+
+@pytest.mark.parametrize("mode", ["fixed", "adaptive"])
+def test_run_pipeline_batch_matches_run_pipeline(offline_agent, monkeypatch, mode):
+    monkeypatch.setattr(agent, "GENERATION_GRAMMAR", True)
+    config = agent.PipelineConfig(generation=mode, stop_when_passed=False)
+    sets = [{"mu": 1.5 + 0.2 * i, "gap": 0.3, "max_atoms": 10 + i} for i in range(3)]
+    sets.append(dict(sets[0]))
+
+    sequential = [agent.run_pipeline(constraints, 2, config=config, seed=11, use_cache=False)
+                  for constraints in sets]
+    batch = agent.run_pipeline_batch(sets, 2, config=config, seed=11, use_cache=False)
+
+    assert len(batch) == len(sets)
+    for one, batched in zip(sequential, batch):
+        assert set(batched) == set(one)
+        assert [row["smiles"] for row in batched["topk"]] == [row["smiles"] for row in one["topk"]]
+        assert batched["iteration"] == one["iteration"]
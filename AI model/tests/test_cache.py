@@ -0,0 +1,126 @@
+"""Tests for the LRU and SQLite-backed caches."""
+
+# Standard library imports
+import time
+
+from cache import LRUCache, TieredCache
+
+
+# ============================
+# LRU CACHE
+# ============================
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_counts_hits_and_misses():
+    cache = LRUCache(maxsize=4)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing", "default") == "default"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_lru_zero_size_stores_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert len(cache) == 0
+    assert cache.get("a") is None
+
+
+def test_lru_ttl_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl_seconds=10)
+    cache.set("a", 1)
+
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 1
+    assert "a" not in cache
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_lru_explicit_expiry_overrides_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = LRUCache(maxsize=4, ttl_seconds=100)
+    cache.set("a", 1, expires_at=1005.0)
+
+    now[0] = 1006.0
+    assert cache.get("a") is None
+
+
+# ============================
+# TIERED CACHE
+# ============================
+
+def test_tiered_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache(maxsize=8, path=path, namespace="v1").set_many({"a": {"x": [1, 2]}, "b": "text"})
+
+    # A fresh cache has an empty memory tier, so these come from SQLite
+    cache = TieredCache(maxsize=8, path=path, namespace="v1")
+    assert cache.get_many(["a", "b", "c"]) == {"a": {"x": [1, 2]}, "b": "text"}
+    assert cache.stats()["disk_hits"] == 2
+
+    # ...and are promoted to memory
+    assert cache.get("a") == {"x": [1, 2]}
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["disk_hits"] == 2
+
+
+def test_tiered_namespaces_are_separate(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache(path=path, namespace="v1").set("a", 1)
+    assert TieredCache(path=path, namespace="v2").get("a") is None
+    assert TieredCache(path=path, namespace="v1").get("a") == 1
+
+
+def test_tiered_ttl_expires_and_deletes_disk_rows(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache(path=path, ttl_seconds=10).set("a", 1)
+
+    now[0] += 5
+    cache = TieredCache(path=path, ttl_seconds=10)
+    assert cache.get("a") == 1
+
+    # The promoted entry keeps the disk write time, not the promotion time
+    now[0] += 5
+    assert cache.get("a") is None
+    assert len(cache.disk) == 0
+
+
+def test_tiered_prunes_expired_rows_at_startup(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache(path=path, namespace="v1").set("old", 1)
+    TieredCache(path=path, namespace="v2").set("other", 2)
+    now[0] += 20
+    TieredCache(path=path, namespace="v1").set("new", 3)
+
+    cache = TieredCache(path=path, namespace="v1", ttl_seconds=10)
+    # Only this namespace's expired row is deleted
+    assert len(cache.disk) == 2
+    assert cache.disk.get_many(["old", "new"]) == {"new": 3}
+    assert TieredCache(path=path, namespace="v2").get("other") == 2
+
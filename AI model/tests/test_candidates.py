@@ -0,0 +1,60 @@
+"""Tests for the columnar candidate table."""
+
+import numpy as np
+
+from candidates import (
+    SOURCE_GENERATED, SOURCE_SEARCHED, STATUS_ERROR, STATUS_FAILED, STATUS_PASSED, CandidateTable,
+)
+
+
+NAMES = ("mu", "gap")
+
+
+def test_from_records_fills_known_columns():
+    table = CandidateTable.from_records(
+        [{"smiles": "CCO", "mu": 1.5, "heavy_atoms": 3}, "C"], NAMES, source=SOURCE_SEARCHED
+    )
+    assert list(table.smiles) == ["CCO", "C"]
+    assert table.properties[0, 0] == np.float32(1.5)
+    assert np.isnan(table.properties[1]).all()
+    assert table.to_records()[0] == {"smiles": "CCO", "source": "searched", "status": "pending", "heavy_atoms": 3}
+
+
+def test_concat_aligns_property_columns():
+    first = CandidateTable.from_records([{"smiles": "C", "mu": 1.0, "gap": 0.2}], NAMES)
+    second = CandidateTable.from_records([{"smiles": "N", "gap": 0.3, "mu": 2.0}], ("gap", "mu"),
+                                         source=SOURCE_SEARCHED)
+    merged = CandidateTable.concat([first, second])
+
+    assert merged.property_names == NAMES
+    np.testing.assert_allclose(merged.properties, [[1.0, 0.2], [2.0, 0.3]], rtol=1e-6)
+    assert list(merged.source) == [SOURCE_GENERATED, SOURCE_SEARCHED]
+
+
+def test_take_and_contains():
+    table = CandidateTable.from_smiles(["C", "N", "O"], NAMES)
+    assert list(table.contains(["O", "C", "S"])) == [True, False, True]
+
+    picked = table.take(np.array([2, 0]))
+    assert list(picked.smiles) == ["O", "C"]
+    assert len(table.take(~table.contains(["N"]))) == 2
+
+
+def test_predictions_evaluation_and_scores():
+    table = CandidateTable.from_smiles(["C", "N", "O"], NAMES).with_predictions(
+        [{"mu": 1.0, "gap": 0.1}, {"error": "model failed"}, {"mu": 3.0}]
+    )
+    assert table.status[1] == STATUS_ERROR
+    assert table.property_records() == [{"mu": 1.0, "gap": 0.1}, {"error": "model failed"}, {"mu": 3.0}]
+
+    table = table.with_evaluation([True, True, False], ["ok", "ok", "too polar"])
+    # A failed prediction stays an error, whatever the evaluator said
+    assert list(table.status) == [STATUS_PASSED, STATUS_ERROR, STATUS_FAILED]
+    assert list(table.note) == ["ok", "model failed", "too polar"]
+
+    table = table.with_scores(np.array([0.0, np.inf, 1.0]))
+    np.testing.assert_allclose(table.score, [1.0, 0.0, 0.5])
+    records = table.to_records()
+    assert records[1]["distance"] is None
+    assert records[2]["score"] == 0.5
+
@@ -0,0 +1,46 @@
+"""Tests for the numeric constraint evaluator."""
+
+from agent import check_constraints
+from candidates import CandidateTable
+
+
+CONSTRAINTS = {"mu": 2.0, "gap": 0.3, "max_atoms": 10}
+TOLERANCES = {"mu": 0.5, "gap": 0.05}
+
+
+def test_passes_within_tolerance_and_atom_limit():
+    predictions = [
+        {"mu": 2.4, "gap": 0.28, "num_atoms": 10},
+        {"mu": 2.6, "gap": 0.3, "num_atoms": 9},
+        {"mu": 2.0, "gap": 0.3, "num_atoms": 11},
+    ]
+    passed, reasons = check_constraints(predictions, CONSTRAINTS, TOLERANCES)
+
+    assert list(passed) == [True, False, False]
+    assert reasons[0] == "Meets all constraints"
+    assert reasons[1] == "Fails: mu=2.6 vs target 2±0.5"
+    assert reasons[2] == "Fails: num_atoms=11 > max 10"
+
+
+def test_missing_properties_and_errors_fail():
+    passed, reasons = check_constraints(
+        [{"mu": 2.0, "num_atoms": 5}, {"error": "model failed"}], CONSTRAINTS, TOLERANCES
+    )
+    assert list(passed) == [False, False]
+    assert reasons[0] == "Fails: gap missing"
+
+
+def test_non_numeric_constraints_are_ignored():
+    passed, reasons = check_constraints([{"mu": 1.0}], {"mu": "high", "note": "polar"}, TOLERANCES)
+    assert list(passed) == [True]
+    assert reasons == ["No numeric constraints"]
+
+
+def test_candidate_table_matches_dicts():
+    predictions = [{"mu": 2.4, "gap": 0.28, "num_atoms": 10}, {"mu": 1.0, "gap": 0.3, "num_atoms": 4}]
+    table = CandidateTable.from_smiles(["CCO", "C"], ("mu", "gap", "num_atoms")).with_predictions(predictions)
+
+    from_table = check_constraints(table, CONSTRAINTS, TOLERANCES)
+    from_dicts = check_constraints(predictions, CONSTRAINTS, TOLERANCES)
+    assert list(from_table[0]) == list(from_dicts[0]) == [True, False]
+
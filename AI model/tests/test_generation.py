@@ -0,0 +1,53 @@
+"""Tests for adaptive generation's stopping rules."""
+
+import pytest
+
+import agent
+
+
+@pytest.fixture
+def state():
+    return agent.make_initial_state({"mu": 2.0})
+
+
+def test_sampling_error_after_first_round_is_reported(state, monkeypatch):
+    calls = []
+
+    def sample(caption, num_samples, **kwargs):
+        calls.append(num_samples)
+        if len(calls) > 1:
+            raise RuntimeError("out of memory")
+        return ["CCO", "C"]
+
+    monkeypatch.setattr(agent, "sample_smiles", sample)
+    monkeypatch.setattr(agent, "GENERATION_TARGET_VALID", 10)
+    monkeypatch.setattr(agent, "GENERATION_DEADLINE_MS", 0)
+    update = agent.adaptive_generate_molecules(state)
+
+    # Molecules from the first round are kept
+    assert list(update["candidates"].smiles) == ["CCO", "C"]
+    assert update["log"][-1].endswith("(sampling failed: out of memory)")
+    assert any("generate_molecules failed: out of memory" in line for line in update["log"])
+
+
+def test_sampling_error_in_first_round_fails_the_node(state, monkeypatch):
+    def sample(caption, num_samples, **kwargs):
+        raise RuntimeError("model not loaded")
+
+    monkeypatch.setattr(agent, "sample_smiles", sample)
+    update = agent.adaptive_generate_molecules(state)
+    assert len(update["candidates"]) == 0
+    assert update["log"] == ["generate_molecules failed: model not loaded"]
+
+
+@pytest.mark.parametrize("target, budget, reason", [
+    (2, 100, "target reached"),
+    (10, 4, "sample budget exhausted"),
+])
+def test_stop_reasons(state, monkeypatch, target, budget, reason):
+    monkeypatch.setattr(agent, "sample_smiles", lambda caption, n, **kwargs: ["CCO", "C"][:n])
+    monkeypatch.setattr(agent, "GENERATION_TARGET_VALID", target)
+    monkeypatch.setattr(agent, "GENERATION_MAX_SAMPLES", budget)
+    monkeypatch.setattr(agent, "GENERATION_BATCH_SIZE", 2)
+    monkeypatch.setattr(agent, "GENERATION_DEADLINE_MS", 0)
+    assert agent.adaptive_generate_molecules(state)["log"][-1].endswith(f"({reason})")
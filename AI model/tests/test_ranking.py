@@ -0,0 +1,49 @@
+"""Tests for weighted constraint distances and top-k selection."""
+
+import numpy as np
+
+from agent import constraint_distances, top_k_indices
+
+
+CONSTRAINTS = {"mu": 2.0, "gap": 0.3, "max_atoms": 10}
+TOLERANCES = {"mu": 0.5, "gap": 0.05}
+
+
+def test_distances_are_in_tolerance_units():
+    predictions = [
+        {"mu": 2.0, "gap": 0.3, "num_atoms": 10},
+        {"mu": 2.5, "gap": 0.3, "num_atoms": 10},
+        {"mu": 2.0, "gap": 0.3, "num_atoms": 12},
+        {"mu": 2.0, "num_atoms": 5},
+    ]
+    weights = {"mu": 1.0, "gap": 1.0, "num_atoms": 1.0}
+    distances = constraint_distances(predictions, CONSTRAINTS, weights, TOLERANCES)
+
+    # One tolerance off on one of three equally weighted columns
+    np.testing.assert_allclose(distances[:3], [0.0, np.sqrt(1 / 3), np.sqrt(4 / 3)])
+    assert distances[3] == np.inf
+
+
+def test_top_k_orders_best_first():
+    distances = np.array([0.5, 0.1, 0.9, 0.3])
+    assert list(top_k_indices(distances, 2)) == [1, 3]
+    assert list(top_k_indices(distances, 10)) == [1, 3, 0, 2]
+    assert list(top_k_indices(distances, 0)) == []
+
+
+def test_top_k_ties_keep_input_order():
+    distances = np.array([1.0, 0.0, 1.0, 1.0, 0.5, 1.0])
+    assert list(top_k_indices(distances, 3)) == [1, 4, 0]
+    assert list(top_k_indices(distances, 4)) == [1, 4, 0, 2]
+
+
+def test_top_k_matches_stable_sort():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(1, 30))
+        distances = rng.integers(0, 4, n).astype(float)
+        distances[rng.random(n) < 0.1] = np.inf
+        distances[rng.random(n) < 0.1] = np.nan
+        k = int(rng.integers(0, n + 1))
+        expected = np.argsort(distances, kind="stable")[:k]
+        assert list(top_k_indices(distances, k)) == list(expected)
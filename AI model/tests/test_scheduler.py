@@ -0,0 +1,103 @@
+"""Tests for the micro-batching scheduler."""
+
+# Standard library imports
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scheduler import MicroBatcher
+
+
+def test_concurrent_requests_share_a_batch():
+    calls = []
+
+    def double(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=64, max_wait_ms=200)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(batcher.run, [[1, 2], [3], [4, 5, 6], [7]]))
+
+    assert results == [[2, 4], [6], [8, 10, 12], [14]]
+    # Every request waits for the others inside max_wait_ms
+    assert len(calls) < 4
+    assert batcher.stats()["items"] == 7
+
+
+def test_batches_respect_max_batch_size():
+    sizes = []
+
+    def identity(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(identity, max_batch_size=3, max_wait_ms=50)
+    futures = [batcher.submit([i, i]) for i in range(4)]
+    assert [f.result(timeout=5) for f in futures] == [[i, i] for i in range(4)]
+    # A request is never split, but two of them do not fit in one batch
+    assert max(sizes) <= 3
+
+
+def test_empty_submission_resolves_immediately():
+    batcher = MicroBatcher(lambda items: items)
+    assert batcher.submit([]).result(timeout=1) == []
+
+
+def test_disabled_batcher_calls_through():
+    batcher = MicroBatcher(lambda items: [item + 1 for item in items], enabled=False)
+    assert batcher.run([1, 2]) == [2, 3]
+    assert batcher.stats()["batches"] == 0
+
+
+def test_failing_request_does_not_fail_the_batch():
+    def check(items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(check, max_batch_size=64, max_wait_ms=200)
+    futures = [batcher.submit(["a"]), batcher.submit(["bad"]), batcher.submit(["b", "c"])]
+
+    assert futures[0].result(timeout=5) == ["A"]
+    with pytest.raises(ValueError, match="bad item"):
+        futures[1].result(timeout=5)
+    assert futures[2].result(timeout=5) == ["B", "C"]
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1], max_wait_ms=0)
+    with pytest.raises(RuntimeError, match="expected 2 results, got 1"):
+        batcher.run([1, 2])
+
+
+# The worker thread is meant to die here
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_worker_death_fails_pending_futures_and_restarts():
+    release = threading.Event()
+    started = threading.Event()
+
+    def batch_fn(items):
+        if items == ["die"]:
+            started.set()
+            release.wait(5)
+            raise SystemExit  # A BaseException, so it escapes the per-batch handling
+        return items
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait_ms=0)
+    dying = batcher.submit(["die"])
+    assert started.wait(5)
+    queued = batcher.submit(["queued"])
+    worker = batcher._worker
+    release.set()
+    worker.join(5)
+
+    with pytest.raises(RuntimeError, match="worker thread died"):
+        dying.result(timeout=5)
+    with pytest.raises(RuntimeError, match="worker thread died"):
+        queued.result(timeout=5)
+    assert batcher.stats()["worker_failures"] == 1
+
+    # The next submission gets a fresh worker
+    assert batcher.run(["ok"]) == ["ok"]
@@ -0,0 +1,72 @@
+"""Tests for the SMILES grammar state machine."""
+
+import pytest
+
+from smiles_grammar import INITIAL_STATE, is_complete, parse_bracket, parse_prefix, step
+
+
+@pytest.mark.parametrize("smiles", [
+    "C", "CCO", "c1ccccc1", "C1CC1", "CC(=O)O", "ClCBr", "C#N", "[NH4+]", "[13CH4]",
+    "C[C@@H](N)C(=O)O", "C%12CC%12", "[Na+].[Cl-]", "N1CC2CCC1C2", "C/C=C/C", "[O-][n+]1ccccc1",
+])
+def test_valid_smiles_parse_complete(smiles):
+    state = parse_prefix(smiles)
+    assert state is not None
+    assert is_complete(state)
+
+
+@pytest.mark.parametrize("prefix", ["C(", "c1ccc", "CC=", "[N", "C%1", "C(C"])
+def test_valid_prefixes_are_incomplete(prefix):
+    state = parse_prefix(prefix)
+    assert state is not None
+    assert not is_complete(state)
+
+
+@pytest.mark.parametrize("smiles", [
+    "(C)", "C)", "C((", "1CC", "C==C", "=C", "Cl1l", "Xx", "[Xx]", "[]", "C.(C)", "C11", "..",
+    "[C@@@H]", "CC(.C)",
+])
+def test_invalid_smiles_are_rejected(smiles):
+    state = parse_prefix(smiles)
+    assert state is None or not is_complete(state)
+
+
+def test_rejection_is_at_the_offending_character():
+    assert parse_prefix("CC)") is None
+    assert parse_prefix("C1C1") is not None
+    assert parse_prefix("C11") is None  # A ring cannot close on the atom that opened it
+
+
+def test_heavy_atoms_are_counted():
+    assert parse_prefix("CCO").heavy == 3
+    assert parse_prefix("ClC").heavy == 2
+    assert parse_prefix("[H][H]").heavy == 0
+    assert parse_prefix("[NH4+]").heavy == 1
+
+
+def test_max_atoms_caps_heavy_atoms():
+    assert parse_prefix("CCC", max_atoms=3) is not None
+    assert parse_prefix("CCCC", max_atoms=3) is None
+    assert parse_prefix("CC[N+]", max_atoms=2) is None
+
+
+def test_at_the_cap_only_finishing_moves_remain():
+    state = parse_prefix("C1CC", max_atoms=3)
+    # Closing the open ring needs no new atom...
+    assert step(state, "1", max_atoms=3) is not None
+    # ...but bonds, branches and new rings do
+    for char in "=(.2[":
+        assert step(state, char, max_atoms=3) is None
+    assert step(parse_prefix("C(C", max_atoms=2), ")", max_atoms=2) is not None
+
+
+def test_parse_bracket():
+    assert parse_bracket("C@@H", complete=True) == "C"
+    assert parse_bracket("Fe+2", complete=True) == "Fe"
+    assert parse_bracket("X", complete=False) == ""  # Could still become "Xe"
+    assert parse_bracket("X", complete=True) is None
+    assert parse_bracket("C:", complete=True) is None
+
+
+def test_initial_state_is_not_complete():
+    assert not is_complete(INITIAL_STATE)
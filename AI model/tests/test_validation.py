@@ -0,0 +1,27 @@
+"""Tests for candidate validation and its process pool."""
+
+import pytest
+
+import validation
+
+pytest.importorskip("rdkit")
+
+
+SMILES = ["CCO", "OCC", "C1=CC=CC=C1", "not a smiles", "CC(=O)O"] * 20
+
+
+def test_pool_matches_in_process():
+    in_process = validation.describe_many(SMILES)
+    try:
+        pooled = validation.describe_many(SMILES, workers=2, pool_threshold=1)
+        assert validation.start_pool(2) is validation.start_pool(2)
+    finally:
+        validation.stop_pool()
+    assert pooled == in_process
+    assert validation._pool is None
+
+
+def test_validate_candidates_dedupes_and_caps_atoms():
+    kept, counts = validation.validate_candidates(["CCO", "OCC", "xx", "C1=CC=CC=C1"], max_atoms=4)
+    assert [c["smiles"] for c in kept] == ["CCO"]
+    assert counts == {"invalid": 1, "duplicate": 1, "over_max_atoms": 1}
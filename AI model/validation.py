@@ -0,0 +1,202 @@
+"""
+Candidate validation for the molecule discovery pipeline.
+Parses, canonicalizes and deduplicates SMILES, computes cheap RDKit
+descriptors and drops candidates that break hard constraints.
+"""
+
+# Standard library imports
+import math
+import multiprocessing
+import multiprocessing.pool
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from rdkit import Chem, RDLogger
+    from rdkit.Chem import Descriptors
+
+    # Invalid generated SMILES are expected; keep parse errors out of the logs
+    RDLogger.DisableLog("rdApp.*")
+except ImportError:
+    Chem = None
+
+
+DEDUPE_KEYS = ("canonical", "inchikey")
+
+
+def atom_limit(max_atoms: Any) -> Optional[int]:
+    """
+    Heavy-atom cap for a max_atoms constraint, or None for no cap.
+
+    The one definition used by the validation filter and the grammar
+    processor: both count every atom except hydrogen (RDKit's
+    GetNumHeavyAtoms) against the whole part of max_atoms.
+    """
+    if max_atoms is None or isinstance(max_atoms, bool):
+        return None
+    try:
+        value = float(max_atoms)
+    except (TypeError, ValueError):
+        return None
+    return int(value) if math.isfinite(value) else None
+
+
+def describe_smiles(smiles: str, inchikey: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Parse one SMILES string and compute cheap descriptors.
+
+    Args:
+        smiles: Raw SMILES string
+        inchikey: Also compute the InChIKey
+
+    Returns:
+        Dict with canonical SMILES and descriptors, or None if RDKit cannot
+        parse it
+    """
+    if not smiles or not isinstance(smiles, str):
+        return None
+    try:
+        mol = Chem.MolFromSmiles(smiles)
+    except Exception:
+        return None
+    if mol is None:
+        return None
+
+    heavy = mol.GetNumHeavyAtoms()
+    record = {
+        "smiles": Chem.MolToSmiles(mol),
+        "heavy_atoms": heavy,
+        "total_atoms": heavy + sum(atom.GetTotalNumHs() for atom in mol.GetAtoms()),
+        "mol_weight": round(Descriptors.MolWt(mol), 3),
+    }
+    if inchikey:
+        try:
+            record["inchikey"] = Chem.MolToInchiKey(mol) or None
+        except Exception:
+            record["inchikey"] = None
+    return record
+
+
+def _describe_chunk(args: Tuple[List[str], bool]) -> List[Optional[Dict[str, Any]]]:
+    smiles_list, inchikey = args
+    return [describe_smiles(s, inchikey) for s in smiles_list]
+
+
+_pool: Optional[multiprocessing.pool.Pool] = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    # Fresh workers do not inherit the server's threads or model memory; the
+    # forkserver imports RDKit once and forks every worker from it
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["validation"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def start_pool(workers: int = 0) -> multiprocessing.pool.Pool:
+    """
+    Start the validation process pool, or return the one already running.
+
+    Call once at startup, before serving requests; describe_many starts it
+    on first use otherwise. Workers (including ones the pool restarts)
+    import this module and the script that launched the process, so serve
+    with ``uvicorn app:app`` to keep them light.
+
+    Args:
+        workers: Pool size (0 = number of CPUs)
+
+    Returns:
+        The shared pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _pool_context().Pool(workers or os.cpu_count() or 1)
+        return _pool
+
+
+def stop_pool():
+    """Terminate the validation process pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+def describe_many(smiles_list: List[str], inchikey: bool = False, workers: int = 0,
+                  pool_threshold: int = 256) -> List[Optional[Dict[str, Any]]]:
+    """
+    Describe many SMILES, fanning out to a process pool for large inputs.
+
+    Args:
+        smiles_list: Raw SMILES strings
+        inchikey: Also compute InChIKeys
+        workers: Pool size (0 = number of CPUs)
+        pool_threshold: Inputs shorter than this are handled in-process
+
+    Returns:
+        One record (or None) per input, in input order
+    """
+    workers = workers or os.cpu_count() or 1
+    if len(smiles_list) < pool_threshold or workers < 2:
+        return [describe_smiles(s, inchikey) for s in smiles_list]
+
+    chunk = max(32, len(smiles_list) // (workers * 4))
+    chunks = [(smiles_list[i:i + chunk], inchikey) for i in range(0, len(smiles_list), chunk)]
+    results: List[Optional[Dict[str, Any]]] = []
+    for part in start_pool(workers).map(_describe_chunk, chunks, chunksize=1):
+        results.extend(part)
+    return results
+
+
+def validate_candidates(candidates: Iterable[Any], dedupe: str = "canonical",
+                        max_atoms: Optional[int] = None, workers: int = 0,
+                        pool_threshold: int = 256) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Validate, canonicalize, dedupe and pre-filter candidates.
+
+    Args:
+        candidates: Candidate dicts with a "smiles" key (or bare strings)
+        dedupe: "canonical" (canonical SMILES) or "inchikey"
+        max_atoms: Drop molecules with more heavy atoms than this (see atom_limit)
+        workers: Process pool size for large inputs (0 = number of CPUs)
+        pool_threshold: Inputs shorter than this are handled in-process
+
+    Returns:
+        (kept candidates, counts of invalid / duplicate / over_max_atoms)
+    """
+    if dedupe not in DEDUPE_KEYS:
+        raise ValueError(f"Unknown dedupe key {dedupe!r}, expected one of {DEDUPE_KEYS}")
+
+    max_atoms = atom_limit(max_atoms)
+    candidates = [c if isinstance(c, dict) else {"smiles": c} for c in candidates]
+    records = describe_many(
+        [c.get("smiles") for c in candidates],
+        inchikey=dedupe == "inchikey",
+        workers=workers,
+        pool_threshold=pool_threshold,
+    )
+
+    kept: List[Dict[str, Any]] = []
+    seen = set()
+    counts = {"invalid": 0, "duplicate": 0, "over_max_atoms": 0}
+    for cand, record in zip(candidates, records):
+        if record is None:
+            counts["invalid"] += 1
+            continue
+        key = (record.get("inchikey") or record["smiles"]) if dedupe == "inchikey" else record["smiles"]
+        if key in seen:
+            counts["duplicate"] += 1
+            continue
+        seen.add(key)
+        if max_atoms is not None and record["heavy_atoms"] > max_atoms:
+            counts["over_max_atoms"] += 1
+            continue
+        kept.append({**cand, **record})
+    return kept, counts